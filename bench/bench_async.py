@@ -0,0 +1,78 @@
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_sim  # noqa: E402
+from msi_async import AsyncMysticLight  # noqa: E402
+
+TICK = 0.001
+
+
+# Measures how late a 1 ms sleep wakes up while the loop is busy with other work.
+async def probe_lag(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+# Issues rate color updates per second for duration seconds.
+async def produce(set_color, rate, duration):
+    interval = 1 / rate
+    deadline = time.perf_counter()
+    end = deadline + duration
+    i = 0
+    while deadline < end:
+        await set_color("MSI_MB", i % 6, i % 256, 0, 0)
+        i += 1
+        deadline += interval
+        await asyncio.sleep(max(0.0, deadline - time.perf_counter()))
+    return i
+
+
+async def run(label, set_color, rate, duration):
+    stop = asyncio.Event()
+    lags = []
+    probe = asyncio.create_task(probe_lag(stop, lags))
+    await asyncio.sleep(0.1)
+    lags.clear()
+    updates = await produce(set_color, rate, duration)
+    stop.set()
+    await probe
+    lags.sort()
+    return (
+        f"{label:<24} {updates / duration:7.0f} updates/s  "
+        f"loop lag p50 {statistics.median(lags) * 1e3:6.2f} ms  p99 {lags[int(len(lags) * 0.99)] * 1e3:6.2f} ms"
+    )
+
+
+async def main(rate, duration, latency):
+    msi.use_backend(msi_sim.SimulatedBackend(latency=latency))
+    msi.initialize_dll()
+
+    async def blocking_set_color(*args):
+        msi.set_led_color(*args)
+
+    # Fire-and-forget writes, a UI or request handler would not wait for the LED either.
+    async with AsyncMysticLight() as ml:
+
+        async def async_set_color(*args):
+            asyncio.ensure_future(ml.set_led_color(*args))
+
+        return [
+            await run("idle loop", lambda *args: asyncio.sleep(0), rate, duration),
+            await run("blocking msi.py calls", blocking_set_color, rate, duration),
+            await run("AsyncMysticLight", async_set_color, rate, duration),
+            f"worker: {ml.worker.stats()}",
+        ]
+
+
+if __name__ == "__main__":
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0005
+    print("\n".join(asyncio.run(main(rate, 3.0, latency))))
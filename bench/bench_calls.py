@@ -0,0 +1,77 @@
+import ctypes
+import os
+import subprocess
+import sys
+import timeit
+from ctypes import POINTER, byref, c_int
+from ctypes.wintypes import DWORD
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_safearray  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STUB_SOURCE = os.path.join(HERE, "stub_mlsdk.c")
+STUB_LIBRARY = os.path.join(HERE, "libmlsdk_stub.so")
+
+
+# Builds the stub library next to this script if it is missing or outdated.
+def build_stub():
+
+    # Compiles stub_mlsdk.c with the system C compiler.
+
+    # Returns:
+    # str: Path to the built shared library.
+
+    if not os.path.exists(STUB_LIBRARY) or os.path.getmtime(STUB_LIBRARY) < os.path.getmtime(STUB_SOURCE):
+        cc = os.environ.get("CC", "cc")
+        subprocess.check_call([cc, "-shared", "-fPIC", "-O2", "-o", STUB_LIBRARY, STUB_SOURCE])
+    return STUB_LIBRARY
+
+
+# The way msi.py called the SDK before prototypes were bound once.
+def legacy_set_led_color(lib, device_type, index, r, g, b):
+    lib.MLAPI_SetLedColor.argtypes = [msi.BSTR, DWORD, DWORD, DWORD, DWORD]
+    lib.MLAPI_SetLedColor.restype = c_int
+    return lib.MLAPI_SetLedColor(device_type, index, r, g, b)
+
+
+def legacy_get_led_color(lib, device_type, index):
+    lib.MLAPI_GetLedColor.argtypes = [msi.BSTR, DWORD, POINTER(DWORD), POINTER(DWORD), POINTER(DWORD)]
+    lib.MLAPI_GetLedColor.restype = c_int
+    r = DWORD()
+    g = DWORD()
+    b = DWORD()
+    lib.MLAPI_GetLedColor(device_type, index, byref(r), byref(g), byref(b))
+    return {"r": r.value, "g": g.value, "b": b.value}
+
+
+def bench(label, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<36} {best / number * 1e9:10.0f} ns/call")
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    path = build_stub()
+    msi.load_library(path)
+    lib = ctypes.CDLL(path)
+
+    bench("SetLedColor, argtypes per call", lambda: legacy_set_led_color(lib, "MSI_MB", 0, 255, 0, 0), number)
+    bench("SetLedColor, bound once", lambda: msi.mlapi.MLAPI_SetLedColor("MSI_MB", 0, 255, 0, 0), number)
+    bench("get_led_color, argtypes per call", lambda: legacy_get_led_color(lib, "MSI_MB", 0), number)
+    bench("get_led_color, bound once", lambda: msi.get_led_color("MSI_MB", 0), number)
+
+    # 16 LEDs of one area: one call per LED versus one MLAPI_SetLedColors call.
+    names = [f"LED_{i}" for i in range(16)]
+    colors = [(i, 255 - i, 0) for i in range(16)]
+    writer = msi_safearray.LedColorsWriter("MSI_MB", 0, names)
+
+    def per_led():
+        for i, (r, g, b) in enumerate(colors):
+            msi.set_led_color("MSI_MB", i, r, g, b)
+
+    bench("16 LEDs, set_led_color each", per_led, number // 16)
+    bench("16 LEDs, set_led_colors", lambda: msi.set_led_colors("MSI_MB", 0, names, colors), number // 16)
+    bench("16 LEDs, LedColorsWriter.write", lambda: writer.write(colors), number // 16)
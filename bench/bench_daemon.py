@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+import msi  # noqa: E402
+import msi_caps  # noqa: E402
+import msi_daemon  # noqa: E402
+import msi_sim  # noqa: E402
+
+# Simulated SDK latencies in milliseconds.
+INIT_LATENCY_MS = 50.0
+CALL_LATENCY_MS = 0.0
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+
+# One short script without the daemon: initialize, enumerate, set one LED, release.
+def script_run():
+    msi.use_backend(
+        msi_sim.SimulatedBackend(
+            latency=CALL_LATENCY_MS / 1000, latencies={"MLAPI_Initialize": INIT_LATENCY_MS / 1000}
+        )
+    )
+    msi.initialize_dll()
+    msi_caps.enumerate_capabilities()
+    msi.set_led_color("MSI_MB", 0, 255, 0, 0)
+    msi.release_dll()
+
+
+# The same script as a daemon client.
+def client_run(address):
+    with msi_daemon.Client(address) as client:
+        client.set_led_color("MSI_MB", 0, 255, 0, 0)
+
+
+def timed(function, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def start_daemon(address):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT, "msi_daemon.py"),
+            "--simulate",
+            "--address",
+            address,
+            "--latency-ms",
+            str(CALL_LATENCY_MS),
+            "--init-latency-ms",
+            str(INIT_LATENCY_MS),
+        ],
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            msi_daemon.Client(address).close()
+            return process
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("daemon did not start")
+            time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    address = os.path.join(tempfile.mkdtemp(), "msi-daemon.sock")
+    process = start_daemon(address)
+    try:
+        p50, p99 = percentiles(timed(script_run, 10))
+        print(f"{'script without daemon':<32} p50 {p50:10.0f} us  p99 {p99:10.0f} us")
+        p50, p99 = percentiles(timed(lambda: client_run(address), 200))
+        print(f"{'script as daemon client':<32} p50 {p50:10.0f} us  p99 {p99:10.0f} us")
+
+        with msi_daemon.Client(address) as client:
+            p50, p99 = percentiles(timed(lambda: client.set_led_color("MSI_MB", 0, 255, 0, 0), number))
+            print(f"{'set_led_color round trip':<32} p50 {p50:10.1f} us  p99 {p99:10.1f} us")
+            for depth in (1, 16, 256):
+                calls = [("set_led_color", ("MSI_MB", i % 6, i % 256, 0, 0)) for i in range(depth)]
+                batches = max(1, number // depth)
+                start = time.perf_counter()
+                for _ in range(batches):
+                    client.pipeline(calls)
+                elapsed = time.perf_counter() - start
+                print(f"{f'pipelined, depth {depth}':<32} {batches * depth / elapsed:10.0f} requests/s")
+    finally:
+        process.terminate()
+        process.wait()
@@ -0,0 +1,39 @@
+import logging
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_sim  # noqa: E402
+
+
+def bench(label, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<40} {best / number * 1e9:10.0f} ns/call")
+    return best / number
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    msi.use_backend(msi_sim.SimulatedBackend())
+    msi.initialize_dll()
+    devnull = open(os.devnull, "w")
+
+    # What every set_led_color call did before: the SDK call plus a print to stdout.
+    def printing_set_led_color():
+        msi.set_led_color("MSI_MB", 0, 255, 0, 0)
+        print("Color updated.\n", file=devnull, flush=True)
+
+    silent = bench("set_led_color, logging off", lambda: msi.set_led_color("MSI_MB", 0, 255, 0, 0), number)
+    printing = bench("set_led_color + print to devnull", printing_set_led_color, number)
+
+    handler = logging.StreamHandler(devnull)
+    msi.log.addHandler(handler)
+    msi.log.setLevel(logging.DEBUG)
+    bench("set_led_color, DEBUG logging to devnull", lambda: msi.set_led_color("MSI_MB", 0, 255, 0, 0), number)
+    msi.log.removeHandler(handler)
+    msi.log.setLevel(logging.NOTSET)
+
+    print(f"saved per call without print: {(printing - silent) * 1e9:.0f} ns (more on a real terminal)")
@@ -0,0 +1,32 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_metrics  # noqa: E402
+from bench_calls import build_stub  # noqa: E402
+
+
+def bench(label, func, number):
+    best = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<36} {best / number * 1e9:10.0f} ns/call")
+    return best / number
+
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    msi.load_library(build_stub())
+    msi.initialize_dll()
+
+    def call():
+        msi.set_led_color("MSI_MB", 0, 255, 0, 0)
+
+    off = bench("set_led_color, instrumentation off", call, number)
+    metrics = msi_metrics.enable()
+    on = bench("set_led_color, instrumentation on", call, number)
+    msi_metrics.disable()
+    again = bench("set_led_color, disabled again", call, number)
+    print(f"overhead when enabled: {(on - off) * 1e9:.0f} ns/call, when disabled: {(again - off) * 1e9:.0f} ns/call")
+    print(metrics.snapshot()["MLAPI_SetLedColor"]["latency"])
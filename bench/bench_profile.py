@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_caps  # noqa: E402
+import msi_sim  # noqa: E402
+from msi_profile import ProfileSwitcher, compile_profile, profile_from_dict  # noqa: E402
+
+DEVICES = {"MSI_MB": 24, "MSI_VGA": 12, "MSI_DRAM": 16}
+LATENCY = 0.0005
+
+PROFILES = [
+    {"name": "Evening", "devices": {device_type: {"style": "Steady", "color": "#ff4000", "bright": 3} for device_type in DEVICES}},
+    {
+        "name": "Work",
+        "devices": {
+            **{device_type: {"style": "Steady", "color": "#ffffff", "bright": 3} for device_type in DEVICES},
+            "MSI_VGA": {"style": "Steady", "color": "#ffffff", "bright": 3, "leds": {"0": {"color": "#00ff00"}}},
+        },
+    },
+    {"name": "Party", "devices": {device_type: {"style": "Rainbow", "bright": 5, "speed": 3} for device_type in DEVICES}},
+]
+
+
+# Applies a profile like an ad hoc script: every setting of every LED, with the styles
+# looked up for every style change.
+def script(profile):
+    calls = 0
+    for device_type, settings in profile["devices"].items():
+        for index in range(DEVICES[device_type]):
+            led = {**settings, **settings.get("leds", {}).get(str(index), {})}
+            if "style" in led:
+                msi.set_led_style(device_type, index, msi.get_led_info(device_type, index), led["style"])
+                calls += 2
+            for field in ("bright", "speed"):
+                if field in led:
+                    getattr(msi, f"set_led_{field}")(device_type, index, led[field])
+                    calls += 1
+            if "color" in led:
+                color = led["color"][1:]
+                msi.set_led_color(device_type, index, *(int(color[i : i + 2], 16) for i in (0, 2, 4)))
+                calls += 1
+    return calls
+
+
+def main():
+    msi.use_backend(msi_sim.SimulatedBackend(msi_sim.make_devices(DEVICES), latency=LATENCY))
+    msi.initialize_dll()
+    caps = msi_caps.enumerate_capabilities()
+    start = time.perf_counter()
+    plans = [compile_profile(profile_from_dict(profile), caps) for profile in PROFILES]
+    compiled = time.perf_counter() - start
+    print(f"{sum(DEVICES.values())} LEDs, {LATENCY * 1e3:.1f} ms per call, {len(plans)} profiles compiled in {compiled * 1e3:.2f} ms")
+
+    switcher = ProfileSwitcher()
+    order = [0, 1, 0, 2, 1, 2]
+    for index in order:
+        start = time.perf_counter()
+        calls = script(PROFILES[index])
+        scripted = time.perf_counter() - start
+        start = time.perf_counter()
+        switched = switcher.switch(plans[index])
+        elapsed = time.perf_counter() - start
+        print(
+            f"{plans[index].name:<8} script: {calls:4d} calls {scripted * 1e3:6.1f} ms,"
+            f" plan switch: {switched:4d} calls {elapsed * 1e3:6.1f} ms"
+        )
+    msi.release_dll()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_sim  # noqa: E402
+from msi_reconcile import Reconciler  # noqa: E402
+
+DEVICES = {"MSI_MB": 24, "MSI_VGA": 12, "MSI_DRAM": 16}
+
+
+# Simulates drift on some LEDs and reports how long the budgeted scan takes to repair it.
+def run(budget, drifted):
+    backend = msi_sim.SimulatedBackend(msi_sim.make_devices(DEVICES))
+    msi.use_backend(backend)
+    msi.initialize_dll()
+    reconciler = Reconciler(budget=budget)
+    for device_type in DEVICES:
+        reconciler.desire(device_type, style="Steady", color=(0, 128, 255), bright=3)
+    now = 0.0
+    while reconciler.samples < 2 * reconciler.stats()["slots"]:
+        now += 0.01
+        reconciler.step(now)
+
+    # Another application changes the color of some LEDs of one device.
+    for index in range(drifted):
+        msi.set_led_color("MSI_VGA", index, 255, 0, 0)
+    samples = reconciler.samples
+    repairs = reconciler.repairs
+    start = now
+    while any(msi.get_led_color("MSI_VGA", index)["r"] for index in range(drifted)):
+        now += 0.01
+        reconciler.step(now)
+    msi.release_dll()
+    print(
+        f"budget {budget:5.0f}/s, {drifted:2d} LEDs drifted: repaired after {now - start:6.2f} s,"
+        f" {reconciler.samples - samples:4d} samples, {reconciler.repairs - repairs:3d} repair calls"
+        f" (full re-push: {3 * sum(DEVICES.values())} calls)"
+    )
+
+
+if __name__ == "__main__":
+    for budget in (20, 100):
+        for drifted in (1, 12):
+            run(budget, drifted)
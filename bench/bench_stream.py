@@ -0,0 +1,47 @@
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import msi  # noqa: E402
+import msi_sim  # noqa: E402
+import msi_stream  # noqa: E402
+
+FPS = 60
+LEDS = 6
+
+
+# Streams duration seconds of random 128x72 video through zones and smoothing.
+def run(latency, duration, buffered):
+    msi.use_backend(msi_sim.SimulatedBackend(latency=latency))
+    msi.initialize_dll()
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (72, 128, 3), dtype=np.uint8) for _ in range(FPS)]
+    count = int(duration * FPS)
+    packets = msi_stream.smooth(
+        msi_stream.zones(msi_stream.array_source((frames[i % FPS] for i in range(count)), FPS), LEDS), 0.5
+    )
+    if buffered:
+        packets = msi_stream.LatestBuffer.feed(packets)
+    sink = msi_stream.StreamSink("MSI_MB")
+    tracemalloc.start()
+    sink.run(packets)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    msi.release_dll()
+    stats = sink.stats()
+    print(
+        f"SDK {latency * 1e3:4.1f} ms/call {'latest-wins' if buffered else 'unbuffered':<12}"
+        f" {stats['frames']:5d} frames  dropped {stats['dropped']:5d}"
+        f"  latency p50 {stats['p50'] * 1e3:7.2f} ms  p99 {stats['p99'] * 1e3:7.2f} ms  peak {peak / 1024:6.0f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    for latency in (0.0, 0.001, 0.005):
+        for buffered in (False, True):
+            run(latency, duration, buffered)
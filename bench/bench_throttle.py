@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import numpy as np  # noqa: E402
+
+import msi  # noqa: E402
+import msi_frame  # noqa: E402
+import msi_sim  # noqa: E402
+from msi_throttle import Throttle  # noqa: E402
+
+DEVICE = "MSI_MB"
+LEDS = 6
+CAPACITY = 300.0
+SETTERS = ("MLAPI_SetLedColor", "MLAPI_SetLedColorsSync", "MLAPI_SetLedColors", "MLAPI_SetLedColorEx")
+
+
+class OverloadedController:
+
+    # Backend modelling a controller that handles CAPACITY writes per second: writes
+    # beyond it queue up and get slower, and writes to a full queue time out.
+
+    def __init__(self, backend, capacity=CAPACITY, base_latency=0.0002, queue=30):
+        self.backend = backend
+        self.capacity = capacity
+        self.base_latency = base_latency
+        self.queue = queue
+        self.backlog = 0.0
+        self.stamp = time.perf_counter()
+        for name in SETTERS:
+            setattr(self, name, self._setter(getattr(backend, name)))
+
+    def _setter(self, function):
+        def call(*args):
+            now = time.perf_counter()
+            self.backlog = max(0.0, self.backlog - (now - self.stamp) * self.capacity)
+            self.stamp = now
+            if self.backlog >= self.queue:
+                time.sleep(self.base_latency * 4)
+                return msi.MLAPI_TIMEOUT
+            self.backlog += 1
+            time.sleep(self.base_latency * (1 + 4 * self.backlog / self.queue))
+            return function(*args)
+
+        return call
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+# Pushes fps random frames per second for duration seconds, directly or throttled.
+def run(fps, duration, throttle=None):
+    msi.use_backend(OverloadedController(msi_sim.SimulatedBackend(msi_sim.make_devices({DEVICE: LEDS}))))
+    msi.initialize_dll()
+    msi_frame.reset_frames()
+    rng = np.random.default_rng(1)
+    errors = frames = 0
+    start = time.perf_counter()
+    for tick in range(int(fps * duration)):
+        delay = start + tick / fps - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        frame = rng.integers(0, 256, (LEDS, 3), dtype=np.uint8)
+        frames += 1
+        if throttle is None:
+            try:
+                msi_frame.push_frame(DEVICE, frame)
+            except msi.MysticLightError:
+                errors += 1
+        else:
+            throttle.push_frame(DEVICE, frame)
+    if throttle is not None:
+        throttle.close()
+        stats = throttle.stats()[DEVICE]
+        errors = stats["errors"]
+        print(
+            f"throttled from {throttle.rate:4.0f}/s, {fps} fps: {frames - errors - stats['dropped']:3d} of {frames} frames"
+            f" shown, {errors:3d} failed, {stats['dropped']:3d} dropped as stale, budget {stats['rate']:4.0f}/s"
+            f" ({stats['shrinks']} shrinks, {stats['grows']} grows)"
+        )
+    else:
+        print(f"unthrottled,          {fps} fps: {frames - errors:3d} of {frames} frames shown, {errors:3d} failed")
+    msi.release_dll()
+
+
+if __name__ == "__main__":
+    print(f"controller capacity {CAPACITY:.0f} calls/s, {LEDS} LEDs changing every frame")
+    for fps in (30, 120):
+        run(fps, 3.0)
+        for rate in (60, 600):
+            run(fps, 3.0, Throttle(rate=rate, max_rate=2000, target_latency=0.002))
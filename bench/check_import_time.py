@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+# Maximum cumulative import time of msi in microseconds, as reported by -X importtime.
+BUDGET_US = 20000
+
+# Modules import msi must not pull in, they are imported on first use.
+DEFERRED = ("comtypes", "logging", "numpy", "ctypes.wintypes")
+
+
+def python(*args):
+    # Bytecode is written, so the timed runs measure the import and not the compiler.
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.pop("MLSDK_PATH", None)
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+# Returns the cumulative import time of msi in microseconds.
+def import_time():
+    for line in python("-X", "importtime", "-c", "import msi").stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "msi":
+            return int(fields[1])
+    raise RuntimeError("msi missing from -X importtime output")
+
+
+def import_state():
+
+    # Returns:
+    # tuple: The DEFERRED modules import msi pulled in (list), and the reprs of msi.dll
+    # and msi.mlapi after the import (tuple), None where they are None.
+
+    code = (
+        f"import sys, msi; print(','.join(m for m in {DEFERRED!r} if m in sys.modules));"
+        " print(repr(msi.dll)); print(repr(msi.mlapi))"
+    )
+    imported, dll, mlapi = python("-c", code).stdout.splitlines()
+    loaded = tuple(None if value == "None" else value for value in (dll, mlapi))
+    return [module for module in imported.split(",") if module], loaded
+
+
+def check(runs):
+
+    # Returns:
+    # bool: True if msi imports within BUDGET_US, without importing DEFERRED modules or
+    # loading the SDK library.
+
+    python("-c", "import msi")
+    best = min(import_time() for _ in range(runs))
+    imported, loaded = import_state()
+    print(f"import msi: {best} us (budget {BUDGET_US} us, best of {runs})")
+    print(f"deferred modules imported: {', '.join(imported) or 'none'}")
+    print(f"library and backend after import: {loaded[0]} {loaded[1]}")
+    return best <= BUDGET_US and not imported and loaded == (None, None)
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    ok = check(runs)
+    print("OK" if ok else "REGRESSION")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,65 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import msi  # noqa: E402
+import msi_caps  # noqa: E402
+import msi_sim  # noqa: E402
+
+# Allowed growth of Python memory between the warm-up and the end of the run.
+TOLERANCE = 64 * 1024
+
+
+# One hot-plug style re-enumeration: every getter returning SAFEARRAYs or BSTRs.
+def enumerate_once():
+    devices = msi.get_devices()
+    for device_type, leds_count in devices.items():
+        msi.get_device_name(device_type)
+        msi.get_led_name(device_type)
+        for index in range(leds_count):
+            msi.get_device_name_ex(device_type, index)
+            msi.get_led_info(device_type, index)
+            msi.get_led_style(device_type, index)
+
+
+def check(rounds):
+
+    # Enumerates rounds times against the simulated allocator.
+
+    # Returns:
+    # bool: True if every allocation was freed and memory stayed flat.
+
+    backend = msi_sim.SimulatedBackend(msi_sim.make_devices({"MSI_MB": 2, "MSI_VGA": 1}))
+    msi.use_backend(backend)
+    msi.initialize_dll()
+    warm_up = max(1, rounds // 10)
+    for _ in range(warm_up):
+        enumerate_once()
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for _ in range(rounds - warm_up):
+        enumerate_once()
+    msi_caps.enumerate_capabilities()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    growth = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    msi.release_dll()
+
+    print(f"{rounds} enumerations, {backend.total_calls()} calls in {elapsed:.1f} s")
+    print(f"live SDK allocations: {len(backend.allocations)}, invalid frees: {backend.invalid_frees}")
+    print(f"Python memory growth after warm-up: {growth} bytes (tolerance {TOLERANCE})")
+    return not backend.allocations and not backend.invalid_frees and growth < TOLERANCE
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ok = check(rounds)
+    print("OK" if ok else "LEAK")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,136 @@
+/*
+ * Stub Mystic Light SDK exporting the MLAPI functions bound by msi.py.
+ * Every call succeeds immediately, so timings measure only the Python layer.
+ *
+ * Latency can be added with environment variables read on the first call:
+ *   MLSDK_STUB_LATENCY_US       microseconds every call sleeps
+ *   MLSDK_STUB_INIT_LATENCY_US  microseconds MLAPI_Initialize sleeps instead
+ *
+ * Build: cc -shared -fPIC -O2 -o libmlsdk_stub.so stub_mlsdk.c
+ */
+#include <stdlib.h>
+#include <unistd.h>
+#include <wchar.h>
+
+typedef unsigned long DWORD;
+typedef wchar_t *BSTR;
+
+typedef struct {
+    long cElements;
+    long lLbound;
+} SAFEARRAYBOUND;
+
+typedef struct {
+    unsigned short cDims;
+    unsigned short fFeatures;
+    long cbElements;
+    long cLocks;
+    void *pvData;
+    SAFEARRAYBOUND rgsabound[1];
+} SAFEARRAY;
+
+static BSTR dev_types[] = {L"MSI_MB", L"MSI_VGA"};
+static BSTR led_counts[] = {L"3", L"1"};
+static BSTR styles[] = {L"Off", L"Steady", L"Breathing", L"Flashing", L"Rainbow"};
+static BSTR led_names[] = {
+    L"LED_0", L"LED_1", L"LED_2", L"LED_3", L"LED_4", L"LED_5", L"LED_6", L"LED_7",
+    L"LED_8", L"LED_9", L"LED_10", L"LED_11", L"LED_12", L"LED_13", L"LED_14", L"LED_15",
+};
+
+static SAFEARRAY sa_dev_types = {1, 0, sizeof(BSTR), 0, dev_types, {{2, 0}}};
+static SAFEARRAY sa_led_counts = {1, 0, sizeof(BSTR), 0, led_counts, {{2, 0}}};
+static SAFEARRAY sa_styles = {1, 0, sizeof(BSTR), 0, styles, {{5, 0}}};
+static SAFEARRAY sa_led_names = {1, 0, sizeof(BSTR), 0, led_names, {{16, 0}}};
+
+static long latency_us = -1;
+static long init_latency_us = -1;
+
+static long env_us(const char *name, long fallback)
+{
+    const char *value = getenv(name);
+    return value ? atol(value) : fallback;
+}
+
+static void delay(void)
+{
+    if (latency_us < 0)
+        latency_us = env_us("MLSDK_STUB_LATENCY_US", 0);
+    if (latency_us > 0)
+        usleep(latency_us);
+}
+
+int MLAPI_GetErrorMessage(int code, BSTR *desc) { delay(); *desc = L"Generic error."; return 0; }
+int MLAPI_Initialize(void)
+{
+    if (init_latency_us < 0)
+        init_latency_us = env_us("MLSDK_STUB_INIT_LATENCY_US", env_us("MLSDK_STUB_LATENCY_US", 0));
+    if (init_latency_us > 0)
+        usleep(init_latency_us);
+    return 0;
+}
+int MLAPI_Release(void) { delay(); return 0; }
+
+int MLAPI_GetDeviceInfo(SAFEARRAY **types, SAFEARRAY **counts)
+{
+    delay();
+    *types = &sa_dev_types;
+    *counts = &sa_led_counts;
+    return 0;
+}
+
+int MLAPI_GetDeviceName(BSTR type, SAFEARRAY **names) { delay(); *names = &sa_dev_types; return 0; }
+int MLAPI_GetDeviceNameEx(BSTR type, DWORD index, BSTR *name) { delay(); *name = L"Stub Device"; return 0; }
+
+int MLAPI_GetLedInfo(BSTR type, DWORD index, BSTR *name, SAFEARRAY **led_styles)
+{
+    delay();
+    *name = L"Stub LED";
+    *led_styles = &sa_styles;
+    return 0;
+}
+
+int MLAPI_GetLedName(BSTR type, SAFEARRAY **led_names)
+{
+    delay();
+    *led_names = &sa_led_names;
+    return 0;
+}
+
+int MLAPI_GetLedColor(BSTR type, DWORD index, DWORD *r, DWORD *g, DWORD *b)
+{
+    delay();
+    *r = 255;
+    *g = 128;
+    *b = 0;
+    return 0;
+}
+
+int MLAPI_GetLedStyle(BSTR type, DWORD index, BSTR *style) { delay(); *style = styles[1]; return 0; }
+int MLAPI_GetLedMaxBright(BSTR type, DWORD index, DWORD *level) { delay(); *level = 5; return 0; }
+int MLAPI_GetLedBright(BSTR type, DWORD index, DWORD *level) { delay(); *level = 5; return 0; }
+int MLAPI_GetLedMaxSpeed(BSTR type, DWORD index, DWORD *level) { delay(); *level = 3; return 0; }
+int MLAPI_GetLedSpeed(BSTR type, DWORD index, DWORD *level) { delay(); *level = 1; return 0; }
+int MLAPI_SetLedStyle(BSTR type, DWORD index, BSTR style) { delay(); return 0; }
+int MLAPI_SetLedBright(BSTR type, DWORD index, DWORD level) { delay(); return 0; }
+int MLAPI_SetLedSpeed(BSTR type, DWORD index, DWORD level) { delay(); return 0; }
+int MLAPI_SetLedColor(BSTR type, DWORD index, DWORD r, DWORD g, DWORD b) { delay(); return 0; }
+int MLAPI_SetLedColorsSync(BSTR type, DWORD r, DWORD g, DWORD b) { delay(); return 0; }
+
+int MLAPI_SetLedColors(BSTR type, DWORD index, SAFEARRAY **names, DWORD *r, DWORD *g, DWORD *b)
+{
+    /* Read every name and colour like the SDK would. */
+    static volatile DWORD sink;
+    BSTR *data = (BSTR *)(*names)->pvData;
+    long i;
+
+    delay();
+    for (i = 0; i < (*names)->rgsabound[0].cElements; i++)
+        sink += data[i][0] + r[i] + g[i] + b[i];
+    return 0;
+}
+
+int MLAPI_SetLedColorEx(BSTR type, DWORD index, BSTR name, DWORD r, DWORD g, DWORD b, DWORD sync)
+{
+    delay();
+    return 0;
+}
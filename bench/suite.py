@@ -0,0 +1,269 @@
+# Benchmark suite of the msi.py wrappers against the stub library.
+#
+# Measures the per-call time of every wrapper, enumeration, frame push throughput and
+# memory per call, and stores the results as JSON in bench/results so runs can be
+# compared over time:
+#
+#     python bench/suite.py --save
+#     python bench/suite.py --latency-us 50 --filter set_led
+#     python bench/suite.py --compare bench/results/<earlier run>.json
+#
+# Benchmarks are functions registered with @benchmark. Time benchmarks return the
+# callable to time and the number of operations one call performs, memory benchmarks
+# the callable to run under tracemalloc.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, "results")
+sys.path.insert(0, os.path.join(HERE, os.pardir))
+
+# Benchmarks: name -> (kind, setup function).
+BENCHMARKS = {}
+
+DEVICE = "MSI_MB"
+LEDS = 16
+
+
+def benchmark(kind="time"):
+    def register(function):
+        BENCHMARKS[function.__name__] = (kind, function)
+        return function
+
+    return register
+
+
+# Per-call time of the wrappers.
+
+
+@benchmark()
+def raw_set_led_color():
+    import msi
+
+    function = msi.mlapi.MLAPI_SetLedColor
+    return lambda: function(DEVICE, 0, 255, 0, 0), 1
+
+
+def _wrapper(name, *args):
+    import msi
+
+    function = getattr(msi, name)
+    return lambda: function(*args), 1
+
+
+for _name, _args in {
+    "get_devices": (),
+    "get_device_name": (DEVICE,),
+    "get_device_name_ex": (DEVICE, 0),
+    "get_led_info": (DEVICE, 0),
+    "get_led_name": (DEVICE,),
+    "get_led_color": (DEVICE, 0),
+    "get_led_style": (DEVICE, 0),
+    "get_led_max_bright": (DEVICE, 0),
+    "get_led_bright": (DEVICE, 0),
+    "get_led_max_speed": (DEVICE, 0),
+    "get_led_speed": (DEVICE, 0),
+    "set_led_style": (DEVICE, 0, ("Off", "Steady"), "Steady"),
+    "set_led_bright": (DEVICE, 0, 3),
+    "set_led_speed": (DEVICE, 0, 2),
+    "set_led_color": (DEVICE, 0, 255, 0, 0),
+    "set_led_colors_sync": (DEVICE, 255, 0, 0),
+    "set_led_color_ex": (DEVICE, 0, "LED_0", 255, 0, 0, 0),
+    "set_led_colors": (DEVICE, 0, [f"LED_{i}" for i in range(LEDS)], [(i, 0, 0) for i in range(LEDS)]),
+}.items():
+    BENCHMARKS[_name] = ("time", lambda name=_name, args=_args: _wrapper(name, *args))
+
+
+# Enumeration and frames.
+
+
+@benchmark()
+def enumerate_capabilities():
+    import msi_caps
+
+    return msi_caps.enumerate_capabilities, 1
+
+
+@benchmark()
+def push_frame_uniform():
+    import msi_frame
+
+    # Alternating uniform frames, one MLAPI_SetLedColorsSync call each.
+    frames = [bytes([i, 255 - i, 0] * LEDS) for i in range(2)]
+    state = [0]
+
+    def push():
+        state[0] ^= 1
+        msi_frame.push_frame(DEVICE, frames[state[0]])
+
+    return push, 1
+
+
+@benchmark()
+def push_frame_changing():
+    import msi_frame
+
+    # Every LED changes every frame, one MLAPI_SetLedColor call per LED.
+    frames = [bytes(value for led in range(LEDS) for value in ((i + led) % 256, led, 0)) for i in range(256)]
+    state = [0]
+
+    def push():
+        state[0] = (state[0] + 1) & 255
+        msi_frame.push_frame(DEVICE, frames[state[0]])
+
+    return push, 1
+
+
+@benchmark()
+def led_colors_writer():
+    import numpy as np
+
+    import msi_safearray
+
+    writer = msi_safearray.LedColorsWriter(DEVICE, 0, [f"LED_{i}" for i in range(LEDS)])
+    frame = np.zeros((LEDS, 3), np.uint8)
+    return lambda: writer.write(frame), 1
+
+
+# Memory per call.
+
+
+@benchmark("memory")
+def memory_get_led_info():
+    return _wrapper("get_led_info", DEVICE, 0)
+
+
+@benchmark("memory")
+def memory_get_devices():
+    return _wrapper("get_devices")
+
+
+@benchmark("memory")
+def memory_set_led_color():
+    return _wrapper("set_led_color", DEVICE, 0, 255, 0, 0)
+
+
+@benchmark("memory")
+def memory_set_led_colors():
+    return _wrapper("set_led_colors", DEVICE, 0, [f"LED_{i}" for i in range(LEDS)], [(i, 0, 0) for i in range(LEDS)])
+
+
+def time_benchmark(function, number, repeat):
+    gc.collect()
+    timings = timeit.repeat(function, number=number, repeat=repeat)
+    return {"ns_per_call": min(timings) / number * 1e9, "median_ns": sorted(timings)[len(timings) // 2] / number * 1e9}
+
+
+def memory_benchmark(function, number):
+    function()
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    for _ in range(number):
+        function()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"peak_bytes": peak - baseline, "retained_bytes_per_call": (current - baseline) / number}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(names, number, repeat, latency_us):
+    import msi
+    from bench_calls import build_stub
+
+    os.environ["MLSDK_STUB_LATENCY_US"] = str(latency_us)
+    msi.load_library(build_stub())
+    msi.initialize_dll()
+    results = {}
+    for name in names:
+        kind, setup = BENCHMARKS[name]
+        if kind == "time":
+            function, operations = setup()
+            count = max(1, number // 100) if latency_us else number
+            result = time_benchmark(function, count, repeat)
+            result["ops_per_s"] = operations * 1e9 / result["ns_per_call"]
+        else:
+            function = setup()[0]
+            result = memory_benchmark(function, 1000)
+        results[name] = result
+        print(f"{name:<28} " + "  ".join(f"{key} {value:,.1f}" for key, value in result.items()))
+    msi.release_dll()
+    return results
+
+
+def compare(results, baseline, threshold, latency_us):
+
+    # Prints the change against a stored run and returns the regressed benchmarks.
+
+    regressions = []
+    print(f"\nagainst {baseline['revision']} ({baseline['date']}):")
+    if baseline["latency_us"] != latency_us:
+        print(f"warning: baseline was run with --latency-us {baseline['latency_us']}")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        key = "ns_per_call" if "ns_per_call" in result else "peak_bytes"
+        if not old[key]:
+            continue
+        change = result[key] / old[key] - 1.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<28} {key} {old[key]:,.1f} -> {result[key]:,.1f} ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the msi.py wrappers against the stub library.")
+    parser.add_argument("--filter", default="", help="only run benchmarks containing this text")
+    parser.add_argument("--number", type=int, default=20000, help="calls per timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timings per benchmark, the best one counts")
+    parser.add_argument("--latency-us", type=int, default=0, help="latency of every stub call")
+    parser.add_argument("--save", action="store_true", help="store the results in bench/results")
+    parser.add_argument("--compare", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative slowdown reported as regression")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    results = run(names, args.number, args.repeat, args.latency_us)
+    record = {
+        "revision": git_revision(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "latency_us": args.latency_us,
+        "results": results,
+    }
+    if args.save:
+        os.makedirs(RESULTS, exist_ok=True)
+        path = os.path.join(RESULTS, f"{time.strftime('%Y%m%d-%H%M%S')}-{record['revision']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(record, f, indent=1)
+        print(f"\nsaved {path}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            if compare(results, json.load(f), args.threshold, args.latency_us):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
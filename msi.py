@@ -1,11 +1,87 @@
 import ctypes
 import os
-from ctypes import POINTER, byref, c_int, c_long, c_ushort, c_void_p, cast
-from ctypes.wintypes import DWORD
+import time
+from functools import lru_cache
+from ctypes import CFUNCTYPE, POINTER, byref, c_int, c_long, c_ulong, c_ushort, c_void_p, cast
 
-from comtypes import BSTR
+# Same type as ctypes.wintypes.DWORD, which takes a millisecond to import.
+DWORD = c_ulong
 
-dll = ctypes.CDLL(os.path.join(os.getcwd(), "mlsdk64.dll"))
+# Importing msi.py loads neither the SDK library nor comtypes and logging, so short
+# scripts start fast. The library is found and loaded by initialize_dll(), comtypes
+# is imported when BSTR is first needed and logging on the first log message.
+
+
+class _Logger:
+
+    # Stands in for the module logger until it is first used.
+
+    def __getattr__(self, name):
+        global log
+        import logging
+
+        log = logging.getLogger(__name__)
+        return getattr(log, name)
+
+
+log = _Logger()
+
+# Raw library handle and the MLAPI functions bound from it, see load_library().
+# mlapi can also be any other backend providing the same functions, see use_backend().
+dll = None
+mlapi = None
+
+# The innermost backend MLAPI_Initialize succeeded on, see initialize_dll().
+_initialized = None
+
+# Incremented whenever an SDK session starts or the backend is replaced by one with
+# another session. State cached about the devices (e.g. msi_frame's last frames) is only
+# valid for the generation it was cached in.
+session_generation = 0
+
+# Device type -> set of its LED names from get_led_name(), for the current generation.
+_led_names = {}
+
+# (device type, msi_safearray.BstrArray) pairs set_led_colors() checked against
+# _led_names in the current generation.
+_checked_names = set()
+
+# SDK library file names, mlsdk64.dll for 64 bit and MysticLight_SDK.dll for 32 bit Python.
+LIBRARY_NAMES = ("mlsdk64.dll",) if ctypes.sizeof(c_void_p) == 8 else ("MysticLight_SDK.dll",)
+
+# Directories find_library() searches after MLSDK_SEARCH_PATH: the current directory
+# and the directory of this module, which ships the SDK libraries.
+SEARCH_PATH = [os.curdir, os.path.dirname(os.path.abspath(__file__))]
+
+_BSTR = None
+
+
+def bstr_type():
+
+    # Returns the BSTR type, importing comtypes on the first call.
+
+    # Returns:
+    # type: comtypes.BSTR, or ctypes.c_wchar_p where comtypes is not available.
+
+    global _BSTR
+    if _BSTR is None:
+        try:
+            from comtypes import BSTR
+        except ImportError:
+            # comtypes is Windows only, plain wide strings are enough for stub libraries.
+            BSTR = ctypes.c_wchar_p
+        _BSTR = BSTR
+    return _BSTR
+
+# MLAPI status values.
+MLAPI_OK = 0
+MLAPI_ERROR = -1
+MLAPI_TIMEOUT = -2
+MLAPI_NO_IMPLEMENTED = -3
+MLAPI_NOT_INITIALIZED = -4
+MLAPI_INVALID_ARGUMENT = -101
+MLAPI_DEVICE_NOT_FOUND = -102
+MLAPI_NOT_SUPPORTED = -103
 
 
 class SAFEARRAYBOUND(ctypes.Structure):
@@ -23,7 +99,393 @@ class SAFEARRAY(ctypes.Structure):
     ]
 
 
+# Copies the BSTR elements of a SAFEARRAY returned by the SDK into a list.
+def read_bstr_array(pArray):
+
+    # Parameters:
+    # pArray (POINTER(SAFEARRAY)): A one dimensional SAFEARRAY of BSTRs.
+
+    # Returns:
+    # list: The elements as str, copied out of the array so they stay valid after it
+    # is freed. comtypes.BSTR elements are ctypes objects pointing into the array.
+
+    count = pArray.contents.rgsabound[0].cElements
+    elements = cast(pArray.contents.pvData, POINTER(bstr_type()))[:count]
+    return [element if isinstance(element, str) else element.value or "" for element in elements]
+
+
+# Frees a SAFEARRAY returned by the SDK with the backend's SafeArrayDestroy.
+def free_array(pArray, backend=None):
+
+    # Parameters:
+    # pArray (POINTER(SAFEARRAY)): The array, NULL pointers are ignored.
+    # backend: The backend that returned the array, the current one by default.
+
+    if pArray:
+        destroy = getattr(mlapi if backend is None else backend, "SafeArrayDestroy", None)
+        if destroy is not None:
+            destroy(pArray)
+
+
+# Frees a BSTR returned by the SDK with the backend's SysFreeString.
+def free_string(bstr, backend=None):
+
+    # Parameters:
+    # bstr (BSTR): The string, NULL strings are ignored.
+    # backend: The backend that returned the string, the current one by default.
+
+    if bstr:
+        free = getattr(mlapi if backend is None else backend, "SysFreeString", None)
+        if free is not None:
+            free(bstr)
+
+
+class SdkArray:
+
+    # Owns a SAFEARRAY the SDK returns through a SAFEARRAY** out parameter.
+
+    # As a context manager it yields the POINTER(SAFEARRAY) to pass with byref() and
+    # frees the array when the block exits, so results must be copied out inside it:
+    #
+    #     with SdkArray() as pLedStyles:
+    #         status = mlapi.MLAPI_GetLedInfo(device_type, index, byref(name), byref(pLedStyles))
+    #         styles = tuple(read_bstr_array(pLedStyles))
+
+    __slots__ = ("pointer", "backend")
+
+    def __init__(self):
+        self.pointer = POINTER(SAFEARRAY)()
+        self.backend = None
+
+    def __enter__(self):
+        self.backend = mlapi
+        return self.pointer
+
+    def __exit__(self, *exc_info):
+        free_array(self.pointer, self.backend)
+        self.pointer = None
+
+
+class SdkString:
+
+    # Owns a BSTR the SDK returns through a BSTR* out parameter, like SdkArray.
+
+    __slots__ = ("bstr", "backend")
+
+    def __init__(self):
+        self.bstr = (_BSTR or bstr_type())()
+        self.backend = None
+
+    def __enter__(self):
+        self.backend = mlapi
+        return self.bstr
+
+    def __exit__(self, *exc_info):
+        free_string(self.bstr, self.backend)
+        self.bstr = None
+
+
+# Names of all MLAPI functions wrapped below.
+FUNCTIONS = (
+    "MLAPI_GetErrorMessage",
+    "MLAPI_Initialize",
+    "MLAPI_Release",
+    "MLAPI_GetDeviceInfo",
+    "MLAPI_GetDeviceName",
+    "MLAPI_GetDeviceNameEx",
+    "MLAPI_GetLedInfo",
+    "MLAPI_GetLedName",
+    "MLAPI_GetLedColor",
+    "MLAPI_GetLedStyle",
+    "MLAPI_GetLedMaxBright",
+    "MLAPI_GetLedBright",
+    "MLAPI_GetLedMaxSpeed",
+    "MLAPI_GetLedSpeed",
+    "MLAPI_SetLedStyle",
+    "MLAPI_SetLedBright",
+    "MLAPI_SetLedSpeed",
+    "MLAPI_SetLedColor",
+    "MLAPI_SetLedColorsSync",
+    "MLAPI_SetLedColors",
+    "MLAPI_SetLedColorEx",
+)
+
+_prototypes = None
+_functypes = None
+
+
+def prototypes():
+
+    # Returns the prototypes of all MLAPI functions: name -> (restype, argtypes).
+    # They are built on the first call, since they need the BSTR type.
+
+    global _prototypes
+    if _prototypes is None:
+        BSTR = bstr_type()
+        _prototypes = {
+            "MLAPI_GetErrorMessage": (c_int, (c_int, POINTER(BSTR))),
+            "MLAPI_Initialize": (c_int, ()),
+            "MLAPI_Release": (c_int, ()),
+            "MLAPI_GetDeviceInfo": (c_int, (POINTER(POINTER(SAFEARRAY)), POINTER(POINTER(SAFEARRAY)))),
+            "MLAPI_GetDeviceName": (c_int, (BSTR, POINTER(POINTER(SAFEARRAY)))),
+            "MLAPI_GetDeviceNameEx": (c_int, (BSTR, DWORD, POINTER(BSTR))),
+            "MLAPI_GetLedInfo": (c_int, (BSTR, DWORD, POINTER(BSTR), POINTER(POINTER(SAFEARRAY)))),
+            "MLAPI_GetLedName": (c_int, (BSTR, POINTER(POINTER(SAFEARRAY)))),
+            "MLAPI_GetLedColor": (c_int, (BSTR, DWORD, POINTER(DWORD), POINTER(DWORD), POINTER(DWORD))),
+            "MLAPI_GetLedStyle": (c_int, (BSTR, DWORD, POINTER(BSTR))),
+            "MLAPI_GetLedMaxBright": (c_int, (BSTR, DWORD, POINTER(DWORD))),
+            "MLAPI_GetLedBright": (c_int, (BSTR, DWORD, POINTER(DWORD))),
+            "MLAPI_GetLedMaxSpeed": (c_int, (BSTR, DWORD, POINTER(DWORD))),
+            "MLAPI_GetLedSpeed": (c_int, (BSTR, DWORD, POINTER(DWORD))),
+            "MLAPI_SetLedStyle": (c_int, (BSTR, DWORD, BSTR)),
+            "MLAPI_SetLedBright": (c_int, (BSTR, DWORD, DWORD)),
+            "MLAPI_SetLedSpeed": (c_int, (BSTR, DWORD, DWORD)),
+            "MLAPI_SetLedColor": (c_int, (BSTR, DWORD, DWORD, DWORD, DWORD)),
+            "MLAPI_SetLedColorsSync": (c_int, (BSTR, DWORD, DWORD, DWORD)),
+            "MLAPI_SetLedColors": (
+                c_int,
+                (BSTR, DWORD, POINTER(POINTER(SAFEARRAY)), POINTER(DWORD), POINTER(DWORD), POINTER(DWORD)),
+            ),
+            "MLAPI_SetLedColorEx": (c_int, (BSTR, DWORD, BSTR, DWORD, DWORD, DWORD, DWORD)),
+        }
+    return _prototypes
+
+
+def functypes():
+
+    # Returns the function types of all MLAPI functions, built once per prototype and
+    # shared by every loaded library.
+
+    global _functypes
+    if _functypes is None:
+        _functypes = {name: CFUNCTYPE(restype, *argtypes) for name, (restype, argtypes) in prototypes().items()}
+    return _functypes
+
+
+# PROTOTYPES, FUNCTYPES and BSTR are built on first access.
+def __getattr__(name):
+    if name == "PROTOTYPES":
+        return prototypes()
+    if name == "FUNCTYPES":
+        return functypes()
+    if name == "BSTR":
+        return bstr_type()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Returns oleaut32's SafeArrayDestroy on Windows, None elsewhere. oleaut32 is only
+# loaded together with the SDK library.
+@lru_cache(maxsize=None)
+def _safe_array_destroy():
+    if os.name != "nt":
+        return None
+    function = ctypes.oledll.oleaut32.SafeArrayDestroy
+    function.argtypes = (POINTER(SAFEARRAY),)
+    return function
+
+
+# Releases nothing, for memory the caller does not own.
+def _keep(allocation):
+    return 0
+
+
+class MLAPI:
+
+    # Holds every MLAPI function of a loaded library, resolved and typed once.
+
+    # Each attribute is a foreign function created from functypes(), so calling
+    # mlapi.MLAPI_SetLedColor(...) costs a single slot lookup and no argtypes/restype
+    # reassignment.
+
+    # Parameters:
+    # lib (CDLL): The loaded Mystic Light SDK library (or a stub exporting the same symbols).
+
+    __slots__ = FUNCTIONS + ("SafeArrayDestroy", "SysFreeString")
+
+    def __init__(self, lib):
+        for name, functype in functypes().items():
+            setattr(self, name, functype((name, lib)))
+        # SAFEARRAYs returned by the SDK come from SafeArrayCreate. comtypes BSTRs free
+        # themselves with SysFreeString when they are collected, and stub libraries
+        # return static memory.
+        self.SafeArrayDestroy = _safe_array_destroy() or _keep
+        self.SysFreeString = _keep
+
+
+# Finds the Mystic Light SDK library.
+def find_library():
+
+    # Looks for the library in this order:
+    # 1. The file named by the MLSDK_PATH environment variable.
+    # 2. LIBRARY_NAMES in the directories of the MLSDK_SEARCH_PATH environment variable,
+    #    separated by os.pathsep.
+    # 3. LIBRARY_NAMES in the directories of SEARCH_PATH.
+
+    # Returns:
+    # str: The path of the library.
+
+    # Raises:
+    # FileNotFoundError: If the library is not found.
+
+    path = os.environ.get("MLSDK_PATH")
+    if path:
+        return path
+    directories = [d for d in os.environ.get("MLSDK_SEARCH_PATH", "").split(os.pathsep) if d] + SEARCH_PATH
+    for directory in directories:
+        for name in LIBRARY_NAMES:
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                return os.path.abspath(path)
+    raise FileNotFoundError(f"{' or '.join(LIBRARY_NAMES)} not found in {os.pathsep.join(directories)}")
+
+
+# Loads the Mystic Light SDK library and binds all MLAPI functions.
+def load_library(path=None):
+
+    # Loads the library once and binds every MLAPI function from PROTOTYPES.
+
+    # Parameters:
+    # path (str): Path to mlsdk64.dll or any library exporting the MLAPI functions.
+    # If None, the library is looked up with find_library().
+
+    # Returns:
+    # MLAPI: The bound functions, also available as the module level mlapi.
+
+    # Raises:
+    # FileNotFoundError: If path is None and the library is not found.
+
+    global dll, mlapi
+    if path is None:
+        path = find_library()
+    dll = ctypes.CDLL(path)
+    mlapi = MLAPI(dll)
+    return mlapi
+
+
+# Replaces the bound MLAPI functions with another backend.
+def use_backend(backend):
+
+    # Makes all wrappers call the given backend instead of the loaded library.
+
+    # A backend is any object with an attribute for every name in PROTOTYPES, called
+    # exactly like the bound foreign functions: out parameters are passed with byref()
+    # and every function returns an MLAPI status value. MLAPI instances and
+    # msi_sim.SimulatedBackend are backends. A backend may also provide SafeArrayDestroy
+    # and SysFreeString to free the SAFEARRAYs and BSTRs it returns.
+
+    # Backends wrapping another one, like msi_metrics.InstrumentedBackend, keep it in
+    # their backend attribute. The SDK session belongs to the innermost backend, so
+    # swapping wrappers in or out keeps it initialized.
+
+    # Parameters:
+    # backend: The backend to use, or None to load the library again on initialize_dll().
+
+    # Returns:
+    # The previously used backend.
+
+    global mlapi
+    previous = mlapi
+    mlapi = backend
+    if _session(backend) is not _session(previous):
+        _new_session()
+    return previous
+
+
+class MysticLightError(Exception):
+
+    # Raised when an MLAPI function returns a status other than MLAPI_OK.
+    # Every documented status value has its own subclass, see error_for().
+
+    # Attributes:
+    # code (int): The MLAPI status value.
+    # description (str): The SDK's description of the status.
+
+    code = MLAPI_ERROR
+
+    def __init__(self, code=None, description=None):
+        if code is not None:
+            self.code = code
+        self.description = description
+        super().__init__(f"{description} ({self.code})" if description else f"MLAPI status {self.code}")
+
+
+class GenericError(MysticLightError):
+    code = MLAPI_ERROR
+
+
+class SdkTimeoutError(MysticLightError):
+    code = MLAPI_TIMEOUT
+
+
+class NoImplementedError(MysticLightError):
+    code = MLAPI_NO_IMPLEMENTED
+
+
+class NotInitializedError(MysticLightError):
+    code = MLAPI_NOT_INITIALIZED
+
+
+class InvalidArgumentError(MysticLightError):
+    code = MLAPI_INVALID_ARGUMENT
+
+
+class DeviceNotFoundError(MysticLightError):
+    code = MLAPI_DEVICE_NOT_FOUND
+
+
+class NotSupportedError(MysticLightError):
+    code = MLAPI_NOT_SUPPORTED
+
+
+# MLAPI status value -> exception class.
+ERRORS = {
+    cls.code: cls
+    for cls in (
+        GenericError,
+        SdkTimeoutError,
+        NoImplementedError,
+        NotInitializedError,
+        InvalidArgumentError,
+        DeviceNotFoundError,
+        NotSupportedError,
+    )
+}
+
+# Statuses worth retrying, see RetryPolicy.
+TRANSIENT_ERRORS = frozenset({MLAPI_ERROR, MLAPI_TIMEOUT})
+
+# MLAPI status value -> description, filled by get_error_message().
+_error_messages = {}
+
+
 # int MLAPI_GetErrorMessage(int ErrorCode, BSTR* pDesc)
+def get_error_message(error_code):
+
+    # Returns the description of an error code.
+
+    # The SDK is asked only once per code, later calls are answered from memory.
+
+    # Parameters:
+    # error_code (int): The error code for which the corresponding error message needs to be retrieved.
+
+    # Returns:
+    # str: The description of the error code.
+
+    # Raises:
+    # MysticLightError: If the SDK cannot describe the code. Nothing is cached then, so
+    # the next call asks again.
+
+    description = _error_messages.get(error_code)
+    if description is None:
+        with SdkString() as error_desc:
+            status = mlapi.MLAPI_GetErrorMessage(error_code, byref(error_desc))
+            if status != 0:
+                # Not error_for(), which would ask for a description again.
+                raise ERRORS.get(status, MysticLightError)(status)
+            description = _error_messages[error_code] = error_desc.value
+    return description
+
+
 def error_message(error_code):
 
     # Prints the error message corresponding to the given error code.
@@ -34,11 +496,88 @@ def error_message(error_code):
     # Returns:
     # None. The function prints the error message directly.
 
-    dll.MLAPI_GetErrorMessage.argtypes = [c_int, POINTER(BSTR)]
-    dll.MLAPI_GetErrorMessage.restype = c_int
-    error_desc = BSTR()
-    dll.MLAPI_GetErrorMessage(error_code, byref(error_desc))
-    print(error_desc.value)
+    print(get_error_message(error_code))
+
+
+def error_for(status):
+
+    # Builds the exception for an MLAPI status.
+
+    # Parameters:
+    # status (int): A status other than MLAPI_OK returned by an MLAPI function.
+
+    # Returns:
+    # MysticLightError: An instance of the subclass registered in ERRORS for the status,
+    # or of MysticLightError for undocumented statuses.
+
+    try:
+        description = get_error_message(status)
+    except Exception:
+        description = None
+    return ERRORS.get(status, MysticLightError)(status, description)
+
+
+class RetryPolicy:
+
+    # Retries calls failing with a transient MLAPI status, waiting with exponential backoff.
+    # SdkWorker runs its commands through msi_worker.DEFAULT_RETRY unless given another
+    # policy.
+
+    # Parameters:
+    # attempts (int): Maximum number of calls, including the first one.
+    # backoff (float): Seconds to wait before the first retry.
+    # factor (float): Multiplier of the wait after every retry.
+    # max_backoff (float): Upper limit of the wait.
+    # transient (set of int): Statuses that are retried, TRANSIENT_ERRORS by default.
+
+    # Raises:
+    # ValueError: If attempts is less than 1.
+
+    def __init__(self, attempts=3, backoff=0.05, factor=2.0, max_backoff=1.0, transient=TRANSIENT_ERRORS):
+        if attempts < 1:
+            raise ValueError(f"attempts must be at least 1, got {attempts}")
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+        self.transient = frozenset(transient)
+
+    def call(self, function, *args, **kwargs):
+
+        # Calls function(*args, **kwargs), retrying it on transient errors.
+
+        # Returns:
+        # The function's return value.
+
+        # Raises:
+        # MysticLightError: The last error, or any error that is not transient.
+
+        delay = self.backoff
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return function(*args, **kwargs)
+            except MysticLightError as e:
+                if e.code not in self.transient or attempt == self.attempts:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * self.factor, self.max_backoff)
+
+
+# Starts a new session generation, dropping state cached about the devices.
+def _new_session():
+    global session_generation
+    session_generation += 1
+    _led_names.clear()
+    _checked_names.clear()
+
+
+# Returns the innermost backend of a chain of wrapping backends, which owns the session.
+def _session(backend):
+    while True:
+        inner = getattr(backend, "backend", None)
+        if inner is None:
+            return backend
+        backend = inner
 
 
 # int MLAPI_Initialize()
@@ -47,23 +586,32 @@ def initialize_dll():
     # Initializes the Mystic Light SDK DLL.
 
     # This function calls the MLAPI_Initialize function from the DLL to initialize the SDK.
-    # It prints a success message if the initialization is successful, or calls the error_message
-    # function to print the corresponding error message if the initialization fails.
+    # The library is loaded with load_library() first if it was not loaded yet. Calling
+    # it again does nothing until release_dll() is called or the backend is replaced.
+    # It logs a message if the initialization is successful, or raises the
+    # MysticLightError matching the status if the initialization fails.
 
     # Parameters:
     # None.
 
     # Returns:
-    # None. The function prints the result directly.
+    # None.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    dll.MLAPI_Initialize.argtypes = []
-    dll.MLAPI_Initialize.restype = c_int
-    status = dll.MLAPI_Initialize()
+    global _initialized
+    if mlapi is None:
+        load_library()
+    elif _initialized is _session(mlapi):
+        return
+    status = mlapi.MLAPI_Initialize()
     if status == 0:
-        print("DLL Initialized successfully.")
+        _initialized = _session(mlapi)
+        _new_session()
+        log.info("DLL initialized.")
     else:
-        error_message(status)
-        exit()
+        raise error_for(status)
 
 
 # int MLAPI_Release()
@@ -72,62 +620,96 @@ def release_dll():
     # Releases the Mystic Light SDK DLL.
 
     # This function calls the MLAPI_Release function from the DLL to release the SDK.
-    # It prints a success message if the release is successful, or calls the error_message
-    # function to print the corresponding error message if the release fails.
+    # It logs a message if the release is successful, or raises the
+    # MysticLightError matching the status if the release fails.
 
     # Parameters:
     # None.
 
     # Returns:
-    # None. The function prints the result directly.
+    # None.
 
-    dll.MLAPI_Release.argtypes = []
-    dll.MLAPI_Release.restype = c_int
-    status = dll.MLAPI_Release()
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    global _initialized
+    status = mlapi.MLAPI_Release()
+    _initialized = None
     if status == 0:
-        print("DLL released successfully.")
+        log.info("DLL released.")
     else:
-        error_message(status)
-        exit()
+        raise error_for(status)
+
+
+# Name tuple -> (tuple, set of its names). Keyed by identity, so a lookup does not hash
+# the whole tuple; entries keep their tuple alive, so its id is not reused meanwhile.
+_name_sets = {}
+
+
+# Returns the set of enumerated names for O(1) membership tests.
+def _name_set(names):
+    if not isinstance(names, tuple):
+        return frozenset(names)
+    entry = _name_sets.get(id(names))
+    if entry is None or entry[0] is not names:
+        if len(_name_sets) >= 256:
+            _name_sets.clear()
+        entry = _name_sets[id(names)] = (names, frozenset(names))
+    return entry[1]
+
+
+# Resolves a name or an ordinal against enumerated names. Booleans are neither.
+def _select(names, selection, error, what):
+    if isinstance(selection, int) and not isinstance(selection, bool):
+        if 0 <= selection < len(names):
+            return names[selection]
+    elif isinstance(selection, str) and selection in _name_set(names):
+        return selection
+    raise error(error.code, f"{what} {selection!r} is not one of {list(names)}")
 
 
 # int MLAPI_GetDeviceInfo(SAFEARRAY** pDevType, SAFEARRAY** pLedCount)
-def get_device_info():
+def get_devices():
 
-    # Retrieves information about connected devices and their LED counts.
+    # Retrieves the connected devices and their LED counts.
 
     # This function calls the MLAPI_GetDeviceInfo function from the DLL to obtain
-    # the types of devices and the number of LEDs each device has. It then prompts
-    # the user to select a device from the list.
+    # the types of devices and the number of LEDs each device has.
 
     # Returns:
-    #     tuple: A tuple containing the selected device type (BSTR) and the number
-    #            of LEDs (int) for the selected device. Returns None if the device
-    #            selection is invalid or an error occurs.
+    # dict: Device type (str) -> number of LEDs (int), in the order the SDK reports them.
 
-    dll.MLAPI_GetDeviceInfo.argtypes = [
-        POINTER(POINTER(SAFEARRAY)),
-        POINTER(POINTER(SAFEARRAY)),
-    ]
-    dll.MLAPI_GetDeviceInfo.restype = c_int
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    pDevType = POINTER(SAFEARRAY)()
-    pLedCount = POINTER(SAFEARRAY)()
-    status = dll.MLAPI_GetDeviceInfo(byref(pDevType), byref(pLedCount))
-    if status != 0:
-        error_message(status)
-        exit()
-    else:
-        device_types = cast(pDevType.contents.pvData, POINTER(BSTR))
-        led_counts = cast(pLedCount.contents.pvData, POINTER(BSTR))
-        for i in range(pDevType.contents.rgsabound[0].cElements):
-            print(f"{i}: Device Type: {device_types[i]}, LED Count: {led_counts[i]}")
-        try:
-            n = int(input("Choose device: "))
-            return device_types[n], int(led_counts[n])
-        except (ValueError, TypeError):
-            print("The device is specified incorrectly.")
-            return None
+    with SdkArray() as pDevType, SdkArray() as pLedCount:
+        status = mlapi.MLAPI_GetDeviceInfo(byref(pDevType), byref(pLedCount))
+        if status != 0:
+            raise error_for(status)
+        return dict(zip(read_bstr_array(pDevType), (int(count) for count in read_bstr_array(pLedCount))))
+
+
+def get_device_info(device_type, devices=None):
+
+    # Retrieves the LED count of a device.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device, one of the keys of get_devices().
+    # devices (dict): The result of get_devices(), to validate without an SDK call.
+
+    # Returns:
+    # tuple: The device type (BSTR) and the number of LEDs (int) of the device.
+
+    # Raises:
+    # DeviceNotFoundError: If there is no such device.
+    # MysticLightError: If the SDK returns an error status.
+
+    if devices is None:
+        devices = get_devices()
+    leds_count = devices.get(device_type)
+    if leds_count is None:
+        raise DeviceNotFoundError(MLAPI_DEVICE_NOT_FOUND, f"Device {device_type!r} is not one of {list(devices)}")
+    return device_type, leds_count
 
 
 # int MLAPI_GetDeviceName(BSTR type, SAFEARRAY** pDevName)
@@ -143,21 +725,18 @@ def get_device_name(device_type):
     # device_type (BSTR): The type of the device for which the name is to be retrieved.
 
     # Returns:
-    # None. The function prints the device name directly. If an error occurs, it prints
-    # the error message and exits the program.
+    # list: The friendly names of the device.
 
-    dll.MLAPI_GetDeviceName.argtypes = [
-        BSTR,
-        POINTER(POINTER(SAFEARRAY)),
-    ]
-    dll.MLAPI_GetDeviceName.restype = c_int
-    pDevName = POINTER(SAFEARRAY)()
-    status = dll.MLAPI_GetDeviceName(device_type, byref(pDevName))
-    if status != 0:
-        error_message(status)
-        exit()
-    else:
-        print(pDevName.contents.pvData)
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    with SdkArray() as pDevName:
+        status = mlapi.MLAPI_GetDeviceName(device_type, byref(pDevName))
+        if status != 0:
+            raise error_for(status)
+        names = read_bstr_array(pDevName)
+    log.debug("Names of %s: %s", device_type, names)
+    return names
 
 
 # int MLAPI_GetDeviceNameEx(BSTR type, DWORD index, BSTR* pDevName)
@@ -173,23 +752,18 @@ def get_device_name_ex(device_type, index):
     # index (DWORD): The index of the device within the specified type.
 
     # Returns:
-    # str: The name of the device if successful. If an error occurs, the function
-    # prints the error message and exits the program.
+    # str: The name of the device.
 
-    dll.MLAPI_GetDeviceNameEx.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(BSTR),
-    ]
-    dll.MLAPI_GetDeviceNameEx.restype = c_int
-    pDevName = BSTR()
-    status = dll.MLAPI_GetDeviceNameEx(device_type, index, byref(pDevName))
-    if status != 0:
-        error_message(status)
-        exit()
-    else:
-        print(index, ":", pDevName.value)
-        return pDevName.value
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    with SdkString() as pDevName:
+        status = mlapi.MLAPI_GetDeviceNameEx(device_type, index, byref(pDevName))
+        if status != 0:
+            raise error_for(status)
+        name = pDevName.value
+    log.debug("Name of %s %d: %s", device_type, index, name)
+    return name
 
 
 # int MLAPI_GetLedInfo(BSTR type, DWORD index, BSTR* pName, SAFEARRAY** pLedStyles)
@@ -206,26 +780,60 @@ def get_led_info(device_type, index):
     # index (DWORD): The index of the LED within the specified device type.
 
     # Returns:
-    # POINTER(SAFEARRAY): A pointer to a SAFEARRAY containing the available styles
-    # for the specified LED. If an error occurs, the function prints the error
-    # message and exits the program.
-
-    dll.MLAPI_GetLedInfo.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(BSTR),
-        POINTER(POINTER(SAFEARRAY)),
-    ]
-    dll.MLAPI_GetLedInfo.restype = c_int
-    pName = BSTR()
-    pLedStyles = POINTER(SAFEARRAY)()
-    status = dll.MLAPI_GetLedInfo(device_type, index, byref(pName), byref(pLedStyles))
-    if status != 0:
-        error_message(status)
-        exit()
-    else:
-        print(f"\n{pName.value}")
-        return pLedStyles
+    # tuple: The names (str) of the available styles for the specified LED.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    return get_led_info_ex(device_type, index)[1]
+
+
+def get_led_info_ex(device_type, index):
+
+    # Retrieves the name and the available styles of a specific LED on a device.
+
+    # Like get_led_info(), but also returns the LED name MLAPI_GetLedInfo reports.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device containing the LED.
+    # index (DWORD): The index of the LED within the specified device type.
+
+    # Returns:
+    # tuple: The name of the LED (str) and the names (str) of its available styles (tuple).
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    with SdkString() as pName, SdkArray() as pLedStyles:
+        status = mlapi.MLAPI_GetLedInfo(device_type, index, byref(pName), byref(pLedStyles))
+        if status != 0:
+            raise error_for(status)
+        log.debug("LED %d of %s: %s", index, device_type, pName.value)
+        return pName.value, tuple(read_bstr_array(pLedStyles))
+
+
+# int MLAPI_GetLedName(BSTR type, SAFEARRAY** pDevName)
+def get_led_name(device_type):
+
+    # Retrieves the names of all LEDs within the LED areas of a device.
+
+    # This function calls the MLAPI_GetLedName function from the DLL. The names are
+    # used to address single LEDs with set_led_colors() and set_led_color_ex().
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+
+    # Returns:
+    # tuple: The LED names (str).
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    with SdkArray() as pLedName:
+        status = mlapi.MLAPI_GetLedName(device_type, byref(pLedName))
+        if status != 0:
+            raise error_for(status)
+        return tuple(read_bstr_array(pLedName))
 
 
 # int MLAPI_GetLedColor(BSTR type, DWORD index, DWORD* R, DWORD* G, DWORD* B)
@@ -243,23 +851,16 @@ def get_led_color(device_type, index):
 
     # Returns:
     # dict: A dictionary containing the RGB color values with keys 'r', 'g', and 'b'.
-    # If an error occurs, the function prints the error message and exits the program.
-
-    dll.MLAPI_GetLedColor.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(DWORD),
-        POINTER(DWORD),
-        POINTER(DWORD),
-    ]
-    dll.MLAPI_GetLedColor.restype = c_int
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
     r = DWORD()
     g = DWORD()
     b = DWORD()
-    status = dll.MLAPI_GetLedColor(device_type, index, byref(r), byref(g), byref(b))
+    status = mlapi.MLAPI_GetLedColor(device_type, index, byref(r), byref(g), byref(b))
     if status != 0:
-        error_message(status)
-        exit()
+        raise error_for(status)
     else:
         return {"r": r.value, "g": g.value, "b": b.value}
 
@@ -277,22 +878,17 @@ def get_led_style(device_type, index):
     # index (DWORD): The index of the LED within the specified device type.
 
     # Returns:
-    # str: The current style of the LED. If an error occurs, the function prints
-    # the error message and exits the program.
+    # str: The current style of the LED.
 
-    dll.MLAPI_GetLedStyle.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(BSTR),
-    ]
-    dll.MLAPI_GetLedStyle.restype = c_int
-    style = BSTR()
-    status = dll.MLAPI_GetLedStyle(device_type, index, byref(style))
-    if status != 0:
-        error_message(status)
-        exit()
-    else:
-        return style.value
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    with SdkString() as style:
+        status = mlapi.MLAPI_GetLedStyle(device_type, index, byref(style))
+        if status != 0:
+            raise error_for(status)
+        else:
+            return style.value
 
 
 # int MLAPI_GetLedMaxBright(BSTR type, DWORD index, DWORD* maxLevel)
@@ -309,20 +905,15 @@ def get_led_max_bright(device_type, index):
     # index (DWORD): The index of the LED within the specified device type.
 
     # Returns:
-    # int: The maximum brightness level of the LED. If an error occurs, the function
-    # prints the error message and exits the program.
+    # int: The maximum brightness level of the LED.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    dll.MLAPI_GetLedMaxBright.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(DWORD),
-    ]
-    dll.MLAPI_GetLedMaxBright.restype = c_int
     max_level = DWORD()
-    status = dll.MLAPI_GetLedMaxBright(device_type, index, byref(max_level))
+    status = mlapi.MLAPI_GetLedMaxBright(device_type, index, byref(max_level))
     if status != 0:
-        error_message(status)
-        exit()
+        raise error_for(status)
     else:
         return max_level.value
 
@@ -341,20 +932,15 @@ def get_led_bright(device_type, index):
     # index (DWORD): The index of the LED within the specified device type.
 
     # Returns:
-    # int: The current brightness level of the LED. If an error occurs, the function
-    # prints the error message and exits the program.
+    # int: The current brightness level of the LED.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    dll.MLAPI_GetLedBright.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(DWORD),
-    ]
-    dll.MLAPI_GetLedBright.restype = c_int
     current_level = DWORD()
-    status = dll.MLAPI_GetLedBright(device_type, index, byref(current_level))
+    status = mlapi.MLAPI_GetLedBright(device_type, index, byref(current_level))
     if status != 0:
-        error_message(status)
-        exit()
+        raise error_for(status)
     return current_level.value
 
 
@@ -372,20 +958,15 @@ def get_led_max_speed(device_type, index):
     # index (DWORD): The index of the LED within the specified device type.
 
     # Returns:
-    # int: The maximum speed level of the LED. If an error occurs, the function
-    # prints the error message and exits the program
+    # int: The maximum speed level of the LED.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    dll.MLAPI_GetLedMaxSpeed.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(DWORD),
-    ]
-    dll.MLAPI_GetLedMaxSpeed.restype = c_int
     max_level = DWORD()
-    status = dll.MLAPI_GetLedMaxSpeed(device_type, index, byref(max_level))
+    status = mlapi.MLAPI_GetLedMaxSpeed(device_type, index, byref(max_level))
     if status != 0:
-        error_message(status)
-        exit()
+        raise error_for(status)
     return max_level.value
 
 
@@ -403,61 +984,46 @@ def get_led_speed(device_type, index):
     # index (DWORD): The index of the LED within the specified device type.
 
     # Returns:
-    # int: The current speed level of the LED. If an error occurs, the function
-    # prints the error message and exits the program
+    # int: The current speed level of the LED.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    dll.MLAPI_GetLedSpeed.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(DWORD),
-    ]
-    dll.MLAPI_GetLedSpeed.restype = c_int
     current_level = DWORD()
-    status = dll.MLAPI_GetLedSpeed(device_type, index, byref(current_level))
+    status = mlapi.MLAPI_GetLedSpeed(device_type, index, byref(current_level))
     if status != 0:
-        error_message(status)
-        exit()
+        raise error_for(status)
     return current_level.value
 
 
 # int MLAPI_SetLedStyle(BSTR type, DWORD index, BSTR style)
-def set_led_style(device_type, index, pLedStyles):
+def set_led_style(device_type, index, led_styles, style):
 
     # Sets the style of the specified LED on the a device.
 
     # This function calls the MLAPI_SetLedStyle function from the DLL to set
     # the style of the specified LED identified by the given device type and index.
-    # The function accepts a pointer to an array of BSTRs representing the LED styles.
-    # The user is prompted to choose a style from the list and the LED style is
-    # updated accordingly.
+    # The style is checked against the styles of the LED returned by get_led_info().
 
     # Parameters:
     # device_type (BSTR): The type of the device containing the LED.
     # index (DWORD): The index of the LED within the specified device type.
-    # pLedStyles (SAFEARRAY): A safe array containing BSTRs representing the LED styles.
+    # led_styles (tuple): The styles of the LED returned by get_led_info().
+    # style (str or int): The style name or its index in led_styles.
 
     # Returns:
-    # BSTR: The selected LED style. If an error occurs, the function prints the error
-    # message and returns None.
-
-    led_styles = cast(pLedStyles.contents.pvData, POINTER(BSTR))
-    for i in range(pLedStyles.contents.rgsabound[0].cElements):
-        print(f"{i}: {led_styles[i]}")
-    n = int(input("Choose style: "))
-    dll.MLAPI_SetLedStyle.argtypes = [
-        BSTR,
-        DWORD,
-        BSTR,
-    ]
-    dll.MLAPI_SetLedStyle.restype = c_int
-    status = dll.MLAPI_SetLedStyle(device_type, index, led_styles[n])
+    # BSTR: The selected LED style.
+
+    # Raises:
+    # NotSupportedError: If the style is not one of led_styles.
+    # MysticLightError: If the SDK returns an error status.
+
+    style = _select(led_styles, style, NotSupportedError, "Style")
+    status = mlapi.MLAPI_SetLedStyle(device_type, index, style)
     if status != 0:
-        error_message(status)
-        print("Style setting failed.")
-        return None
-    else:
-        print("LED Style updated.\n")
-        return led_styles[n]
+        raise error_for(status)
+    log.debug("Style of %s LED %d set to %s", device_type, index, style)
+    return style
 
 
 # int MLAPI_SetLedBright(BSTR type, DWORD index, DWORD level)
@@ -477,23 +1043,16 @@ def set_led_bright(device_type, index, level):
     # level (DWORD): The brightness level to set for the LED.
 
     # Returns:
-    # bool: True if the brightness level was successfully set, False otherwise. If an
-    # error occurs, the function prints the error message and returns False
+    # bool: True when the brightness level was set.
 
-    dll.MLAPI_SetLedBright.argtypes = [
-        BSTR,
-        DWORD,
-        DWORD,
-    ]
-    dll.MLAPI_SetLedBright.restype = c_int
-    status = dll.MLAPI_SetLedBright(device_type, index, level)
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    status = mlapi.MLAPI_SetLedBright(device_type, index, level)
     if status != 0:
-        error_message(status)
-        print("Bright setting failed.")
-        return None
-    else:
-        print("Bright updated.\n")
-        return True
+        raise error_for(status)
+    log.debug("Brightness of %s LED %d set to %d", device_type, index, level)
+    return True
 
 
 # int MLAPI_SetLedSpeed(BSTR type, DWORD index, DWORD level)
@@ -513,23 +1072,16 @@ def set_led_speed(device_type, index, level):
     # level (DWORD): The effect speed level to set for the LED.
 
     # Returns:
-    # bool: True if the effect speed level was successfully set, False otherwise. If an
-    # error occurs, the function prints the error message and returns False
+    # bool: True when the effect speed level was set.
 
-    dll.MLAPI_SetLedSpeed.argtypes = [
-        BSTR,
-        DWORD,
-        DWORD,
-    ]
-    dll.MLAPI_SetLedSpeed.restype = c_int
-    status = dll.MLAPI_SetLedSpeed(device_type, index, level)
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    status = mlapi.MLAPI_SetLedSpeed(device_type, index, level)
     if status != 0:
-        error_message(status)
-        print("Speed setting failed.")
-        return None
-    else:
-        print("Speed updated.\n")
-        return True
+        raise error_for(status)
+    log.debug("Speed of %s LED %d set to %d", device_type, index, level)
+    return True
 
 
 # int MLAPI_SetLedColor(BSTR type, DWORD index, DWORD R, DWORD G, DWORD B)
@@ -550,26 +1102,16 @@ def set_led_color(device_type, index, r, g, b):
     # B (DWORD): The blue component of the RGB color.
 
     # Returns:
-    # bool: True if the color was successfully set, False otherwise. If an error occurs,
-    # the function prints the error message and returns False
-
-    dll.MLAPI_SetLedColor.argtypes = [
-        BSTR,
-        DWORD,
-        DWORD,
-        DWORD,
-        DWORD,
-    ]
-    dll.MLAPI_SetLedColor.restype = c_int
+    # bool: True when the color was set.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
 
-    status = dll.MLAPI_SetLedColor(device_type, index, r, g, b)
+    status = mlapi.MLAPI_SetLedColor(device_type, index, r, g, b)
     if status != 0:
-        error_message(status)
-        print("Color setting failed.")
-        return None
-    else:
-        print("Color updated.\n")
-        return True
+        raise error_for(status)
+    log.debug("Color of %s LED %d set to %d, %d, %d", device_type, index, r, g, b)
+    return True
 
 
 # int MLAPI_SetLedColorsSync(BSTR type, DWORD R, DWORD G, DWORD B)
@@ -590,70 +1132,60 @@ def set_led_colors_sync(device_type, r, g, b):
     # B (DWORD): The blue component of the RGB color.
 
     # Returns:
-    # bool: True if the colors were successfully set, False otherwise. If an error occurs,
-    # the function prints the error message and returns False
-
-    dll.MLAPI_SetLedColorsSync.argtypes = [
-        BSTR,
-        DWORD,
-        DWORD,
-        DWORD,
-    ]
-    dll.MLAPI_SetLedColorsSync.restype = c_int
-    status = dll.MLAPI_SetLedColorsSync(device_type, r, g, b)
+    # bool: True when the colors were set.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    status = mlapi.MLAPI_SetLedColorsSync(device_type, r, g, b)
     if status != 0:
-        error_message(status)
-        print("Color setting failed.")
-        return None
-    else:
-        print("Colors updated synchronously.\n")
-        return True
+        raise error_for(status)
+    log.debug("Colors of %s set to %d, %d, %d", device_type, r, g, b)
+    return True
 
 
 # int MLAPI_SetLedColors(BSTR type, DWORD index, SAFEARRAY** pLedName, DWORD* R, DWORD* G, DWORD* B)
-def set_led_colors(device_type, index, pLedNames, pR, pG, pB):
+def set_led_colors(device_type, index, led_names, colors):
 
-    # Sets the color of the specified LED on the a device.
-    # (Really don`t know how it works. :)
+    # Sets the colors of several LEDs of an LED area on a device in one call.
 
-    # This function calls the MLAPI_SetLedColors function from the DLL to set
-    # the color of the specified LED identified by the given device type and index.
-    # The function accepts an array of LED names and RGB color values as parameters.
-    # The LED color is updated accordingly.
+    # This function calls the MLAPI_SetLedColors function from the DLL with a SAFEARRAY
+    # of LED names and R, G, B DWORD arrays holding one color per name. The arrays are
+    # cached per thread (see msi_safearray.led_colors_writer()), so repeated calls for
+    # the same LEDs only copy the colors. The names are checked against get_led_name()
+    # once per device and SDK session.
 
     # Parameters:
-    # device_type (BSTR): The type of the device containing the LED.
-    # index (DWORD): The index of the LED within the specified device type.
-    # pLedNames (SAFEARRAY**): A pointer to an array of LED names.
-    # pR (DWORD*): A pointer to an array of red color values.
-    # pG (DWORD*): A pointer to an array of green color values.
-    # pB (DWORD*): A pointer to an array of blue color values.
+    # device_type (BSTR): The type of the device containing the LEDs.
+    # index (DWORD): The index of the LED area within the specified device type.
+    # led_names (sequence of str): The LED names, e.g. from get_led_name().
+    # colors (array_like): One (r, g, b) color per LED name, e.g. a (n, 3) NumPy array.
 
     # Returns:
-    # bool: True if the colors were successfully set, False otherwise. If an error occurs,
-    # the function prints the error message and returns False
-
-    dll.MLAPI_SetLedColors.argtypes = [
-        BSTR,
-        DWORD,
-        POINTER(POINTER(BSTR)),
-        POINTER(DWORD),
-        POINTER(DWORD),
-        POINTER(DWORD),
-    ]
-    dll.MLAPI_SetLedColors.restype = c_int
-    led_names = cast(pLedNames.contents.pvData, POINTER(BSTR))
-    for i in range(pLedNames.contents.rgsabound[0].cElements):
-        print(f"{i}: {led_names[i]}")
-    n = int(input("Choose LED: "))
-    status = dll.MLAPI_SetLedColors(device_type, index, led_names[n], pR, pG, pB)
-    if status != 0:
-        error_message(status)
-        print("Color setting failed.")
-        return None
-    else:
-        print("Color setting completed.")
-        return True
+    # bool: True when the colors were set.
+
+    # Raises:
+    # ValueError: If colors does not have one color per LED name.
+    # InvalidArgumentError: If a name is not returned by get_led_name() for the device,
+    # or a color component is not an integer in 0-255.
+    # MysticLightError: If the SDK returns an error status.
+
+    import msi_safearray
+
+    names = msi_safearray.bstr_array(led_names)
+    if (device_type, names) not in _checked_names:
+        known = _led_names.get(device_type)
+        if known is None:
+            known = _led_names[device_type] = frozenset(get_led_name(device_type))
+        unknown = [name for name in names.names if name not in known]
+        if unknown:
+            raise InvalidArgumentError(MLAPI_INVALID_ARGUMENT, f"{unknown} are not LED names of {device_type}")
+        if len(_checked_names) >= 256:
+            _checked_names.clear()
+        _checked_names.add((device_type, names))
+    msi_safearray.led_colors_writer(device_type, index, names).write(colors)
+    log.debug("Colors of %d LEDs of %s LED %d set", len(names), device_type, index)
+    return True
 
 
 # int MLAPI_SetLedColorEx(BSTR type, DWORD index, BSTR pLedName, DWORD R, DWORD G, DWORD B, DWORD Sync)
@@ -676,35 +1208,36 @@ def set_led_color_ex(device_type, index, pLedName, r, g, b, sync):
     # B (DWORD): The blue component of the RGB color.
     # sync (DWORD): A flag indicating whether to update the LED color synchronously
     # Returns:
-    # bool: True if the color was successfully set, False otherwise. If an error occurs,
-    # the function prints the error message and returns False
-
-    dll.MLAPI_SetLedColorEx.argtypes = [
-        BSTR,
-        DWORD,
-        BSTR,
-        DWORD,
-        DWORD,
-        DWORD,
-        DWORD,
-    ]
-    dll.MLAPI_SetLedColorEx.restype = c_int
-    status = dll.MLAPI_SetLedColorEx(device_type, index, pLedName, r, g, b, sync)
+    # bool: True when the color was set.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    status = mlapi.MLAPI_SetLedColorEx(device_type, index, pLedName, r, g, b, sync)
     if status != 0:
-        error_message(status)
-        print("Color setting failed.")
-        return None
-    else:
-        print("Color updated.\n")
-        return True
+        raise error_for(status)
+    log.debug("Color of %s LED %d %s set to %d, %d, %d", device_type, index, pLedName, r, g, b)
+    return True
 
 
 if __name__ == "__main__":
-    initialize_dll()
-    device_type, leds_count = get_device_info()
+    try:
+        initialize_dll()
+    except MysticLightError as e:
+        print(e)
+        exit()
+    print("DLL Initialized successfully.")
+    devices = get_devices()
+    for i, (device_type, leds_count) in enumerate(devices.items()):
+        print(f"{i} : {device_type} ({leds_count} LEDs)")
+    try:
+        device_type, leds_count = get_device_info(list(devices)[int(input("Choose device: "))], devices)
+    except (ValueError, IndexError):
+        print("Invalid input.")
+        device_type = None
     if device_type:
         for i in range(leds_count):
-            get_device_name_ex(device_type, i)
+            print(i, ":", get_device_name_ex(device_type, i))
         index = int(input("Choose LED: "))
         led_styles = get_led_info(device_type, index)
         style = get_led_style(device_type, index)
@@ -715,7 +1248,7 @@ if __name__ == "__main__":
         led_speed = get_led_speed(device_type, index)
         while True:
             print(f"\nStyle: {style}")
-            print(f"Color: R-{color["r"]} G-{color["g"]} B-{color["b"]}")
+            print(f"Color: R-{color['r']} G-{color['g']} B-{color['b']}")
             print(f"Max Bright Level: {max_bright}")
             print(f"Current Bright Level: {led_bright}")
             print(f"Max Speed Level: {max_speed}")
@@ -735,22 +1268,31 @@ if __name__ == "__main__":
                         int(input(f"Enter {color} (0-255): ")) for color in ["red", "green", "blue"]
                     ]
                     if set_led_color(device_type, index, r, g, b):
+                        print("Color updated.")
                         color = {"r": r, "g": g, "b": b}
                 elif a == 2:
-                    new_style = set_led_style(device_type, index, led_styles)
+                    for i, led_style in enumerate(led_styles):
+                        print(i, ":", led_style)
+                    new_style = set_led_style(device_type, index, led_styles, int(input("Choose style: ")))
                     if new_style:
+                        print("LED Style updated.")
                         style = new_style
                 elif a == 3:
                     bright = int(input(f"Enter brightness level (1-{max_bright}): "))
                     if set_led_bright(device_type, index, bright):
+                        print("Bright updated.")
                         led_bright = bright
                 elif a == 4:
                     speed = int(input(f"Enter speed level (1-{max_speed}): "))
                     if set_led_speed(device_type, index, speed):
+                        print("Speed updated.")
                         led_speed = speed
                 elif a == 0:
                     break
             except ValueError:
                 print("Invalid input. Please enter integer values.")
+            except MysticLightError as e:
+                print(f"Setting failed: {e}")
             continue
-release_dll()
+    release_dll()
+    print("DLL released successfully.")
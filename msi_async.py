@@ -0,0 +1,120 @@
+# asyncio front-end for msi.py.
+#
+# AsyncMysticLight offers an awaitable method for every msi.py wrapper. The calls run
+# on a msi_worker.SdkWorker that owns the SDK, so the event loop never blocks:
+#
+#     async with msi_async.AsyncMysticLight() as ml:
+#         await ml.initialize_dll()
+#         await ml.set_led_color(device_type, 0, 255, 0, 0)
+#         color = await ml.get_led_color(device_type, 0)
+
+import asyncio
+
+import msi
+from msi_worker import SdkWorker
+
+
+class AsyncMysticLight:
+
+    # Awaitable equivalents of the msi.py wrappers.
+
+    # All calls are queued on one SDK worker thread. Reads can be awaited concurrently,
+    # writes run in the order they were issued, and pending writes of the same LED are
+    # coalesced like the SdkWorker setters. Cancelling an awaiting task removes its
+    # command if it has not started yet.
+
+    # Parameters:
+    # max_depth (int): Maximum number of pending SDK commands. When the queue is full,
+    # new commands fail with msi_worker.QueueFull.
+    # worker (SdkWorker): An existing worker to use instead of starting one.
+
+    def __init__(self, max_depth=1024, worker=None):
+        self._owns_worker = worker is None
+        self.worker = SdkWorker(max_depth=max_depth, name="msi-async") if worker is None else worker
+
+    def _call(self, function, *args):
+        return asyncio.wrap_future(self.worker.submit(function, *args))
+
+    async def error_message(self, error_code):
+        return await self._call(msi.error_message, error_code)
+
+    async def initialize_dll(self):
+        return await self._call(msi.initialize_dll)
+
+    async def release_dll(self):
+        return await self._call(msi.release_dll)
+
+    async def get_devices(self):
+        return await self._call(msi.get_devices)
+
+    async def get_device_info(self, device_type, devices=None):
+        return await self._call(msi.get_device_info, device_type, devices)
+
+    async def get_device_name(self, device_type):
+        return await self._call(msi.get_device_name, device_type)
+
+    async def get_device_name_ex(self, device_type, index):
+        return await self._call(msi.get_device_name_ex, device_type, index)
+
+    async def get_led_info(self, device_type, index):
+        return await self._call(msi.get_led_info, device_type, index)
+
+    async def get_led_info_ex(self, device_type, index):
+        return await self._call(msi.get_led_info_ex, device_type, index)
+
+    async def get_led_name(self, device_type):
+        return await self._call(msi.get_led_name, device_type)
+
+    async def get_led_color(self, device_type, index):
+        return await self._call(msi.get_led_color, device_type, index)
+
+    async def get_led_style(self, device_type, index):
+        return await self._call(msi.get_led_style, device_type, index)
+
+    async def get_led_max_bright(self, device_type, index):
+        return await self._call(msi.get_led_max_bright, device_type, index)
+
+    async def get_led_bright(self, device_type, index):
+        return await self._call(msi.get_led_bright, device_type, index)
+
+    async def get_led_max_speed(self, device_type, index):
+        return await self._call(msi.get_led_max_speed, device_type, index)
+
+    async def get_led_speed(self, device_type, index):
+        return await self._call(msi.get_led_speed, device_type, index)
+
+    # The setters submit through the SdkWorker setters, which own the coalescing keys.
+
+    async def set_led_style(self, device_type, index, led_styles, style):
+        return await asyncio.wrap_future(self.worker.set_led_style(device_type, index, led_styles, style))
+
+    async def set_led_bright(self, device_type, index, level):
+        return await asyncio.wrap_future(self.worker.set_led_bright(device_type, index, level))
+
+    async def set_led_speed(self, device_type, index, level):
+        return await asyncio.wrap_future(self.worker.set_led_speed(device_type, index, level))
+
+    async def set_led_color(self, device_type, index, r, g, b):
+        return await asyncio.wrap_future(self.worker.set_led_color(device_type, index, r, g, b))
+
+    async def set_led_colors_sync(self, device_type, r, g, b):
+        return await asyncio.wrap_future(self.worker.set_led_colors_sync(device_type, r, g, b))
+
+    async def set_led_colors(self, device_type, index, led_names, colors):
+        return await asyncio.wrap_future(self.worker.set_led_colors(device_type, index, led_names, colors))
+
+    async def set_led_color_ex(self, device_type, index, pLedName, r, g, b, sync):
+        return await asyncio.wrap_future(self.worker.set_led_color_ex(device_type, index, pLedName, r, g, b, sync))
+
+    async def close(self):
+
+        # Waits for the pending commands and stops the worker if this object started it.
+
+        if self._owns_worker:
+            await asyncio.get_running_loop().run_in_executor(None, self.worker.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,190 @@
+# Write-through LED state cache.
+#
+# LedStateCache answers the msi.py getters from memory. It is filled by a bulk
+# snapshot() and kept current by its setters, which call the msi.py setters and store
+# the new value on success:
+#
+#     cache = msi_cache.LedStateCache(ttl=5.0)
+#     cache.snapshot(device_type, leds_count)
+#     cache.set_led_color(device_type, 0, 255, 0, 0)
+#     cache.get_led_color(device_type, 0)  # no SDK call
+
+import time
+
+import msi
+
+# Cached field -> msi.py getter.
+GETTERS = {
+    "style": "get_led_style",
+    "color": "get_led_color",
+    "max_bright": "get_led_max_bright",
+    "bright": "get_led_bright",
+    "max_speed": "get_led_max_speed",
+    "speed": "get_led_speed",
+}
+
+
+class LedStateCache:
+
+    # Caches LED state keyed by (device_type, index).
+
+    # Every cached value has its own timestamp and expires ttl seconds after it was read
+    # from or written to the SDK. Changes made by other means than the setters of this
+    # class (other processes, msi_frame.push_frame(), ...) are not seen until the values
+    # expire or invalidate() is called.
+
+    # Parameters:
+    # ttl (float): Seconds a cached value stays valid, None to keep values until invalidated.
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _store(self, device_type, index, field, value, now=None):
+        if now is None:
+            now = time.monotonic()
+        self.entries.setdefault((device_type, index), {})[field] = (value, now)
+
+    def snapshot(self, device_type, leds_count):
+
+        # Reads the full state of every LED of a device into the cache.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device.
+        # leds_count (int): The number of LEDs of the device.
+
+        # Returns:
+        # int: The number of values read.
+
+        count = 0
+        for index in range(leds_count):
+            for field, getter in GETTERS.items():
+                self._store(device_type, index, field, getattr(msi, getter)(device_type, index))
+                count += 1
+        return count
+
+    def get(self, device_type, index, field):
+
+        # Returns a cached value, reading it from the SDK on a miss.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device containing the LED.
+        # index (DWORD): The index of the LED within the specified device type.
+        # field (str): One of GETTERS.
+
+        # Returns:
+        # The value the corresponding msi.py getter returns.
+
+        entry = self.entries.get((device_type, index))
+        if entry is not None and field in entry:
+            value, stamp = entry[field]
+            if self.ttl is None or time.monotonic() - stamp < self.ttl:
+                self.hits += 1
+                return value
+        self.misses += 1
+        value = getattr(msi, GETTERS[field])(device_type, index)
+        self._store(device_type, index, field, value)
+        return value
+
+    def peek(self, device_type, index, field):
+
+        # Returns a cached value without reading the SDK.
+
+        # Returns:
+        # The cached value, or None if it is not cached or expired.
+
+        entry = self.entries.get((device_type, index))
+        if entry is not None and field in entry:
+            value, stamp = entry[field]
+            if self.ttl is None or time.monotonic() - stamp < self.ttl:
+                return value
+        return None
+
+    def get_led_style(self, device_type, index):
+        return self.get(device_type, index, "style")
+
+    def get_led_color(self, device_type, index):
+        return dict(self.get(device_type, index, "color"))
+
+    def get_led_max_bright(self, device_type, index):
+        return self.get(device_type, index, "max_bright")
+
+    def get_led_bright(self, device_type, index):
+        return self.get(device_type, index, "bright")
+
+    def get_led_max_speed(self, device_type, index):
+        return self.get(device_type, index, "max_speed")
+
+    def get_led_speed(self, device_type, index):
+        return self.get(device_type, index, "speed")
+
+    def set_led_style(self, device_type, index, led_styles, style):
+        style = msi.set_led_style(device_type, index, led_styles, style)
+        if style:
+            self._store(device_type, index, "style", style)
+        return style
+
+    def set_led_bright(self, device_type, index, level):
+        result = msi.set_led_bright(device_type, index, level)
+        if result:
+            self._store(device_type, index, "bright", level)
+        return result
+
+    def set_led_speed(self, device_type, index, level):
+        result = msi.set_led_speed(device_type, index, level)
+        if result:
+            self._store(device_type, index, "speed", level)
+        return result
+
+    def set_led_color(self, device_type, index, r, g, b):
+        result = msi.set_led_color(device_type, index, r, g, b)
+        if result:
+            self._store(device_type, index, "color", {"r": r, "g": g, "b": b})
+        return result
+
+    def set_led_colors_sync(self, device_type, r, g, b, leds_count=None):
+
+        # Sets the color of all LEDs and updates the cached LEDs of the device, or every
+        # LED if leds_count is given.
+
+        result = msi.set_led_colors_sync(device_type, r, g, b)
+        if result:
+            now = time.monotonic()
+            if leds_count is None:
+                indexes = [key[1] for key in self.entries if key[0] == device_type]
+            else:
+                indexes = range(leds_count)
+            for index in indexes:
+                self._store(device_type, index, "color", {"r": r, "g": g, "b": b}, now)
+        return result
+
+    def invalidate(self, device_type=None, index=None):
+
+        # Drops cached values, so the next reads go to the SDK.
+
+        # Parameters:
+        # device_type (BSTR): The device to drop, or None for all devices.
+        # index (DWORD): The LED to drop, or None for all LEDs of the device.
+
+        if device_type is None:
+            self.entries.clear()
+        elif index is None:
+            for key in [key for key in self.entries if key[0] == device_type]:
+                del self.entries[key]
+        else:
+            self.entries.pop((device_type, index), None)
+
+    def stats(self):
+
+        # Returns:
+        # dict: Hit and miss counters, the hit rate and the number of cached LEDs.
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+        }
@@ -0,0 +1,252 @@
+# Capability index of the connected devices.
+#
+# enumerate_capabilities() walks msi.get_devices() and the LEDs' info once and
+# builds an immutable CapabilityIndex answering capability questions without further
+# SDK calls:
+#
+#     caps = msi_caps.load_or_enumerate("capabilities.json")
+#     if caps.supports(device_type, index, "Rainbow"):
+#         ...
+
+import json
+import os
+import sys
+from collections import namedtuple
+
+import msi
+
+FORMAT_VERSION = 1
+
+LedCaps = namedtuple("LedCaps", "name styles max_bright max_speed")
+DeviceCaps = namedtuple("DeviceCaps", "device_type leds")
+
+
+class CapabilityIndex:
+
+    # Immutable index of devices -> LEDs -> supported styles, max bright and max speed.
+
+    # Style names are interned and numbered: style_ordinals maps every style of every
+    # LED to an ordinal and styles is the reverse table. Indexes compare and hash by
+    # their devices, so they can be used as cache keys.
+
+    # Parameters:
+    # devices (sequence of DeviceCaps): The enumerated devices with a tuple of LedCaps each.
+
+    __slots__ = ("devices", "styles", "style_ordinals", "_leds", "_supported", "_hash")
+
+    def __init__(self, devices):
+        devices = tuple(
+            DeviceCaps(
+                sys.intern(device.device_type),
+                tuple(
+                    LedCaps(led.name, tuple(sys.intern(style) for style in led.styles), led.max_bright, led.max_speed)
+                    for led in device.leds
+                ),
+            )
+            for device in devices
+        )
+        styles = {}
+        for device in devices:
+            for led in device.leds:
+                for style in led.styles:
+                    styles.setdefault(style, len(styles))
+        leds = {}
+        supported = {}
+        for device in devices:
+            for index, led in enumerate(device.leds):
+                leds[device.device_type, index] = led
+                supported[device.device_type, index] = frozenset(led.styles)
+        object.__setattr__(self, "devices", devices)
+        object.__setattr__(self, "styles", tuple(styles))
+        object.__setattr__(self, "style_ordinals", styles)
+        object.__setattr__(self, "_leds", leds)
+        object.__setattr__(self, "_supported", supported)
+        object.__setattr__(self, "_hash", hash(devices))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CapabilityIndex is immutable")
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, CapabilityIndex):
+            return NotImplemented
+        return self.devices == other.devices
+
+    def __repr__(self):
+        return f"CapabilityIndex({len(self.devices)} devices, {len(self._leds)} LEDs, {len(self.styles)} styles)"
+
+    def device_types(self):
+        return [device.device_type for device in self.devices]
+
+    def leds_count(self, device_type):
+        for device in self.devices:
+            if device.device_type == device_type:
+                return len(device.leds)
+        return 0
+
+    def led(self, device_type, index):
+
+        # Returns:
+        # LedCaps: The capabilities of the LED, or None if there is no such LED.
+
+        return self._leds.get((device_type, index))
+
+    def supports(self, device_type, index, style):
+
+        # Checks in O(1) whether an LED supports a style.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device containing the LED.
+        # index (DWORD): The index of the LED within the specified device type.
+        # style (str or int): The style name or its ordinal in style_ordinals.
+
+        # Returns:
+        # bool: True if the LED exists and supports the style.
+
+        # Raises:
+        # TypeError: If style is a bool.
+
+        if isinstance(style, bool):
+            raise TypeError(f"style must be a name or an ordinal, not {style!r}")
+        if isinstance(style, int):
+            if not 0 <= style < len(self.styles):
+                return False
+            style = self.styles[style]
+        return style in self._supported.get((device_type, index), ())
+
+    def matches(self, device_types, led_counts):
+
+        # Checks whether the index still describes the connected devices, as reported
+        # by MLAPI_GetDeviceInfo.
+
+        # Parameters:
+        # device_types (sequence of str): The connected device types.
+        # led_counts (sequence of int): The LED counts of the connected devices.
+
+        # Returns:
+        # bool: True if the devices and their LED counts are the same.
+
+        return [(device.device_type, len(device.leds)) for device in self.devices] == list(
+            zip(device_types, led_counts)
+        )
+
+    def to_dict(self):
+
+        # Returns:
+        # dict: A JSON serializable form with styles stored as ordinals.
+
+        return {
+            "version": FORMAT_VERSION,
+            "styles": list(self.styles),
+            "devices": [
+                {
+                    "type": device.device_type,
+                    "leds": [
+                        [led.name, [self.style_ordinals[style] for style in led.styles], led.max_bright, led.max_speed]
+                        for led in device.leds
+                    ],
+                }
+                for device in self.devices
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+
+        # Builds an index from the output of to_dict().
+
+        # Raises:
+        # ValueError: If the data was written by an unsupported format version.
+
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported capability index version: {data.get('version')}")
+        styles = data["styles"]
+        return cls(
+            DeviceCaps(
+                device["type"],
+                [
+                    LedCaps(name, [styles[ordinal] for ordinal in ordinals], max_bright, max_speed)
+                    for name, ordinals, max_bright, max_speed in device["leds"]
+                ],
+            )
+            for device in data["devices"]
+        )
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+# Reads a maximum level with getter, 0 if the LED does not support it.
+def _level(getter, device_type, index):
+    try:
+        return getter(device_type, index)
+    except msi.NotSupportedError:
+        return 0
+
+
+def enumerate_capabilities():
+
+    # Enumerates all devices and LEDs once.
+
+    # Every LED costs three SDK calls (MLAPI_GetLedInfo, MLAPI_GetLedMaxBright and
+    # MLAPI_GetLedMaxSpeed). LEDs without brightness or speed support get 0.
+
+    # Returns:
+    # CapabilityIndex: The index.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    devices = []
+    for device_type, leds_count in msi.get_devices().items():
+        leds = []
+        for index in range(leds_count):
+            led_name, styles = msi.get_led_info_ex(device_type, index)
+            leds.append(
+                LedCaps(
+                    led_name,
+                    styles,
+                    _level(msi.get_led_max_bright, device_type, index),
+                    _level(msi.get_led_max_speed, device_type, index),
+                )
+            )
+        devices.append(DeviceCaps(device_type, leds))
+    return CapabilityIndex(devices)
+
+
+def load_or_enumerate(path):
+
+    # Loads a saved index for a warm restart, or enumerates and saves a new one.
+
+    # A saved index is only used if MLAPI_GetDeviceInfo still reports the same devices
+    # and LED counts, so a warm restart costs one SDK call instead of a full enumeration.
+
+    # Parameters:
+    # path (str): The file the index is saved to.
+
+    # Returns:
+    # CapabilityIndex: The index.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status.
+
+    if os.path.exists(path):
+        try:
+            index = CapabilityIndex.load(path)
+        except (OSError, ValueError, KeyError, IndexError, TypeError):
+            index = None
+        if index is not None:
+            devices = msi.get_devices()
+            if index.matches(devices.keys(), devices.values()):
+                return index
+    index = enumerate_capabilities()
+    index.save(path)
+    return index
@@ -0,0 +1,196 @@
+# Vectorized colour pipeline.
+#
+# Colour transforms run over whole (n_leds, 3) frames with NumPy instead of per LED in
+# Python. Gamma correction and brightness scaling are combined into one cached
+# 256-entry lookup table per device, so correcting a frame is a single indexing
+# operation:
+#
+#     msi_color.configure(device_type, gamma=2.2, brightness=0.5)
+#     frame = msi_color.hsv_to_rgb(hsv_frame)
+#     msi_color.push_frame(device_type, frame)
+
+from functools import lru_cache
+
+import numpy as np
+
+import msi
+import msi_frame
+
+DEFAULT_GAMMA = 1.0
+DEFAULT_BRIGHTNESS = 1.0
+
+# Device type -> (gamma, brightness), see configure().
+_device_settings = {}
+
+
+def to_uint8(values):
+
+    # Rounds and clamps colour values to the 0-255 range the SDK accepts.
+
+    # Parameters:
+    # values (array_like): Colour values of any shape.
+
+    # Returns:
+    # ndarray: A contiguous uint8 array of the same shape.
+
+    values = np.asarray(values)
+    if values.dtype == np.uint8:
+        return np.ascontiguousarray(values)
+    return np.ascontiguousarray(np.clip(np.rint(values), 0, 255).astype(np.uint8))
+
+
+def hsv_to_rgb(hsv):
+
+    # Converts HSV colours to RGB.
+
+    # Parameters:
+    # hsv (array_like): Array of shape (..., 3) with hue, saturation and value in [0, 1].
+
+    # Returns:
+    # ndarray: uint8 array of shape (..., 3) with R, G, B in 0-255.
+
+    hsv = np.asarray(hsv, dtype=np.float64)
+    h = hsv[..., 0:1]
+    s = hsv[..., 1:2]
+    v = hsv[..., 2:3]
+    k = (h * 6.0 + np.array([5.0, 3.0, 1.0])) % 6.0
+    return to_uint8((v - v * s * np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)) * 255.0)
+
+
+def rgb_to_hsv(rgb):
+
+    # Converts RGB colours to HSV.
+
+    # Parameters:
+    # rgb (array_like): Array of shape (..., 3) with R, G, B in 0-255.
+
+    # Returns:
+    # ndarray: float64 array of shape (..., 3) with hue, saturation and value in [0, 1].
+
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    delta = v - rgb.min(axis=-1)
+    s = np.divide(delta, v, out=np.zeros_like(v), where=v > 0)
+    safe = np.where(delta > 0, delta, 1.0)
+    h = np.select(
+        [delta == 0, v == r, v == g],
+        [0.0, ((g - b) / safe) % 6.0, (b - r) / safe + 2.0],
+        (r - g) / safe + 4.0,
+    )
+    return np.stack([h / 6.0, s, v], axis=-1)
+
+
+@lru_cache(maxsize=64)
+def lut(gamma=DEFAULT_GAMMA, brightness=DEFAULT_BRIGHTNESS):
+
+    # Returns the cached 256-entry table applying gamma and then brightness scaling.
+
+    # Parameters:
+    # gamma (float): Gamma exponent, 1.0 for none. Values above 1 darken mid tones,
+    # which compensates the linear response of most LEDs.
+    # brightness (float): Scale in [0, 1] applied after gamma correction.
+
+    # Returns:
+    # ndarray: Read-only uint8 array of 256 entries.
+
+    # Raises:
+    # ValueError: If gamma is not positive.
+
+    if not gamma > 0:
+        raise ValueError(f"gamma must be positive, got {gamma}")
+    levels = np.arange(256, dtype=np.float64) / 255.0
+    table = to_uint8(255.0 * min(max(brightness, 0.0), 1.0) * levels**gamma)
+    table.flags.writeable = False
+    return table
+
+
+def configure(device_type, gamma=None, brightness=None):
+
+    # Sets the gamma and brightness applied to the frames of a device.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+    # gamma (float): New gamma, None to keep the current one.
+    # brightness (float): New brightness scale in [0, 1], None to keep the current one.
+
+    # Raises:
+    # ValueError: If gamma is not positive.
+
+    if gamma is not None:
+        gamma = float(gamma)
+        if not gamma > 0:
+            raise ValueError(f"gamma must be positive, got {gamma}")
+    current_gamma, current_brightness = _device_settings.get(device_type, (DEFAULT_GAMMA, DEFAULT_BRIGHTNESS))
+    _device_settings[device_type] = (
+        current_gamma if gamma is None else gamma,
+        current_brightness if brightness is None else float(brightness),
+    )
+
+
+def device_lut(device_type):
+
+    # Returns:
+    # ndarray: The lookup table configured for the device.
+
+    return lut(*_device_settings.get(device_type, (DEFAULT_GAMMA, DEFAULT_BRIGHTNESS)))
+
+
+def apply(device_type, frame):
+
+    # Applies the device's gamma and brightness to a frame.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+    # frame (array_like): (n_leds, 3) colours, uint8 or values clamped to 0-255.
+
+    # Returns:
+    # ndarray: The corrected (n_leds, 3) uint8 frame.
+
+    return device_lut(device_type)[to_uint8(frame)]
+
+
+def push_frame(device_type, frame):
+
+    # Corrects a frame and sends it with msi_frame.push_frame().
+
+    # Returns:
+    # The result of msi_frame.push_frame().
+
+    return msi_frame.push_frame(device_type, apply(device_type, frame))
+
+
+# Returns r, g, b corrected with the device's lookup table as ints.
+def _correct(device_type, r, g, b):
+    table = device_lut(device_type)
+    return tuple(int(level) for level in table[to_uint8((r, g, b))])
+
+
+def set_led_color(device_type, index, r, g, b):
+
+    # Corrects one color and sets it with msi.set_led_color().
+
+    # Returns:
+    # The result of msi.set_led_color().
+
+    return msi.set_led_color(device_type, index, *_correct(device_type, r, g, b))
+
+
+def set_led_colors_sync(device_type, r, g, b):
+
+    # Corrects one color and sets it for all LEDs with msi.set_led_colors_sync().
+
+    # Returns:
+    # The result of msi.set_led_colors_sync().
+
+    return msi.set_led_colors_sync(device_type, *_correct(device_type, r, g, b))
+
+
+def set_led_color_ex(device_type, index, pLedName, r, g, b, sync):
+
+    # Corrects one color and sets it with msi.set_led_color_ex().
+
+    # Returns:
+    # The result of msi.set_led_color_ex().
+
+    return msi.set_led_color_ex(device_type, index, pLedName, *_correct(device_type, r, g, b), sync)
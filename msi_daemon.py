@@ -0,0 +1,654 @@
+# Lighting daemon.
+#
+# Daemon holds one initialized SDK session and the enumerated CapabilityIndex, and
+# serves the msi.py wrappers over a local socket, so short-lived scripts skip
+# MLAPI_Initialize and device enumeration. Client is the thin counterpart:
+#
+#     python msi_daemon.py                       # or --simulate on machines without the SDK
+#
+#     with msi_daemon.Client() as client:
+#         client.set_led_color("MSI_MB", 0, 255, 0, 0)
+#         styles = client.get_led_info("MSI_MB", 0)
+#         client.pipeline([("set_led_color", ("MSI_MB", i, 0, 0, 255)) for i in range(6)])
+#
+# The socket is a Unix domain socket where available, a localhost TCP port otherwise.
+# A Unix socket is only accessible by its owner. A TCP port is open to every local
+# process and user, so a TCP daemon writes a random token to token_file(), which only
+# the user can read, and closes connections that do not send it first.
+# The protocol is binary. Every request is a REQUEST header (body length, request id,
+# command ordinal in COMMANDS) followed by the encoded list of arguments, every response
+# a RESPONSE header (body length, request id, status) followed by the encoded result for
+# status 0 or the error description. Status is the MLAPI status of a MysticLightError,
+# or PROTOCOL_ERROR. A connection may send any number of requests before reading the
+# responses, which arrive in request order.
+
+import argparse
+import errno
+import hmac
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+from functools import partial
+
+import msi
+
+log = logging.getLogger(__name__)
+
+# Default address, overridden by the MSI_DAEMON_ADDRESS environment variable (a socket
+# path, or host:port for TCP). A Unix socket is private to the user: it lives in
+# $XDG_RUNTIME_DIR, or carries the user id in the temporary directory, and is only
+# accessible by its owner. Where there are no Unix sockets (Windows), the daemon listens
+# on a localhost port and clients authenticate with a token, see token_file().
+if hasattr(socket, "AF_UNIX"):
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        ADDRESS = os.path.join(os.environ["XDG_RUNTIME_DIR"], "msi-daemon.sock")
+    else:
+        ADDRESS = os.path.join(tempfile.gettempdir(), f"msi-daemon-{os.getuid()}.sock")
+else:
+    ADDRESS = ("127.0.0.1", 47853)
+
+# Commands served, a request carries the ordinal.
+COMMANDS = (
+    "ping",
+    "capabilities",
+    "refresh",
+    "get_devices",
+    "get_device_name",
+    "get_device_name_ex",
+    "get_led_info",
+    "get_led_name",
+    "get_led_color",
+    "get_led_style",
+    "get_led_max_bright",
+    "get_led_bright",
+    "get_led_max_speed",
+    "get_led_speed",
+    "set_led_style",
+    "set_led_bright",
+    "set_led_speed",
+    "set_led_color",
+    "set_led_colors_sync",
+    "set_led_colors",
+    "set_led_color_ex",
+)
+COMMAND_CODES = {name: code for code, name in enumerate(COMMANDS)}
+
+REQUEST = struct.Struct("<IIB")
+RESPONSE = struct.Struct("<IIi")
+
+# Status of requests failing for another reason than an MLAPI status.
+PROTOCOL_ERROR = 1
+
+# Largest accepted body, larger frames close the connection.
+MAX_BODY = 1 << 20
+
+# Bytes of the token a client of a TCP daemon sends before its first request.
+TOKEN_SIZE = 32
+
+_UINT = struct.Struct("<I")
+_INT = struct.Struct("<q")
+
+# Value tags: None, True, False, int, str, bytes, list, dict.
+_NONE, _TRUE, _FALSE, _INT_TAG, _STR, _BYTES, _LIST, _DICT = b"NTFisbld"
+
+
+class DaemonError(Exception):
+    # Raised by Client for requests the daemon could not run, see PROTOCOL_ERROR.
+    pass
+
+
+def encode(value, out):
+
+    # Appends the encoding of a value to out.
+
+    # Parameters:
+    # value: None, a bool, int, str, bytes, list, tuple or dict of such values.
+    # out (bytearray): The buffer.
+
+    # Raises:
+    # TypeError: If the value cannot be encoded.
+
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT_TAG)
+        out += _INT.pack(value)
+    elif isinstance(value, str):
+        data = value.encode()
+        out.append(_STR)
+        out += _UINT.pack(len(data))
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        out.append(_BYTES)
+        out += _UINT.pack(len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        out += _UINT.pack(len(value))
+        for item in value:
+            encode(item, out)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        out += _UINT.pack(len(value))
+        for key, item in value.items():
+            encode(key, out)
+            encode(item, out)
+    else:
+        raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+def decode(data, offset=0):
+
+    # Decodes one value written by encode(). Lists are decoded as tuples.
+
+    # Parameters:
+    # data (bytes): The buffer.
+    # offset (int): Where the value starts.
+
+    # Returns:
+    # tuple: The value and the offset after it.
+
+    # Raises:
+    # ValueError: If the data is not a valid encoding.
+
+    tag = data[offset]
+    offset += 1
+    if tag == _NONE:
+        return None, offset
+    if tag == _TRUE:
+        return True, offset
+    if tag == _FALSE:
+        return False, offset
+    if tag == _INT_TAG:
+        return _INT.unpack_from(data, offset)[0], offset + 8
+    if tag in (_STR, _BYTES, _LIST, _DICT):
+        (length,) = _UINT.unpack_from(data, offset)
+        offset += 4
+        if tag == _STR:
+            return bytes(data[offset : offset + length]).decode(), offset + length
+        if tag == _BYTES:
+            return bytes(data[offset : offset + length]), offset + length
+        if tag == _LIST:
+            items = []
+            for _ in range(length):
+                item, offset = decode(data, offset)
+                items.append(item)
+            return tuple(items), offset
+        items = {}
+        for _ in range(length):
+            key, offset = decode(data, offset)
+            items[key], offset = decode(data, offset)
+        return items, offset
+    raise ValueError(f"invalid value tag {tag}")
+
+
+def parse_address(text):
+
+    # Parameters:
+    # text (str): A socket path, or host:port for TCP.
+
+    # Returns:
+    # The address for Daemon and Client.
+
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit() and os.sep not in host:
+        return host or "127.0.0.1", int(port)
+    return text
+
+
+def default_address():
+    text = os.environ.get("MSI_DAEMON_ADDRESS")
+    return parse_address(text) if text else ADDRESS
+
+
+def token_file(address):
+
+    # Parameters:
+    # address (tuple): The (host, port) of a TCP daemon.
+
+    # Returns:
+    # str: The file the daemon keeps its token in, in the user's local application data
+    # directory on Windows (only accessible by the user) or the home directory.
+
+    directory = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    return os.path.join(directory, f".msi-daemon-{address[1]}.token")
+
+
+# Writes a new token readable only by the user, replacing the file of an earlier daemon.
+def _write_token(path):
+    token = secrets.token_bytes(TOKEN_SIZE)
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token.hex())
+    return token
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    # Serves one connection. Every complete request in the receive buffer is run before
+    # the responses are sent together, so pipelined requests cost one send.
+
+    def handle(self):
+        daemon = self.server.daemon
+        token = daemon.token
+        buffer = bytearray()
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            buffer += data
+            if token is not None:
+                if len(buffer) < TOKEN_SIZE:
+                    continue
+                if not hmac.compare_digest(bytes(buffer[:TOKEN_SIZE]), token):
+                    log.warning("Closing connection without the daemon's token")
+                    return
+                del buffer[:TOKEN_SIZE]
+                token = None
+            out = bytearray()
+            offset = 0
+            while len(buffer) - offset >= REQUEST.size:
+                length, request_id, code = REQUEST.unpack_from(buffer, offset)
+                if length > MAX_BODY:
+                    log.warning("Closing connection sending a %d byte request", length)
+                    return
+                end = offset + REQUEST.size + length
+                if end > len(buffer):
+                    break
+                status, body = daemon.run(code, buffer, offset + REQUEST.size, end)
+                out += RESPONSE.pack(len(body), request_id, status)
+                out += body
+                offset = end
+            del buffer[:offset]
+            if out:
+                self.request.sendall(out)
+
+
+class Daemon:
+
+    # Serves one SDK session to any number of clients.
+
+    # Requests of all connections run one at a time, in the order they are read.
+    # get_devices and get_led_info are answered from the CapabilityIndex without SDK
+    # calls, and set_led_style takes the LED's styles from it, so clients only send the
+    # style name.
+
+    # On TCP, clients authenticate with the token written to token_file(address) on
+    # start, see Client.
+
+    # Parameters:
+    # address: Socket path or (host, port), default_address() by default.
+    # caps_path (str): File the capability index is kept in, see
+    # msi_caps.load_or_enumerate(). None to enumerate on every start.
+
+    def __init__(self, address=None, caps_path=None):
+        self.address = default_address() if address is None else address
+        self.caps_path = caps_path
+        self.caps = None
+        self.requests = 0
+        self.server = None
+        self._lock = threading.Lock()
+        self._thread = None
+        # Inode of the bound socket, so close() only removes its own.
+        self._inode = None
+        # Token TCP clients must send, None on Unix sockets.
+        self.token = None
+        self._commands = [getattr(self, "_" + name, None) or getattr(msi, name) for name in COMMANDS]
+
+    def _ping(self):
+        return None
+
+    def _capabilities(self):
+        return self.caps.to_dict()
+
+    def _refresh(self):
+        import msi_caps
+
+        self.caps = msi_caps.enumerate_capabilities()
+        if self.caps_path:
+            self.caps.save(self.caps_path)
+        return self.caps.to_dict()
+
+    def _get_devices(self):
+        return {device.device_type: len(device.leds) for device in self.caps.devices}
+
+    def _led(self, device_type, index):
+        led = self.caps.led(device_type, index)
+        if led is None:
+            raise msi.DeviceNotFoundError(msi.MLAPI_DEVICE_NOT_FOUND, f"No LED {index} on {device_type!r}")
+        return led
+
+    def _get_led_info(self, device_type, index):
+        return self._led(device_type, index).styles
+
+    def _set_led_style(self, device_type, index, style):
+        return msi.set_led_style(device_type, index, self._led(device_type, index).styles, style)
+
+    def run(self, code, data, start, end):
+
+        # Runs one request.
+
+        # Parameters:
+        # code (int): The command ordinal.
+        # data (bytearray): The receive buffer.
+        # start, end (int): The bounds of the encoded arguments in data.
+
+        # Returns:
+        # tuple: The status and the encoded result or error description.
+
+        out = bytearray()
+        try:
+            if code >= len(COMMANDS):
+                raise ValueError(f"unknown command {code}")
+            args, offset = decode(data, start)
+            if offset != end or not isinstance(args, tuple):
+                raise ValueError("malformed arguments")
+            with self._lock:
+                self.requests += 1
+                result = self._commands[code](*args)
+            encode(result, out)
+            return 0, out
+        except msi.MysticLightError as e:
+            encode(e.description, out)
+            return e.code, out
+        except Exception as e:
+            log.debug("Request %s failed", COMMANDS[code] if code < len(COMMANDS) else code, exc_info=True)
+            encode(f"{type(e).__name__}: {e}", out)
+            return PROTOCOL_ERROR, out
+
+    def start(self):
+
+        # Initializes the SDK, enumerates the devices and serves on a background thread.
+
+        # Raises:
+        # MysticLightError: If the SDK returns an error status.
+        # OSError: If the address cannot be bound, another daemon is serving on it, or
+        # the socket path exists and is not a socket.
+
+        import msi_caps
+
+        if isinstance(self.address, str):
+            _remove_stale_socket(self.address)
+        msi.initialize_dll()
+        self.caps = msi_caps.load_or_enumerate(self.caps_path) if self.caps_path else msi_caps.enumerate_capabilities()
+        if isinstance(self.address, str):
+            self.server = socketserver.ThreadingUnixStreamServer(self.address, _Handler, bind_and_activate=False)
+        else:
+            self.server = socketserver.ThreadingTCPServer(self.address, _Handler, bind_and_activate=False)
+            self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.daemon = self
+        try:
+            if isinstance(self.address, str):
+                # Only the owner may connect; the umask closes the window before chmod.
+                umask = os.umask(0o077)
+                try:
+                    self.server.server_bind()
+                finally:
+                    os.umask(umask)
+                os.chmod(self.address, 0o600)
+                self._inode = os.stat(self.address).st_ino
+            else:
+                self.server.server_bind()
+                self.token = _write_token(token_file(self.address))
+            self.server.server_activate()
+        except OSError:
+            self.server.server_close()
+            raise
+        self._thread = threading.Thread(target=self.server.serve_forever, name="msi-daemon", daemon=True)
+        self._thread.start()
+        log.info("Serving %d devices on %s", len(self.caps.devices), self.address)
+
+    def wait(self):
+        # Blocks until the daemon is closed.
+        self._thread.join()
+
+    def close(self):
+
+        # Stops serving and releases the SDK.
+
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+        self.server = None
+        if isinstance(self.address, str):
+            # Unless another daemon has replaced the socket since.
+            try:
+                if os.stat(self.address).st_ino == self._inode:
+                    os.unlink(self.address)
+            except FileNotFoundError:
+                pass
+        elif self.token is not None:
+            try:
+                os.unlink(token_file(self.address))
+            except FileNotFoundError:
+                pass
+            self.token = None
+        with self._lock:
+            msi.release_dll()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Unlinks a socket left behind by a daemon that is gone.
+def _remove_stale_socket(path):
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(errno.EEXIST, "not a socket, refusing to replace it", path)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise OSError(errno.EADDRINUSE, "a daemon is already serving on this socket", path)
+    finally:
+        probe.close()
+
+
+class Client:
+
+    # Connection to a Daemon.
+
+    # Every command in COMMANDS is a method taking the arguments of the msi.py wrapper
+    # of the same name, except set_led_style(device_type, index, style), which needs no
+    # style list. Failing commands raise the MysticLightError subclass of their status,
+    # or DaemonError.
+
+    # send() queues requests without waiting and receive() returns their results in
+    # order, so many requests share one round trip; pipeline() does both.
+
+    # On TCP, the client sends the daemon's token from token_file() first. A wrong token
+    # makes the daemon close the connection, raising ConnectionError on receive().
+
+    # Parameters:
+    # address: Socket path or (host, port), default_address() by default.
+    # timeout (float): Seconds to wait for the daemon, None to wait forever.
+
+    # Raises:
+    # OSError: If the daemon cannot be reached, or its token file cannot be read.
+    # ValueError: If the token file is corrupt.
+
+    def __init__(self, address=None, timeout=None):
+        address = default_address() if address is None else address
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self._out = bytearray()
+        try:
+            self.socket.connect(address)
+            if family == socket.AF_INET:
+                with open(token_file(address), encoding="ascii") as f:
+                    self._out += bytes.fromhex(f.read().strip())
+        except (OSError, ValueError):
+            self.socket.close()
+            raise
+        if family == socket.AF_INET:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._in = bytearray()
+        self._pending = []
+        self._next_id = 0
+
+    def __getattr__(self, name):
+        if name in COMMAND_CODES:
+            return partial(self.call, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def send(self, command, *args):
+
+        # Queues a request, sent with the next flush().
+
+        # Returns:
+        # int: The request id.
+
+        # Raises:
+        # TypeError: If an argument cannot be encoded.
+
+        body = bytearray()
+        encode(args, body)
+        request_id = self._next_id
+        self._next_id = (request_id + 1) & 0xFFFFFFFF
+        self._out += REQUEST.pack(len(body), request_id, COMMAND_CODES[command])
+        self._out += body
+        self._pending.append(request_id)
+        return request_id
+
+    def flush(self):
+        if self._out:
+            self.socket.sendall(self._out)
+            self._out.clear()
+
+    def _read(self, size):
+        while len(self._in) < size:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("daemon closed the connection")
+            self._in += data
+
+    def receive(self):
+
+        # Waits for the response to the oldest request without one.
+
+        # Returns:
+        # The result of the request.
+
+        # Raises:
+        # MysticLightError: If the SDK returned an error status.
+        # DaemonError: If the daemon could not run the request.
+
+        self.flush()
+        self._read(RESPONSE.size)
+        length, request_id, status = RESPONSE.unpack_from(self._in)
+        self._read(RESPONSE.size + length)
+        value = decode(self._in, RESPONSE.size)[0]
+        del self._in[: RESPONSE.size + length]
+        if request_id != self._pending.pop(0):
+            raise DaemonError(f"response {request_id} out of order")
+        if status == 0:
+            return value
+        if status == PROTOCOL_ERROR:
+            raise DaemonError(value)
+        raise msi.ERRORS.get(status, msi.MysticLightError)(status, value)
+
+    def call(self, command, *args):
+        self.send(command, *args)
+        return self.receive()
+
+    def pipeline(self, calls):
+
+        # Sends requests together and collects their results.
+
+        # Parameters:
+        # calls: (command, args) pairs.
+
+        # Returns:
+        # list: The results in order. Failed requests have the exception in place of
+        # their result.
+
+        count = len(self._pending)
+        for command, args in calls:
+            self.send(command, *args)
+        results = []
+        while len(self._pending) > count:
+            try:
+                results.append(self.receive())
+            except (msi.MysticLightError, DaemonError) as e:
+                results.append(e)
+        return results
+
+    def set_led_style(self, device_type, index, style):
+        return self.call("set_led_style", device_type, index, style)
+
+    def capabilities(self):
+
+        # Returns:
+        # CapabilityIndex: The daemon's capability index.
+
+        import msi_caps
+
+        return msi_caps.CapabilityIndex.from_dict(self.call("capabilities"))
+
+    def close(self):
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Mystic Light SDK to local clients.")
+    parser.add_argument("--address", type=parse_address, help=f"socket path or host:port, default {ADDRESS}")
+    parser.add_argument("--caps", help="file the capability index is kept in")
+    parser.add_argument("--simulate", action="store_true", help="serve the simulated backend of msi_sim")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency of every simulated call")
+    parser.add_argument("--init-latency-ms", type=float, default=0.0, help="latency of simulated MLAPI_Initialize")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if args.simulate:
+        import msi_sim
+
+        msi.use_backend(
+            msi_sim.SimulatedBackend(
+                latency=args.latency_ms / 1000, latencies={"MLAPI_Initialize": args.init_latency_ms / 1000}
+            )
+        )
+    daemon = Daemon(args.address, args.caps)
+    daemon.start()
+    try:
+        daemon.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Frame-rate-locked effect engine.
+#
+# Effects are precomputed once into NumPy tables of shape (n_frames, n_leds, 3) and
+# EffectEngine replays them by index at a fixed frame rate through msi_frame.push_frame():
+#
+#     table = msi_effects.rainbow(leds_count, period=4.0, fps=60)
+#     engine = msi_effects.EffectEngine(device_type, table, fps=60)
+#     engine.run(duration=10)
+#     print(engine.stats())
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+import msi
+import msi_frame
+from msi_color import hsv_to_rgb, to_uint8
+
+
+# Returns the number of frames of one effect period.
+def _frames(period, fps):
+    return max(1, round(period * fps))
+
+
+def solid(n_leds, color):
+
+    # Returns a one frame table with every LED set to color.
+
+    # Parameters:
+    # n_leds (int): The number of LEDs.
+    # color (tuple): R, G, B in 0-255.
+
+    return to_uint8(np.broadcast_to(np.asarray(color, dtype=np.float64), (1, n_leds, 3)))
+
+
+def breathing(n_leds, color, period=2.0, fps=60):
+
+    # Returns a table fading all LEDs in and out of color.
+
+    # Parameters:
+    # n_leds (int): The number of LEDs.
+    # color (tuple): R, G, B in 0-255.
+    # period (float): Seconds of one fade in and out.
+    # fps (int): Frame rate the table is replayed at.
+
+    frames = _frames(period, fps)
+    intensity = (1.0 - np.cos(2.0 * np.pi * np.arange(frames) / frames)) / 2.0
+    return to_uint8(np.broadcast_to(intensity[:, None, None] * np.asarray(color, dtype=np.float64), (frames, n_leds, 3)))
+
+
+def rainbow(n_leds, period=4.0, fps=60, spread=1.0):
+
+    # Returns a table cycling every LED through the hue circle.
+
+    # Parameters:
+    # n_leds (int): The number of LEDs.
+    # period (float): Seconds of one cycle.
+    # fps (int): Frame rate the table is replayed at.
+    # spread (float): Part of the hue circle spread over the LEDs, 0 for all LEDs in sync.
+
+    frames = _frames(period, fps)
+    t = np.arange(frames) / frames
+    offsets = np.arange(n_leds) / max(n_leds, 1) * spread
+    hue = (t[:, None] + offsets[None, :]) % 1.0
+    return hsv_to_rgb(np.stack([hue, np.ones_like(hue), np.ones_like(hue)], axis=-1))
+
+
+def wave(n_leds, color, period=2.0, fps=60, wavelength=None):
+
+    # Returns a table moving a sine wave of color along the LEDs.
+
+    # Parameters:
+    # n_leds (int): The number of LEDs.
+    # color (tuple): R, G, B in 0-255.
+    # period (float): Seconds the wave takes to move one wavelength.
+    # fps (int): Frame rate the table is replayed at.
+    # wavelength (float): Wavelength in LEDs, defaults to n_leds.
+
+    if wavelength is None:
+        wavelength = max(n_leds, 1)
+    frames = _frames(period, fps)
+    t = np.arange(frames) / frames
+    phase = t[:, None] - np.arange(n_leds)[None, :] / wavelength
+    intensity = (1.0 + np.sin(2.0 * np.pi * phase)) / 2.0
+    return to_uint8(intensity[:, :, None] * np.asarray(color, dtype=np.float64))
+
+
+def gradient(n_leds, start, end, period=None, fps=60):
+
+    # Returns a table with a gradient from start to end over the LEDs, scrolling along
+    # them if period is given.
+
+    # Parameters:
+    # n_leds (int): The number of LEDs.
+    # start (tuple): R, G, B in 0-255 of the first LED.
+    # end (tuple): R, G, B in 0-255 of the last LED.
+    # period (float): Seconds of one scroll around the LEDs, None for a static gradient.
+    # fps (int): Frame rate the table is replayed at.
+
+    if period:
+        frames = _frames(period, fps)
+        position = (np.arange(n_leds)[None, :] / max(n_leds, 1) + np.arange(frames)[:, None] / frames) % 1.0
+        # Mirror the scrolling gradient, so it does not jump from end back to start.
+        position = 1.0 - np.abs(2.0 * position - 1.0)
+    else:
+        position = np.linspace(0.0, 1.0, n_leds)[None, :]
+    start = np.asarray(start, dtype=np.float64)
+    end = np.asarray(end, dtype=np.float64)
+    return to_uint8(start + position[:, :, None] * (end - start))
+
+
+class EffectEngine:
+
+    # Replays an effect table at a fixed frame rate.
+
+    # Frame deadlines are computed from the start time, so timing errors do not
+    # accumulate. When the engine falls behind by whole frames, it skips them instead of
+    # trying to catch up. Frames failing with MysticLightError are counted and the
+    # engine keeps running. Frame times (the time the sink took) of the last history frames
+    # are kept for stats().
+
+    # Parameters:
+    # device_type (BSTR): The device the frames are sent to.
+    # table (ndarray): The (n_frames, n_leds, 3) uint8 effect table.
+    # fps (float): The target frame rate.
+    # sink: Function called as sink(device_type, frame), msi_frame.push_frame by default.
+    # history (int): Number of frame times kept for the statistics.
+
+    def __init__(self, device_type, table, fps=60, sink=None, history=1000):
+        self.device_type = device_type
+        self.table = table
+        self.fps = fps
+        self.sink = msi_frame.push_frame if sink is None else sink
+        self.frames = 0
+        self.skipped = 0
+        self.missed = 0
+        self.errors = 0
+        self.frame_times = deque(maxlen=history)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self, duration=None):
+
+        # Replays the table until stop() is called or duration seconds have passed.
+
+        # Parameters:
+        # duration (float): Seconds to run, None to run until stopped.
+
+        self._stop.clear()
+        period = 1.0 / self.fps
+        table = self.table
+        n_frames = len(table)
+        start = time.perf_counter()
+        tick = 0
+        while not self._stop.is_set():
+            deadline = start + tick * period
+            now = time.perf_counter()
+            if duration is not None and now - start >= duration:
+                break
+            if now < deadline:
+                if self._stop.wait(deadline - now):
+                    break
+            else:
+                late = int((now - deadline) / period)
+                if late:
+                    self.skipped += late
+                    tick += late
+                    deadline += late * period
+            begin = time.perf_counter()
+            try:
+                self.sink(self.device_type, table[tick % n_frames])
+            except msi.MysticLightError:
+                # Keep the engine running, a failed frame is sent in full the next time.
+                self.errors += 1
+            end = time.perf_counter()
+            self.frame_times.append(end - begin)
+            if end > deadline + period:
+                self.missed += 1
+            self.frames += 1
+            tick += 1
+
+    def start(self, duration=None):
+
+        # Runs the engine on a background thread.
+
+        # Returns:
+        # Thread: The started thread.
+
+        self._thread = threading.Thread(target=self.run, args=(duration,), name="msi-effects", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def stats(self):
+
+        # Returns:
+        # dict: Frames sent, frames skipped, missed deadlines, failed frames and the
+        # p50/p99 frame time in seconds.
+
+        times = sorted(self.frame_times)
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "missed": self.missed,
+            "errors": self.errors,
+            "p50": times[len(times) // 2] if times else 0.0,
+            "p99": times[min(len(times) - 1, int(len(times) * 0.99))] if times else 0.0,
+        }
@@ -0,0 +1,108 @@
+# Batched frame API.
+#
+# push_frame() sends a whole RGB frame of a device and only talks to the SDK about
+# LEDs that changed since the previous frame:
+#
+#     frame = numpy.zeros((leds_count, 3), numpy.uint8)
+#     frame[0] = (255, 0, 0)
+#     msi_frame.push_frame(device_type, frame)
+
+import msi
+
+# Last frame sent to each device: device type -> frame bytes (R, G, B per LED), valid
+# for the SDK session of msi.session_generation _generation.
+_last_frames = {}
+_generation = None
+
+
+def frame_bytes(frame):
+
+    # Converts a frame to the bytes push_frame() compares, checking its layout.
+
+    # Parameters:
+    # frame (buffer): (leds_count, 3) 8-bit R, G, B values, e.g. a NumPy uint8 array.
+
+    # Returns:
+    # bytes: The frame with three bytes per LED.
+
+    # Raises:
+    # ValueError: If the frame does not have three 8-bit components per LED.
+
+    view = memoryview(frame)
+    if view.itemsize != 1:
+        raise ValueError("frame must contain 8-bit colour components")
+    data = view.tobytes()
+    if len(data) % 3:
+        raise ValueError("frame must contain 3 colour components per LED")
+    return data
+
+
+def push_frame(device_type, frame):
+
+    # Sets the colors of all LEDs of a device from one frame.
+
+    # The frame is compared with the last frame pushed to the same device and only
+    # changed LEDs are sent with MLAPI_SetLedColor. If the whole frame is one color
+    # and more than one LED changed, a single MLAPI_SetLedColorsSync call is used instead.
+    # Row i of the frame is the LED with index i, so a frame should cover every LED of
+    # the device. The last frames are forgotten when the SDK is initialized again or
+    # the backend is replaced; after other writes to the LEDs, call reset_frames().
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+    # frame: A NumPy (n_leds, 3) uint8 array or any buffer-protocol object with
+    # R, G, B bytes per LED (bytes, bytearray, array.array("B"), ...).
+
+    # Returns:
+    # int: The number of SDK calls issued, 0 if the frame did not change.
+
+    # Raises:
+    # MysticLightError: If the SDK returns an error status. The next frame is then
+    # sent in full.
+
+    global _generation
+    data = frame_bytes(frame)
+    if _generation != msi.session_generation:
+        _last_frames.clear()
+        _generation = msi.session_generation
+    last = _last_frames.get(device_type)
+    if data == last:
+        return 0
+    leds_count = len(data) // 3
+    if last is None or len(last) != len(data):
+        changed = range(leds_count)
+    else:
+        changed = [i for i in range(leds_count) if data[3 * i : 3 * i + 3] != last[3 * i : 3 * i + 3]]
+
+    mlapi = msi.mlapi
+    if len(changed) > 1 and data == data[:3] * leds_count:
+        status = mlapi.MLAPI_SetLedColorsSync(device_type, data[0], data[1], data[2])
+        calls = 1
+    else:
+        status = msi.MLAPI_OK
+        calls = 0
+        for i in changed:
+            status = mlapi.MLAPI_SetLedColor(device_type, i, data[3 * i], data[3 * i + 1], data[3 * i + 2])
+            calls += 1
+            if status != 0:
+                break
+    if status != 0:
+        # The device state is unknown now, so the next frame is sent in full.
+        _last_frames.pop(device_type, None)
+        raise msi.error_for(status)
+    _last_frames[device_type] = data
+    return calls
+
+
+def reset_frames(device_type=None):
+
+    # Forgets the last pushed frame, so the next push_frame() sends every LED.
+    # Use it after the LEDs were changed by other means (other setters, styles, other apps).
+
+    # Parameters:
+    # device_type (BSTR): The device to forget, or None for all devices.
+
+    if device_type is None:
+        _last_frames.clear()
+    else:
+        _last_frames.pop(device_type, None)
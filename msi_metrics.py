@@ -0,0 +1,275 @@
+# Per-call SDK instrumentation.
+#
+# enable() puts an InstrumentedBackend in front of the current backend. It counts the
+# calls and error statuses of every MLAPI function and records their latencies in
+# HDR-style histograms. disable() removes it again, so there is no overhead while it is
+# off:
+#
+#     metrics = msi_metrics.enable()
+#     ...
+#     print(metrics.to_prometheus())
+#     msi_metrics.disable()
+
+import json
+import threading
+import time
+
+import msi
+
+# Linear sub-buckets per power of two, relative bucket width is at most 1/32 (~3%).
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+# Bucket bounds of the Prometheus export, in seconds.
+PROMETHEUS_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+# Returns the histogram bucket of a value in nanoseconds.
+def _bucket(value):
+    if value < 2 * SUB_BUCKETS:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return shift * SUB_BUCKETS + (value >> shift)
+
+
+# Returns the lowest value in nanoseconds of a bucket.
+def _bucket_floor(bucket):
+    if bucket < 2 * SUB_BUCKETS:
+        return bucket
+    shift = bucket // SUB_BUCKETS - 1
+    return (bucket - shift * SUB_BUCKETS) << shift
+
+
+class LatencyHistogram:
+
+    # Log-linear histogram of latencies in nanoseconds.
+
+    # Values are counted in buckets that are 1 ns wide up to 64 ns and then split every
+    # power of two into SUB_BUCKETS linear buckets, like HdrHistogram with about two
+    # significant digits. Recording is one index computation and one list update, and
+    # memory grows only with the largest value recorded.
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = []
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        bucket = _bucket(value)
+        counts = self.counts
+        if bucket >= len(counts):
+            counts.extend([0] * (bucket + 1 - len(counts)))
+        counts[bucket] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+
+        # Parameters:
+        # q (float): The percentile in [0, 100].
+
+        # Returns:
+        # int: The lowest value in nanoseconds of the bucket holding the percentile,
+        # 0 if nothing was recorded.
+
+        if not self.count:
+            return 0
+        rank = max(1, round(q / 100.0 * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(_bucket_floor(bucket), self.min), self.max)
+        return self.max
+
+    def count_below(self, value):
+
+        # Returns:
+        # int: The number of recorded values in buckets starting below or at value ns.
+
+        return sum(self.counts[: _bucket(value) + 1])
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum_ns": self.total,
+            "min_ns": self.min or 0,
+            "max_ns": self.max,
+            "p50_ns": self.percentile(50),
+            "p90_ns": self.percentile(90),
+            "p99_ns": self.percentile(99),
+            "p999_ns": self.percentile(99.9),
+        }
+
+
+class CallStats:
+
+    # Calls, error statuses and latencies of one MLAPI function.
+
+    __slots__ = ("calls", "errors", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = {}
+        self.latency = LatencyHistogram()
+
+    def snapshot(self):
+        return {"calls": self.calls, "errors": dict(self.errors), "latency": self.latency.snapshot()}
+
+
+class Metrics:
+
+    # CallStats of every MLAPI function, safe to update from several threads.
+
+    def __init__(self):
+        self.functions = {name: CallStats() for name in msi.FUNCTIONS}
+        self.lock = threading.Lock()
+
+    def record(self, name, status, elapsed):
+
+        # Parameters:
+        # name (str): The MLAPI function.
+        # status (int): The status it returned.
+        # elapsed (int): The duration of the call in nanoseconds.
+
+        stats = self.functions[name]
+        with self.lock:
+            stats.calls += 1
+            if status != 0:
+                stats.errors[status] = stats.errors.get(status, 0) + 1
+            stats.latency.record(elapsed)
+
+    def reset(self):
+        with self.lock:
+            for stats in self.functions.values():
+                stats.calls = 0
+                stats.errors.clear()
+                stats.latency.clear()
+
+    def snapshot(self):
+
+        # Returns:
+        # dict: MLAPI function -> calls, error counts by status and latency summary, for
+        # the functions that were called.
+
+        with self.lock:
+            return {name: stats.snapshot() for name, stats in self.functions.items() if stats.calls}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self, prefix="msi_mlapi"):
+
+        # Returns:
+        # str: The metrics in the Prometheus text exposition format.
+
+        lines = [
+            f"# HELP {prefix}_calls_total MLAPI function calls.",
+            f"# TYPE {prefix}_calls_total counter",
+        ]
+        with self.lock:
+            called = [(name, stats) for name, stats in self.functions.items() if stats.calls]
+            for name, stats in called:
+                lines.append(f'{prefix}_calls_total{{function="{name}"}} {stats.calls}')
+            lines.append(f"# HELP {prefix}_errors_total MLAPI function calls failing with a status.")
+            lines.append(f"# TYPE {prefix}_errors_total counter")
+            for name, stats in called:
+                for status, count in sorted(stats.errors.items()):
+                    lines.append(f'{prefix}_errors_total{{function="{name}",status="{status}"}} {count}')
+            lines.append(f"# HELP {prefix}_call_duration_seconds MLAPI function call latency.")
+            lines.append(f"# TYPE {prefix}_call_duration_seconds histogram")
+            for name, stats in called:
+                histogram = stats.latency
+                for bound in PROMETHEUS_BUCKETS:
+                    count = histogram.count_below(int(bound * 1e9))
+                    lines.append(f'{prefix}_call_duration_seconds_bucket{{function="{name}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_call_duration_seconds_bucket{{function="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{prefix}_call_duration_seconds_sum{{function="{name}"}} {histogram.total / 1e9}')
+                lines.append(f'{prefix}_call_duration_seconds_count{{function="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+# Returns function wrapped to record its status and latency in stats.
+def _timed(function, stats, lock):
+    perf_counter_ns = time.perf_counter_ns
+    errors = stats.errors
+    record = stats.latency.record
+
+    def call(*args):
+        start = perf_counter_ns()
+        status = function(*args)
+        elapsed = perf_counter_ns() - start
+        with lock:
+            stats.calls += 1
+            if status:
+                errors[status] = errors.get(status, 0) + 1
+            record(elapsed)
+        return status
+
+    return call
+
+
+class InstrumentedBackend:
+
+    # Backend forwarding every MLAPI function to another backend and recording it.
+
+    # Other attributes (SafeArrayDestroy, SysFreeString, ...) are taken from the wrapped
+    # backend unchanged.
+
+    # Parameters:
+    # backend: The backend to wrap.
+    # metrics (Metrics): Where calls are recorded.
+
+    def __init__(self, backend, metrics):
+        self.backend = backend
+        self.metrics = metrics
+        for name in msi.FUNCTIONS:
+            setattr(self, name, _timed(getattr(backend, name), metrics.functions[name], metrics.lock))
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def enable(metrics=None):
+
+    # Instruments the current backend, loading the library first if none is in use.
+
+    # Parameters:
+    # metrics (Metrics): Where calls are recorded, a new Metrics by default.
+
+    # Returns:
+    # Metrics: The metrics being recorded. If instrumentation was already enabled, the
+    # metrics already in use.
+
+    if isinstance(msi.mlapi, InstrumentedBackend):
+        return msi.mlapi.metrics
+    if msi.mlapi is None:
+        msi.load_library()
+    metrics = Metrics() if metrics is None else metrics
+    msi.use_backend(InstrumentedBackend(msi.mlapi, metrics))
+    return metrics
+
+
+def disable():
+
+    # Removes the instrumentation, so SDK calls go to the wrapped backend directly.
+
+    # Returns:
+    # Metrics: The recorded metrics, None if instrumentation was not enabled.
+
+    backend = msi.mlapi
+    if not isinstance(backend, InstrumentedBackend):
+        return None
+    msi.use_backend(backend.backend)
+    return backend.metrics
@@ -0,0 +1,158 @@
+# Write planner.
+#
+# WritePlanner turns the desired colors of a device into the fewest SDK calls: LEDs
+# whose cached color already matches are skipped, and when enough LEDs share one color
+# it is set with a single MLAPI_SetLedColorsSync call followed by per-LED overrides:
+#
+#     planner = msi_planner.WritePlanner()
+#     planner.apply(device_type, [(255, 0, 0)] * 5 + [(0, 0, 255)])  # 2 calls instead of 6
+#     print(planner.stats())
+
+from collections import Counter, namedtuple
+
+import msi
+from msi_cache import LedStateCache
+
+# One planned SDK call: a setter of LedStateCache and its arguments.
+Call = namedtuple("Call", "method args")
+
+
+# Returns a color as an (r, g, b) tuple of ints.
+def _rgb(color):
+    if isinstance(color, dict):
+        return color["r"], color["g"], color["b"]
+    r, g, b = color
+    return int(r), int(g), int(b)
+
+
+def plan_colors(device_type, desired, current, leds_count=None):
+
+    # Plans the fewest calls setting the desired colors of a device.
+
+    # Two plans are compared: one set_led_color call per LED whose desired color differs
+    # from its current one, and one set_led_colors_sync call with the most common color
+    # after the writes followed by a set_led_color call for every LED of another color.
+    # The plan with fewer calls wins, per-LED writes on a tie. A sync call sets every
+    # LED, so it is only planned when the color of every LED after the writes is known.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+    # desired (dict): LED index -> (r, g, b) color to set.
+    # current (dict): LED index -> (r, g, b) color, for the LEDs whose color is known.
+    # LEDs missing here are written.
+    # leds_count (int): The number of LEDs of the device, None to only plan per-LED
+    # writes.
+
+    # Returns:
+    # list: The Call tuples in execution order, with the arguments of the msi.py setters.
+
+    changed = [index for index, color in desired.items() if current.get(index) != color]
+    per_led = [Call("set_led_color", (device_type, index, *desired[index])) for index in changed]
+    if len(changed) < 2 or leds_count is None:
+        return per_led
+
+    # The state of every LED after the writes, needed since a sync call sets them all.
+    target = {}
+    for index in range(leds_count):
+        color = desired.get(index, current.get(index))
+        if color is None:
+            return per_led
+        target[index] = color
+    color, count = Counter(target.values()).most_common(1)[0]
+    if 1 + leds_count - count >= len(per_led):
+        return per_led
+    calls = [Call("set_led_colors_sync", (device_type, *color))]
+    calls.extend(
+        Call("set_led_color", (device_type, index, *other)) for index, other in target.items() if other != color
+    )
+    return calls
+
+
+class WritePlanner:
+
+    # Plans and applies color writes against a write-through LedStateCache.
+
+    # Every write is planned with plan_colors() against the cached colors. issued counts
+    # the calls of the chosen plans and naive the calls without planning, one per desired
+    # LED.
+
+    # Parameters:
+    # cache (LedStateCache): The cache the current colors are taken from and the calls
+    # go through, a new one by default. Colors that are not cached count as changed.
+
+    def __init__(self, cache=None):
+        self.cache = LedStateCache() if cache is None else cache
+        self.plans = 0
+        self.issued = 0
+        self.naive = 0
+
+    def plan(self, device_type, colors, leds_count=None):
+
+        # Plans the calls setting the desired colors, without calling the SDK.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device.
+        # colors: A sequence with one (r, g, b) color per LED index, or a dict LED index
+        # -> color for some LEDs. Colors may also be dicts with keys 'r', 'g' and 'b'.
+        # leds_count (int): The number of LEDs of the device. Defaults to len(colors) for
+        # sequences. For a dict, set_led_colors_sync is only planned if leds_count is
+        # given and the other LEDs' colors are cached.
+
+        # Returns:
+        # list: The Call tuples in execution order.
+
+        if isinstance(colors, dict):
+            desired = {index: _rgb(color) for index, color in colors.items()}
+        else:
+            desired = {index: _rgb(color) for index, color in enumerate(colors)}
+            if leds_count is None:
+                leds_count = len(desired)
+        current = {}
+        for index in desired if leds_count is None else range(leds_count):
+            color = self.cache.peek(device_type, index, "color")
+            if color is not None:
+                current[index] = _rgb(color)
+        calls = plan_colors(device_type, desired, current, leds_count)
+        # The cache updates every LED of the device on a sync call given the count.
+        return [
+            Call(call.method, call.args + (leds_count,)) if call.method == "set_led_colors_sync" else call
+            for call in calls
+        ]
+
+    def apply(self, device_type, colors, leds_count=None):
+
+        # Plans the writes of the desired colors and runs them through the cache.
+
+        # Parameters:
+        # See plan().
+
+        # Returns:
+        # int: The number of SDK calls issued.
+
+        # Raises:
+        # MysticLightError: If the SDK returns an error status. The cached colors of the
+        # device are dropped, so the next write sends every LED.
+
+        calls = self.plan(device_type, colors, leds_count)
+        self.plans += 1
+        self.naive += len(colors)
+        try:
+            for call in calls:
+                self.issued += 1
+                getattr(self.cache, call.method)(*call.args)
+        except msi.MysticLightError:
+            self.cache.invalidate(device_type)
+            raise
+        return len(calls)
+
+    def stats(self):
+
+        # Returns:
+        # dict: Plans applied, calls issued, naive calls and the share of calls saved.
+
+        return {
+            "plans": self.plans,
+            "issued": self.issued,
+            "naive": self.naive,
+            "saved": 1.0 - self.issued / self.naive if self.naive else 0.0,
+        }
@@ -0,0 +1,390 @@
+# Lighting profiles.
+#
+# A profile file (TOML or JSON) describes the style, color, brightness and speed of
+# devices and single LEDs. compile_profile() validates it once against a
+# CapabilityIndex and turns it into a Plan, the minimal SDK calls setting it. Plans are
+# cached per profile and capabilities, and ProfileSwitcher switches between them by
+# sending only the calls that differ from the active plan, with no validation or
+# capability lookups at runtime:
+#
+#     # evening.toml
+#     name = "Evening"
+#     [devices.MSI_MB]
+#     style = "Steady"
+#     color = "#ff4000"
+#     bright = 3
+#     [devices.MSI_MB.leds.0]
+#     color = [0, 0, 255]
+#
+#     caps = msi_caps.load_or_enumerate("capabilities.json")
+#     evening = msi_profile.compile_profile(msi_profile.load_profile("evening.toml"), caps)
+#     switcher = msi_profile.ProfileSwitcher()
+#     switcher.switch(evening)
+#
+#     python msi_profile.py show evening.toml --simulate    # print the plan
+
+import argparse
+import json
+import os
+from collections import namedtuple
+from types import MappingProxyType
+from functools import lru_cache
+
+import msi
+import msi_caps
+from msi_planner import Call, plan_colors
+from msi_scene import Scene, Target
+
+# Validated profile: its name and ((device_type, index or None), Target) pairs, where
+# index None applies to every LED of the device. Profiles are hashable, so compiled
+# plans can be cached per profile.
+Profile = namedtuple("Profile", "name targets")
+
+SETTINGS = ("style", "color", "bright", "speed")
+
+
+class ProfileError(ValueError):
+
+    # Raised when a profile is malformed or does not fit the connected devices.
+    pass
+
+
+def parse_color(value, where="color"):
+
+    # Parameters:
+    # value: An [r, g, b] list with values in 0-255 or a "#rrggbb" string.
+    # where (str): The location of the value, for error messages.
+
+    # Returns:
+    # tuple: R, G, B.
+
+    # Raises:
+    # ProfileError: If the value is not a color.
+
+    if isinstance(value, str):
+        text = value[1:] if value.startswith("#") else value
+        if len(text) == 6:
+            try:
+                return tuple(int(text[i : i + 2], 16) for i in (0, 2, 4))
+            except ValueError:
+                pass
+    elif isinstance(value, (list, tuple)) and len(value) == 3:
+        if all(isinstance(part, int) and not isinstance(part, bool) and 0 <= part <= 255 for part in value):
+            return tuple(value)
+    raise ProfileError(f"{where}: expected [r, g, b] in 0-255 or '#rrggbb', got {value!r}")
+
+
+# Returns the Target of one device or LED table of a profile.
+def _target(settings, where, allowed=SETTINGS):
+    if not isinstance(settings, dict):
+        raise ProfileError(f"{where}: expected a table, got {settings!r}")
+    unknown = set(settings) - set(allowed)
+    if unknown:
+        raise ProfileError(f"{where}: unknown settings {', '.join(sorted(unknown))}")
+    style = settings.get("style")
+    if style is not None and not isinstance(style, str):
+        raise ProfileError(f"{where}.style: expected a style name, got {style!r}")
+    levels = {}
+    for field in ("bright", "speed"):
+        level = settings.get(field)
+        if level is not None and (not isinstance(level, int) or isinstance(level, bool)):
+            raise ProfileError(f"{where}.{field}: expected a level, got {level!r}")
+        levels[field] = level
+    color = settings.get("color")
+    if color is not None:
+        color = parse_color(color, f"{where}.color")
+    return Target(style, color, levels["bright"], levels["speed"])
+
+
+def profile_from_dict(data, name=None):
+
+    # Builds a profile from parsed TOML or JSON.
+
+    # Parameters:
+    # data (dict): {"name": ..., "devices": {device type: {setting: value, ..., "leds":
+    # {index: {setting: value, ...}}}}}. Settings are style, color, bright and speed;
+    # LED settings override the device's.
+    # name (str): The name to use if data has none.
+
+    # Returns:
+    # Profile: The profile.
+
+    # Raises:
+    # ProfileError: If the data is malformed.
+
+    if not isinstance(data, dict) or not isinstance(data.get("devices"), dict):
+        raise ProfileError("a profile needs a 'devices' table")
+    unknown = set(data) - {"name", "devices"}
+    if unknown:
+        raise ProfileError(f"unknown keys {', '.join(sorted(unknown))}")
+    targets = []
+    for device_type, settings in data["devices"].items():
+        where = f"devices.{device_type}"
+        # Kept even without settings, so compiling checks that the device is connected.
+        targets.append(((device_type, None), _target(settings, where, SETTINGS + ("leds",))))
+        leds = settings.get("leds", {})
+        if not isinstance(leds, dict):
+            raise ProfileError(f"{where}.leds: expected a table of LED indexes")
+        for index, led in leds.items():
+            try:
+                index = int(index)
+            except ValueError:
+                raise ProfileError(f"{where}.leds: {index!r} is not an LED index") from None
+            targets.append(((device_type, index), _target(led, f"{where}.leds.{index}")))
+    return Profile(data.get("name", name), tuple(targets))
+
+
+def load_profile(path):
+
+    # Loads a .toml or .json profile file.
+
+    # Returns:
+    # Profile: The profile, named after the file if it has no name.
+
+    # Raises:
+    # ProfileError: If the file cannot be parsed or is malformed.
+    # OSError: If the file cannot be read.
+
+    name, extension = os.path.splitext(os.path.basename(path))
+    toml = extension.lower() == ".toml"
+    if toml:
+        try:
+            import tomllib
+        except ImportError:
+            raise ProfileError(f"{path}: TOML profiles need Python 3.11 or newer, use JSON") from None
+    with open(path, "rb") as f:
+        try:
+            if toml:
+                data = tomllib.load(f)
+            else:
+                data = json.load(f)
+        except ValueError as e:
+            raise ProfileError(f"{path}: {e}") from None
+    return profile_from_dict(data, name)
+
+
+# Checks a resolved LED target against the LED's capabilities.
+def _validate(device_type, index, target, led):
+    where = f"{device_type} LED {index}"
+    if target.style is not None and target.style not in led.styles:
+        raise ProfileError(f"{where} does not support style {target.style!r} (supports {', '.join(led.styles)})")
+    for field, maximum in (("bright", led.max_bright), ("speed", led.max_speed)):
+        level = getattr(target, field)
+        if level is None:
+            continue
+        if not maximum:
+            raise ProfileError(f"{where} has no {field} levels")
+        if not 1 <= level <= maximum:
+            raise ProfileError(f"{where}: {field} {level} is out of range 1-{maximum}")
+
+
+class Plan:
+
+    # A profile compiled against the capabilities of the connected devices.
+
+    # Plans are immutable, since compile_profile() hands out the same plan for the same
+    # profile.
+
+    # Attributes:
+    # name (str): The profile's name.
+    # state (mapping): (device_type, index) -> resolved Target of every LED the profile
+    # sets.
+    # leds_counts (mapping): Device type -> LED count of the profile's devices.
+    # calls (tuple): The Calls applying the profile from an unknown state.
+
+    __slots__ = ("name", "state", "leds_counts", "calls", "_styles", "_diffs")
+
+    def __init__(self, name, state, leds_counts, styles):
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "state", MappingProxyType(dict(state)))
+        object.__setattr__(self, "leds_counts", MappingProxyType(dict(leds_counts)))
+        # (device_type, index) -> style names passed to set_led_style
+        object.__setattr__(self, "_styles", MappingProxyType(dict(styles)))
+        # Previous plan -> calls, filled by diff().
+        object.__setattr__(self, "_diffs", {})
+        object.__setattr__(self, "calls", self.diff(None))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Plan is immutable")
+
+    def __repr__(self):
+        return f"Plan({self.name!r}, {len(self.state)} LEDs, {len(self.calls)} calls)"
+
+    def diff(self, previous):
+
+        # Plans the calls switching from another plan to this one, cached per plan.
+
+        # An LED's style is set if it differs, and a style change also re-sends the
+        # LED's other settings, since it can reset them. Then brightness, speed and
+        # colors that differ are set, the colors planned by msi_planner.plan_colors(). LEDs
+        # and settings this profile does not set are left as they are.
+
+        # Parameters:
+        # previous (Plan): The active plan, None if the state of the LEDs is unknown.
+
+        # Returns:
+        # tuple: The Calls in execution order, for msi.py setters.
+
+        calls = self._diffs.get(previous)
+        if calls is not None:
+            return calls
+        before = {} if previous is None else previous.state
+        unknown = Target()
+        calls = []
+        # Device type -> LED index -> color wanted, and known before the switch.
+        desired = {}
+        current = {}
+        for key, target in self.state.items():
+            device_type, index = key
+            old = before.get(key, unknown)
+            restyled = target.style is not None and target.style != old.style
+            if restyled:
+                calls.append(Call("set_led_style", (device_type, index, self._styles[key], target.style)))
+            if target.bright is not None and (restyled or target.bright != old.bright):
+                calls.append(Call("set_led_bright", (device_type, index, target.bright)))
+            if target.speed is not None and (restyled or target.speed != old.speed):
+                calls.append(Call("set_led_speed", (device_type, index, target.speed)))
+            if target.color is not None:
+                desired.setdefault(device_type, {})[index] = target.color
+            if old.color is not None and not restyled:
+                current.setdefault(device_type, {})[index] = old.color
+        for (device_type, index), old in before.items():
+            if device_type in desired and (device_type, index) not in self.state and old.color is not None:
+                current.setdefault(device_type, {})[index] = old.color
+        for device_type, colors in desired.items():
+            calls.extend(plan_colors(device_type, colors, current.get(device_type, {}), self.leds_counts[device_type]))
+        calls = self._diffs[previous] = tuple(calls)
+        return calls
+
+
+@lru_cache(maxsize=64)
+def compile_profile(profile, caps):
+
+    # Validates a profile against the capabilities and compiles it into a Plan.
+
+    # Plans are cached per profile and capabilities, so compiling the same profile again
+    # returns the same Plan, with its cached diffs.
+
+    # Parameters:
+    # profile (Profile): The profile.
+    # caps (CapabilityIndex): The capabilities of the connected devices.
+
+    # Returns:
+    # Plan: The plan.
+
+    # Raises:
+    # ProfileError: If a device is not connected, an LED index is out of range, or a
+    # style or level is not supported by an LED.
+
+    scene = Scene()
+    for (device_type, index), target in profile.targets:
+        leds_count = caps.leds_count(device_type)
+        if not leds_count:
+            raise ProfileError(f"device {device_type!r} is not connected")
+        if index is not None and not 0 <= index < leds_count:
+            raise ProfileError(f"{device_type} has no LED {index} ({leds_count} LEDs)")
+        scene.set(device_type, index, *target)
+    state = {}
+    styles = {}
+    leds_counts = {}
+    for device_type in scene.device_types():
+        leds_counts[device_type] = caps.leds_count(device_type)
+        for index, target in scene.resolve(device_type, leds_counts[device_type]).items():
+            led = caps.led(device_type, index)
+            _validate(device_type, index, target, led)
+            state[device_type, index] = target
+            styles[device_type, index] = led.styles
+    return Plan(profile.name, state, leds_counts, styles)
+
+
+class ProfileSwitcher:
+
+    # Switches between compiled plans with the calls that differ from the active one.
+
+    # Parameters:
+    # writer: Object with the msi.py setters the calls are made with, msi itself by
+    # default, or e.g. a LedStateCache.
+
+    def __init__(self, writer=None):
+        self.writer = msi if writer is None else writer
+        self.active = None
+        self.switches = 0
+        self.calls = 0
+        self.full_calls = 0
+
+    def switch(self, plan):
+
+        # Makes a plan the active one.
+
+        # Parameters:
+        # plan (Plan): The plan to switch to.
+
+        # Returns:
+        # int: The number of SDK calls made.
+
+        # Raises:
+        # MysticLightError: If the SDK returns an error status. The state is then
+        # unknown, so the next switch sends its plan in full.
+
+        calls = plan.diff(self.active)
+        self.switches += 1
+        self.full_calls += len(plan.calls)
+        writer = self.writer
+        try:
+            for call in calls:
+                self.calls += 1
+                getattr(writer, call.method)(*call.args)
+        except msi.MysticLightError:
+            self.active = None
+            raise
+        self.active = plan
+        return len(calls)
+
+    def stats(self):
+
+        # Returns:
+        # dict: Switches, calls made and the calls applying every plan in full would
+        # have taken.
+
+        return {"switches": self.switches, "calls": self.calls, "full_calls": self.full_calls}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate, show and apply lighting profiles.")
+    parser.add_argument("command", choices=("show", "apply"), help="print the call plans or apply the profiles in order")
+    parser.add_argument("paths", nargs="+", help=".toml or .json profile files")
+    parser.add_argument("--caps", help="capability index file, enumerated and saved if missing or stale")
+    parser.add_argument("--dll", help="SDK library to use, found like initialize_dll() by default")
+    parser.add_argument("--simulate", action="store_true", help="use the simulated backend of msi_sim")
+    args = parser.parse_args()
+
+    if args.simulate:
+        import msi_sim
+
+        msi.use_backend(msi_sim.SimulatedBackend())
+    elif args.dll:
+        msi.load_library(args.dll)
+    msi.initialize_dll()
+    try:
+        caps = msi_caps.load_or_enumerate(args.caps) if args.caps else msi_caps.enumerate_capabilities()
+        switcher = ProfileSwitcher()
+        previous = None
+        for path in args.paths:
+            try:
+                plan = compile_profile(load_profile(path), caps)
+            except ProfileError as e:
+                parser.exit(1, f"{path}: {e}\n")
+            calls = plan.diff(previous)
+            print(f"{plan.name}: {len(calls)} calls ({len(plan.calls)} in full)")
+            if args.command == "show":
+                for call in calls:
+                    print(f"  {call.method}{call.args}")
+            else:
+                switcher.switch(plan)
+            previous = plan
+    finally:
+        msi.release_dll()
+
+
+if __name__ == "__main__":
+    main()
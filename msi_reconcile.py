@@ -0,0 +1,292 @@
+# Drift reconciliation.
+#
+# Reconciler keeps the desired style, color, brightness and speed of LEDs and slowly
+# samples what the devices actually show, round-robin within a budget of SDK calls per
+# second. LEDs found to differ are repaired one field at a time instead of re-pushing
+# every LED, e.g. after sleep/resume or another application changing the lighting:
+#
+#     reconciler = msi_reconcile.Reconciler(budget=20)
+#     reconciler.desire("MSI_MB", style="Steady", color=(255, 0, 0))
+#     reconciler.start()
+#     ...
+#     print(reconciler.stats())
+#     reconciler.stop()
+
+import threading
+import time
+from collections import deque
+
+import msi
+import msi_caps
+from msi_scene import Target
+
+# Field -> msi.py getter sampling it.
+GETTERS = {
+    "style": "get_led_style",
+    "color": "get_led_color",
+    "bright": "get_led_bright",
+    "speed": "get_led_speed",
+}
+
+
+# Returns the sampled value in the form desired values are kept in.
+def _actual(field, value):
+    if field == "color":
+        return value["r"], value["g"], value["b"]
+    return value
+
+
+class Reconciler:
+
+    # Samples LED state within a call budget and repairs drift from the desired state.
+
+    # Every desired field of every LED is one sample slot, and step() samples the slots
+    # round-robin while the token bucket allows: it refills at budget calls per second
+    # and holds one second of calls, but at least one call so budgets below one call per
+    # second still sample. A full scan therefore takes slots / budget seconds. When a slot differs from its desired value, the other
+    # slots of the same device are moved ahead in the scan, since drift usually hits
+    # whole devices. Every slot is still sampled once per scan.
+
+    # A repair sets the divergent field. Repairing a style also sets the LED's other
+    # desired fields, because a style change can reset them. Repair calls do not count
+    # against the budget.
+
+    # Parameters:
+    # caps (CapabilityIndex): The capabilities of the connected devices, needed for
+    # device wide targets and style changes. If None, they are enumerated on first use.
+    # budget (float): Sampling SDK calls per second.
+    # writer: Object with the msi.py setters the repairs are made with, msi itself by
+    # default. A LedStateCache keeps its cached values correct; its LEDs are invalidated
+    # when drift is found.
+
+    # Raises:
+    # ValueError: If budget is not positive.
+
+    def __init__(self, caps=None, budget=20.0, writer=None):
+        if not budget > 0:
+            raise ValueError(f"budget must be positive, got {budget}")
+        self.caps = caps
+        self.budget = budget
+        self.writer = msi if writer is None else writer
+        # (device_type, index) -> Target
+        self.desired = {}
+        self.samples = 0
+        self.divergences = 0
+        self.repairs = 0
+        self.errors = 0
+        self._slots = []
+        self._cursor = 0
+        self._suspects = deque()
+        # Slots sampled ahead of the scan, skipped when the scan reaches them.
+        self._ahead = set()
+        self._tokens = 0.0
+        self._refilled = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _caps(self):
+        if self.caps is None:
+            self.caps = msi_caps.enumerate_capabilities()
+        return self.caps
+
+    def desire(self, device_type, index=None, style=None, color=None, bright=None, speed=None):
+
+        # Sets some desired settings of a device or an LED, keeping the others. The
+        # settings are not written, they are repaired when sampling finds them differing.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device.
+        # index (DWORD): The index of the LED, None for every LED of the device.
+        # style (str): The style name.
+        # color (tuple): R, G, B in 0-255.
+        # bright (int): The brightness level.
+        # speed (int): The speed level.
+
+        changes = {"style": style, "color": None if color is None else tuple(color), "bright": bright, "speed": speed}
+        changes = {field: value for field, value in changes.items() if value is not None}
+        indexes = range(self._caps().leds_count(device_type)) if index is None else (index,)
+        with self._lock:
+            for led in indexes:
+                target = self.desired.get((device_type, led), Target())
+                self.desired[device_type, led] = target._replace(**changes)
+            self._rebuild()
+
+    def desire_scene(self, scene):
+
+        # Sets the desired settings of every LED a msi_scene.Scene changes.
+
+        caps = self._caps()
+        with self._lock:
+            for device_type in scene.device_types():
+                for index, target in scene.resolve(device_type, caps.leds_count(device_type)).items():
+                    current = self.desired.get((device_type, index), Target())
+                    self.desired[device_type, index] = Target(
+                        *(value if value is not None else old for value, old in zip(target, current))
+                    )
+            self._rebuild()
+
+    def forget(self, device_type=None, index=None):
+
+        # Stops reconciling LEDs.
+
+        # Parameters:
+        # device_type (BSTR): The device to forget, or None for all devices.
+        # index (DWORD): The LED to forget, or None for all LEDs of the device.
+
+        with self._lock:
+            for key in list(self.desired):
+                if device_type is None or (key[0] == device_type and index in (None, key[1])):
+                    del self.desired[key]
+            self._rebuild()
+
+    # Rebuilds the sample slots after the desired state changed.
+    def _rebuild(self):
+        self._slots = [
+            (key, field) for key, target in self.desired.items() for field in GETTERS if getattr(target, field) is not None
+        ]
+        self._cursor %= max(1, len(self._slots))
+        slots = set(self._slots)
+        self._suspects = deque(slot for slot in self._suspects if slot in slots)
+        self._ahead &= slots
+
+    def _next_slot(self):
+        if self._suspects:
+            slot = self._suspects.popleft()
+            self._ahead.add(slot)
+            return slot
+        while True:
+            slot = self._slots[self._cursor]
+            self._cursor = (self._cursor + 1) % len(self._slots)
+            if slot not in self._ahead:
+                return slot
+            self._ahead.discard(slot)
+
+    # Moves the slots of a device the scan has not sampled yet ahead.
+    def _suspect(self, device_type, sampled):
+        if any(slot[0][0] == device_type for slot in self._suspects):
+            return
+        self._suspects.extend(
+            slot for slot in self._slots if slot[0][0] == device_type and slot != sampled and slot not in self._ahead
+        )
+
+    def _repair(self, device_type, index, field, target):
+        writer = self.writer
+        calls = 0
+        fields = [field]
+        if field == "style":
+            fields += [other for other in ("bright", "speed", "color") if getattr(target, other) is not None]
+        for field in fields:
+            value = getattr(target, field)
+            if field == "style":
+                writer.set_led_style(device_type, index, self._caps().led(device_type, index).styles, value)
+            elif field == "color":
+                writer.set_led_color(device_type, index, *value)
+            elif field == "bright":
+                writer.set_led_bright(device_type, index, value)
+            else:
+                writer.set_led_speed(device_type, index, value)
+            calls += 1
+        return calls
+
+    def sample(self):
+
+        # Samples the next slot and repairs it if it differs.
+
+        # Returns:
+        # bool: True if the slot differed from its desired value.
+
+        with self._lock:
+            if not self._slots:
+                return False
+            slot = self._next_slot()
+            (device_type, index), field = slot
+            target = self.desired[device_type, index]
+            self.samples += 1
+            try:
+                actual = _actual(field, getattr(msi, GETTERS[field])(device_type, index))
+                if actual == getattr(target, field):
+                    return False
+                self.divergences += 1
+                invalidate = getattr(self.writer, "invalidate", None)
+                if invalidate is not None:
+                    invalidate(device_type, index)
+                self._suspect(device_type, slot)
+                self.repairs += self._repair(device_type, index, field, target)
+            except msi.MysticLightError:
+                self.errors += 1
+                return False
+            return True
+
+    def step(self, now=None):
+
+        # Samples as many slots as the budget allows since the last step.
+
+        # Parameters:
+        # now (float): The time.monotonic() time, the current time by default.
+
+        # Returns:
+        # int: The number of slots sampled.
+
+        if now is None:
+            now = time.monotonic()
+        if self._refilled is None:
+            self._refilled = now
+            self._tokens = 1.0
+        self._tokens = min(max(1.0, self.budget), self._tokens + (now - self._refilled) * self.budget)
+        self._refilled = now
+        count = 0
+        while self._tokens >= 1.0 and self._slots:
+            self._tokens -= 1.0
+            self.sample()
+            count += 1
+        return count
+
+    def run(self, duration=None):
+
+        # Samples within the budget until stop() is called or duration seconds have passed.
+
+        # Parameters:
+        # duration (float): Seconds to run, None to run until stopped.
+
+        self._stop.clear()
+        end = None if duration is None else time.monotonic() + duration
+        interval = 1.0 / self.budget
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if end is not None and now >= end:
+                break
+            self.step(now)
+            self._stop.wait(interval if end is None else min(interval, max(0.0, end - now)))
+
+    def start(self, duration=None):
+
+        # Runs the reconciler on a background thread.
+
+        # Returns:
+        # Thread: The started thread.
+
+        self._caps()
+        self._thread = threading.Thread(target=self.run, args=(duration,), name="msi-reconcile", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def stats(self):
+
+        # Returns:
+        # dict: Samples taken, divergent samples, repair calls, failed samples or
+        # repairs, sample slots and the seconds one full scan takes at the budget.
+
+        return {
+            "samples": self.samples,
+            "divergences": self.divergences,
+            "repairs": self.repairs,
+            "errors": self.errors,
+            "slots": len(self._slots),
+            "scan_time": len(self._slots) / self.budget,
+        }
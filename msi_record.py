@@ -0,0 +1,444 @@
+# Recording and replay of LED writes.
+#
+# start() puts a RecordingBackend in front of the current backend, which logs every
+# MLAPI_SetLedColor, MLAPI_SetLedColorEx, MLAPI_SetLedColorsSync, MLAPI_SetLedStyle,
+# MLAPI_SetLedBright and MLAPI_SetLedSpeed call with its time into a recording file.
+# Recording opens the file memory-mapped, so hours of writes can be sought and replayed
+# without reading them into memory:
+#
+#     msi_record.start("session.mlrec")
+#     ...
+#     msi_record.stop()
+#
+#     with msi_record.Recording("session.mlrec") as recording:
+#         msi_record.replay(recording, speed=4.0)
+#
+#     python msi_record.py replay session.mlrec --speed 0 --simulate    # load test
+#
+# File format: a HEADER, the string table (device types, LED names and styles as a JSON
+# list) that records refer to by position in a reserved area of STRINGS_SIZE bytes,
+# then one RECORD per call. Records have a fixed size and are in time order, so record
+# i is at a known offset and a time can be found by binary search.
+
+import argparse
+import json
+import mmap
+import struct
+import threading
+import time
+
+import numpy as np
+
+import msi
+
+MAGIC = b"MSIREC01"
+VERSION = 1
+
+# Magic, version, record size, string table length, record count, offset of the first
+# record, start time (ns since the epoch).
+HEADER = struct.Struct("<8sHHIQQq24x")
+
+# Bytes reserved for the string table.
+STRINGS_SIZE = 65536
+
+# Time since the start in ns, operation, returned status, device type string, LED
+# index, LED name or style string, R, G, B, sync flag, brightness or speed level.
+RECORD = struct.Struct("<qBbHIHBBBBI6x")
+RECORD_DTYPE = np.dtype(
+    {
+        "names": ["t", "op", "status", "device", "index", "name", "r", "g", "b", "sync", "value"],
+        "formats": ["<i8", "u1", "i1", "<u2", "<u4", "<u2", "u1", "u1", "u1", "u1", "<u4"],
+        "offsets": [0, 8, 9, 10, 12, 16, 18, 19, 20, 21, 22],
+        "itemsize": RECORD.size,
+    }
+)
+
+# String id of records without a name.
+NO_STRING = 0xFFFF
+
+# Operations: ordinal -> MLAPI function.
+SET_LED_COLOR = 1
+SET_LED_COLOR_EX = 2
+SET_LED_COLORS_SYNC = 3
+SET_LED_STYLE = 4
+SET_LED_BRIGHT = 5
+SET_LED_SPEED = 6
+OPERATIONS = {
+    SET_LED_COLOR: "MLAPI_SetLedColor",
+    SET_LED_COLOR_EX: "MLAPI_SetLedColorEx",
+    SET_LED_COLORS_SYNC: "MLAPI_SetLedColorsSync",
+    SET_LED_STYLE: "MLAPI_SetLedStyle",
+    SET_LED_BRIGHT: "MLAPI_SetLedBright",
+    SET_LED_SPEED: "MLAPI_SetLedSpeed",
+}
+
+
+class Recorder:
+
+    # Appends records to a recording file, safe to use from several threads.
+
+    # Calls that cannot be recorded, because an argument does not fit its record field
+    # (e.g. a color component outside 0-255 or a name that is not a str) or the string
+    # table is full, are counted in dropped instead. The recorded call is unaffected.
+
+    # The header (with the record count) and the string table are rewritten by flush(),
+    # which runs at least every flush_interval seconds while recording. Readers only see
+    # flushed records, and a crashed process loses at most the last interval.
+
+    # Parameters:
+    # path (str): The file, replaced if it exists.
+    # flush_interval (float): Seconds between automatic flushes.
+
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.count = 0
+        self.dropped = 0
+        self.strings = []
+        self._string_ids = {}
+        self._file = open(path, "w+b")
+        self._start = time.perf_counter_ns()
+        self._start_wall = time.time_ns()
+        self._end = HEADER.size + STRINGS_SIZE
+        self._table = b""
+        # Size of the JSON string table, "[]" while empty.
+        self._table_size = 2
+        self._table_count = -1
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self.flush()
+
+    def _string(self, text):
+        if text is None:
+            return NO_STRING
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            if len(self.strings) == NO_STRING:
+                raise ValueError("too many distinct strings in one recording")
+            size = self._table_size + len(json.dumps(text)) + (2 if self.strings else 0)
+            if size > STRINGS_SIZE:
+                raise ValueError("string table of the recording is full")
+            self._table_size = size
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def append(self, op, status, device_type, index=0, name=None, r=0, g=0, b=0, sync=0, value=0):
+
+        # Parameters:
+        # op (int): The operation, a key of OPERATIONS.
+        # status (int): The status the SDK returned.
+        # The other parameters are the arguments of the call.
+
+        with self._lock:
+            # Taken under the lock, so records are written in time order for seek().
+            t = time.perf_counter_ns() - self._start
+            try:
+                record = RECORD.pack(
+                    t, op, max(-128, min(status, 127)), self._string(device_type), index, self._string(name),
+                    r, g, b, sync, value,
+                )
+            except (struct.error, ValueError, TypeError):
+                self.dropped += 1
+                return
+            self._file.write(record)
+            self._end += RECORD.size
+            self.count += 1
+            if time.monotonic() - self._flushed >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        f = self._file
+        # Records first, so the header never counts records that are not written yet.
+        f.flush()
+        if self._table_count != len(self.strings):
+            table = json.dumps(self.strings).encode()
+            if len(table) > STRINGS_SIZE:
+                raise ValueError("string table of the recording is full")
+            f.seek(HEADER.size)
+            f.write(table)
+            self._table = table
+            self._table_count = len(self.strings)
+        f.seek(0)
+        f.write(
+            HEADER.pack(
+                MAGIC, VERSION, RECORD.size, len(self._table), self.count, HEADER.size + STRINGS_SIZE,
+                self._start_wall,
+            )
+        )
+        f.flush()
+        f.seek(self._end)
+        self._flushed = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush()
+            self._file.close()
+
+
+# Returns function wrapped to append a record of every call.
+def _recorded(function, recorder, op):
+    append = recorder.append
+
+    if op == SET_LED_COLOR:
+
+        def call(device_type, index, r, g, b):
+            status = function(device_type, index, r, g, b)
+            append(op, status, device_type, index, None, r, g, b)
+            return status
+
+    elif op == SET_LED_COLOR_EX:
+
+        def call(device_type, index, name, r, g, b, sync):
+            status = function(device_type, index, name, r, g, b, sync)
+            append(op, status, device_type, index, name, r, g, b, sync)
+            return status
+
+    elif op == SET_LED_COLORS_SYNC:
+
+        def call(device_type, r, g, b):
+            status = function(device_type, r, g, b)
+            append(op, status, device_type, 0, None, r, g, b)
+            return status
+
+    elif op == SET_LED_STYLE:
+
+        def call(device_type, index, style):
+            status = function(device_type, index, style)
+            append(op, status, device_type, index, style)
+            return status
+
+    else:
+
+        def call(device_type, index, level):
+            status = function(device_type, index, level)
+            append(op, status, device_type, index, value=level)
+            return status
+
+    return call
+
+
+class RecordingBackend:
+
+    # Backend forwarding every MLAPI function to another backend and recording the LED
+    # writes of OPERATIONS, like msi_metrics.InstrumentedBackend.
+
+    # Parameters:
+    # backend: The backend to wrap.
+    # recorder (Recorder): Where calls are recorded.
+
+    def __init__(self, backend, recorder):
+        self.backend = backend
+        self.recorder = recorder
+        for op, name in OPERATIONS.items():
+            setattr(self, name, _recorded(getattr(backend, name), recorder, op))
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+def start(path, flush_interval=1.0):
+
+    # Records the LED writes of the current backend, loading the library first if none
+    # is in use.
+
+    # Parameters:
+    # path (str): The recording file, replaced if it exists.
+    # flush_interval (float): See Recorder.
+
+    # Returns:
+    # Recorder: The recorder. If recording was already started, the recorder in use.
+
+    if isinstance(msi.mlapi, RecordingBackend):
+        return msi.mlapi.recorder
+    if msi.mlapi is None:
+        msi.load_library()
+    recorder = Recorder(path, flush_interval)
+    msi.use_backend(RecordingBackend(msi.mlapi, recorder))
+    return recorder
+
+
+def stop():
+
+    # Stops recording and closes the file.
+
+    # Returns:
+    # Recorder: The closed recorder, None if recording was not started.
+
+    backend = msi.mlapi
+    if not isinstance(backend, RecordingBackend):
+        return None
+    msi.use_backend(backend.backend)
+    backend.recorder.close()
+    return backend.recorder
+
+
+class Recording:
+
+    # A recording file opened memory-mapped.
+
+    # records is a NumPy structured array of RECORD_DTYPE backed by the mapping, so
+    # slicing and column access do not read the whole file.
+
+    # Parameters:
+    # path (str): The recording file.
+
+    # Raises:
+    # ValueError: If the file is not a recording of a supported version.
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, table, count, offset, start = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self._map.close()
+            raise ValueError(f"{path} is not a supported recording")
+        self.start_time = start / 1e9
+        self.records = np.frombuffer(self._map, RECORD_DTYPE, count, offset)
+        self.strings = json.loads(self._map[HEADER.size : HEADER.size + table].decode())
+
+    def __len__(self):
+        return len(self.records)
+
+    def duration(self):
+        return self.records["t"][-1] / 1e9 if len(self.records) else 0.0
+
+    def seek(self, seconds):
+
+        # Returns:
+        # int: The index of the first record at or after seconds into the recording.
+
+        return int(np.searchsorted(self.records["t"], int(seconds * 1e9)))
+
+    def calls(self, first=0, last=None, chunk=4096):
+
+        # Decodes records into MLAPI calls, reading chunk records at a time.
+
+        # Yields:
+        # tuple: Time in ns, MLAPI function name and its arguments.
+
+        strings = self.strings
+        last = len(self.records) if last is None else last
+        for begin in range(first, last, chunk):
+            for t, op, status, device, index, name, r, g, b, sync, value in self.records[
+                begin : min(begin + chunk, last)
+            ].tolist():
+                device_type = strings[device]
+                if op == SET_LED_COLOR:
+                    args = (device_type, index, r, g, b)
+                elif op == SET_LED_COLOR_EX:
+                    args = (device_type, index, strings[name], r, g, b, sync)
+                elif op == SET_LED_COLORS_SYNC:
+                    args = (device_type, r, g, b)
+                elif op == SET_LED_STYLE:
+                    args = (device_type, index, strings[name])
+                else:
+                    args = (device_type, index, value)
+                yield t, OPERATIONS[op], args
+
+    def close(self):
+        # The mapping stays open while record arrays refer to it.
+        self.records = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def replay(recording, speed=1.0, start=0.0, end=None):
+
+    # Sends the calls of a recording to the current backend.
+
+    # Parameters:
+    # recording (Recording): The recording.
+    # speed (float): Playback speed, 1.0 for the original timing, 0 or None for as fast
+    # as the backend accepts the calls.
+    # start (float): Seconds into the recording to start at.
+    # end (float): Seconds into the recording to stop at, None for the end.
+
+    # Returns:
+    # dict: Calls sent, calls returning an error status, seconds taken and the largest
+    # delay of a call behind its scheduled time in seconds.
+
+    mlapi = msi.mlapi
+    functions = {name: getattr(mlapi, name) for name in OPERATIONS.values()}
+    first = recording.seek(start)
+    last = len(recording) if end is None else recording.seek(end)
+    calls = errors = 0
+    lag = 0.0
+    begin = time.perf_counter()
+    offset = None
+    for t, name, args in recording.calls(first, last):
+        if speed:
+            if offset is None:
+                offset = t
+            due = begin + (t - offset) / 1e9 / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+        if functions[name](*args):
+            errors += 1
+        calls += 1
+    return {"calls": calls, "errors": errors, "elapsed": time.perf_counter() - begin, "max_lag": lag}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay LED write recordings.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="summarize a recording")
+    info.add_argument("path")
+    play = commands.add_parser("replay", help="replay a recording")
+    play.add_argument("path")
+    play.add_argument("--speed", type=float, default=1.0, help="playback speed, 0 for as fast as possible")
+    play.add_argument("--start", type=float, default=0.0, help="seconds into the recording to start at")
+    play.add_argument("--end", type=float, help="seconds into the recording to stop at")
+    play.add_argument("--dll", help="SDK library to replay to, found like initialize_dll() by default")
+    play.add_argument("--simulate", action="store_true", help="replay to the simulated backend of msi_sim")
+    play.add_argument("--latency-ms", type=float, default=0.0, help="latency of every simulated call")
+    args = parser.parse_args()
+
+    with Recording(args.path) as recording:
+        if args.command == "info":
+            records = recording.records
+            print(f"{args.path}: {len(recording)} calls over {recording.duration():.1f} s")
+            print(f"recorded at {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.start_time))}")
+            for op, count in enumerate(np.bincount(records["op"], minlength=len(OPERATIONS) + 1)):
+                if count:
+                    print(f"{OPERATIONS[op]:<24} {count:10d}")
+            print(f"failed calls: {int(np.count_nonzero(records['status']))}")
+            print(f"strings: {', '.join(recording.strings)}")
+            return
+        if args.simulate:
+            import msi_sim
+
+            msi.use_backend(msi_sim.SimulatedBackend(latency=args.latency_ms / 1000))
+        elif args.dll:
+            msi.load_library(args.dll)
+        msi.initialize_dll()
+        try:
+            stats = replay(recording, args.speed, args.start, args.end)
+        finally:
+            msi.release_dll()
+    print(
+        f"{stats['calls']} calls, {stats['errors']} errors in {stats['elapsed']:.2f} s"
+        f" ({stats['calls'] / max(stats['elapsed'], 1e-9):.0f} calls/s), max lag {stats['max_lag'] * 1e3:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
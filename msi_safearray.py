@@ -0,0 +1,230 @@
+# SAFEARRAY marshalling for MLAPI_SetLedColors.
+#
+# BstrArray builds the SAFEARRAY of LED names once and LedColorsWriter keeps the
+# R, G, B DWORD arrays between calls, so a frame is copied into them by one vectorized
+# assignment and sent with a single MLAPI_SetLedColors call. msi.set_led_colors() uses
+# a writer cached per thread by led_colors_writer():
+#
+#     writer = msi_safearray.LedColorsWriter(device_type, index, msi.get_led_name(device_type))
+#     writer.write(frame)  # (n_names, 3) colours, e.g. a NumPy uint8 array
+
+import threading
+from ctypes import POINTER, addressof, byref, cast, pointer, sizeof
+from ctypes.wintypes import DWORD
+from functools import lru_cache
+
+import numpy as np
+
+import msi
+
+# SAFEARRAY features: the array is not allocated by SafeArrayCreate and holds BSTRs.
+FADF_STATIC = 0x0002
+FADF_BSTR = 0x0100
+
+
+class BstrArray:
+
+    # One dimensional SAFEARRAY of BSTRs built from Python strings.
+
+    # The descriptor and the BSTRs are owned by this object and flagged FADF_STATIC, so
+    # the SDK only reads them. Pass byref() to functions taking SAFEARRAY**.
+
+    # Parameters:
+    # names (sequence of str): The elements.
+
+    __slots__ = ("names", "array", "pointer", "_data")
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self._data = (msi.BSTR * len(self.names))(*self.names)
+        self.array = msi.SAFEARRAY(
+            cDims=1,
+            fFeatures=FADF_STATIC | FADF_BSTR,
+            cbElements=sizeof(msi.BSTR),
+            pvData=addressof(self._data),
+            rgsabound=(msi.SAFEARRAYBOUND * 1)(msi.SAFEARRAYBOUND(len(self.names), 0)),
+        )
+        self.pointer = pointer(self.array)
+
+    def __len__(self):
+        return len(self.names)
+
+    def byref(self):
+
+        # Returns:
+        # The SAFEARRAY** argument for the SDK.
+
+        return byref(self.pointer)
+
+
+@lru_cache(maxsize=256)
+def _bstr_array(names):
+    return BstrArray(names)
+
+
+def bstr_array(names):
+
+    # Returns the cached BstrArray of names. LED names of a device do not change, so the
+    # array is built once and reused by every call.
+
+    # Parameters:
+    # names (sequence of str): The elements.
+
+    # Returns:
+    # BstrArray: The array, shared between callers and never modified.
+
+    if isinstance(names, BstrArray):
+        return names
+    return _bstr_array(tuple(names))
+
+
+class DwordArrays:
+
+    # R, G and B DWORD arrays of count elements in one planar buffer.
+
+    # The buffer is allocated once and viewed as a (3, count) NumPy array, so fill()
+    # converts a whole frame into it without per-element Python work.
+
+    # Parameters:
+    # count (int): The number of colours.
+
+    __slots__ = ("count", "r", "g", "b", "_buffer", "_planes")
+
+    def __init__(self, count):
+        self.count = count
+        self._buffer = (DWORD * (3 * count))()
+        self._planes = np.ctypeslib.as_array(self._buffer).reshape(3, count)
+        address = addressof(self._buffer)
+        self.r, self.g, self.b = (
+            cast(address + plane * count * sizeof(DWORD), POINTER(DWORD)) for plane in range(3)
+        )
+
+    def fill(self, colors):
+
+        # Copies colours into the arrays.
+
+        # Parameters:
+        # colors (array_like): (count, 3) integer R, G, B values in 0-255.
+
+        # Raises:
+        # ValueError: If colors does not have one R, G, B row per element.
+        # InvalidArgumentError: If a value is not an integer in 0-255, like the SDK
+        # answers MLAPI_SetLedColor.
+
+        if type(colors) in (list, tuple) and self._fill_rows(colors):
+            return self
+        colors = np.asarray(colors)
+        if colors.shape != (self.count, 3):
+            raise ValueError(f"colors must have shape ({self.count}, 3), not {colors.shape}")
+        if colors.dtype != np.uint8 and (
+            colors.dtype.kind not in "iu" or colors.size and (colors.min() < 0 or colors.max() > 255)
+        ):
+            raise msi.InvalidArgumentError(msi.MLAPI_INVALID_ARGUMENT, "colors must be integers in 0-255")
+        self._planes[...] = colors.T
+        return self
+
+    # Copies count (r, g, b) rows of ints in 0-255 without NumPy, which is several times
+    # faster for the few LEDs of one area. Returns False for anything else, which fill()
+    # then converts and checks with NumPy.
+    def _fill_rows(self, colors):
+        try:
+            if len(colors) != self.count or set(map(len, colors)) != {3}:
+                return False
+        except TypeError:
+            return False
+        r, g, b = zip(*colors)
+        values = r + g + b
+        for value in values:
+            if value.__class__ is not int or not 0 <= value <= 255:
+                return False
+        self._buffer[:] = values
+        return True
+
+    def colors(self):
+
+        # Returns:
+        # ndarray: A (count, 3) copy of the colours in the arrays.
+
+        return self._planes.T.copy()
+
+
+def dword_arrays(colors):
+
+    # Returns new DwordArrays filled with colors.
+
+    colors = np.asarray(colors)
+    return DwordArrays(len(colors)).fill(colors)
+
+
+class LedColorsWriter:
+
+    # Sets the colours of named LEDs of one LED area with MLAPI_SetLedColors.
+
+    # The names array and the colour arrays are built once and reused for every
+    # write(). A writer is not thread-safe, use one writer per thread or worker lane.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+    # index (DWORD): The index of the LED area within the device.
+    # led_names (sequence of str): The LEDs to set, e.g. from msi.get_led_name().
+
+    __slots__ = ("device_type", "index", "names", "arrays")
+
+    def __init__(self, device_type, index, led_names):
+        self.device_type = device_type
+        self.index = index
+        self.names = bstr_array(led_names)
+        self.arrays = DwordArrays(len(self.names))
+
+    def write(self, colors):
+
+        # Sends one colour per LED name in a single SDK call.
+
+        # Parameters:
+        # colors (array_like): (n_names, 3) R, G, B values in 0-255.
+
+        # Returns:
+        # bool: True when the colors were set.
+
+        # Raises:
+        # ValueError: If colors does not have one row per LED name.
+        # InvalidArgumentError: If a value is not an integer in 0-255.
+        # MysticLightError: If the SDK returns an error status.
+
+        arrays = self.arrays.fill(colors)
+        status = msi.mlapi.MLAPI_SetLedColors(
+            self.device_type, self.index, self.names.byref(), arrays.r, arrays.g, arrays.b
+        )
+        if status != 0:
+            raise msi.error_for(status)
+        return True
+
+
+# (device_type, index, BstrArray) -> LedColorsWriter, per thread since writers are not
+# thread-safe.
+_writers = threading.local()
+
+
+def led_colors_writer(device_type, index, names):
+
+    # Returns this thread's cached LedColorsWriter for the LEDs, so msi.set_led_colors()
+    # reuses its colour arrays instead of allocating new ones on every call.
+
+    # Parameters:
+    # device_type (BSTR): The type of the device.
+    # index (DWORD): The index of the LED area within the device.
+    # names (BstrArray): The LEDs to set, from bstr_array().
+
+    # Returns:
+    # LedColorsWriter: The writer.
+
+    writers = getattr(_writers, "cache", None)
+    if writers is None:
+        writers = _writers.cache = {}
+    key = (device_type, index, names)
+    writer = writers.get(key)
+    if writer is None:
+        if len(writers) >= 256:
+            writers.clear()
+        writer = writers[key] = LedColorsWriter(device_type, index, names)
+    return writer
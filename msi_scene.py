@@ -0,0 +1,223 @@
+# Multi-device scenes.
+#
+# A Scene maps styles, colours, brightness and speed to devices or single LEDs.
+# SceneRunner applies it to every device at once: each device type has its own
+# SdkWorker lane, so a slow controller only delays its own LEDs:
+#
+#     scene = msi_scene.Scene()
+#     scene.set("MSI_MB", style="Steady", color=(255, 0, 0))
+#     scene.set("MSI_VGA", 0, color=(0, 0, 255), bright=3)
+#     with msi_scene.SceneRunner() as runner:
+#         for result in runner.apply(scene).values():
+#             print(result.device_type, result.latency)
+
+import concurrent.futures
+import threading
+import time
+from collections import namedtuple
+
+import msi
+import msi_caps
+from msi_worker import DEFAULT_RETRY, SdkWorker
+
+# Settings of a device or an LED. None leaves the setting unchanged.
+Target = namedtuple("Target", "style color bright speed", defaults=(None, None, None, None))
+
+# Outcome of applying a scene to one device.
+DeviceResult = namedtuple("DeviceResult", "device_type calls latency errors")
+
+
+class Scene:
+
+    # Desired settings per device and per LED.
+
+    # Settings for a whole device (index None) apply to every LED of the device, and
+    # settings for a single LED override them. A device wide color is sent with one
+    # MLAPI_SetLedColorsSync call.
+
+    def __init__(self):
+        # (device_type, index or None) -> Target
+        self.targets = {}
+
+    def set(self, device_type, index=None, style=None, color=None, bright=None, speed=None):
+
+        # Sets some settings of a device or an LED, keeping the others.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device.
+        # index (DWORD): The index of the LED, None for every LED of the device.
+        # style (str): The style name.
+        # color (tuple): R, G, B in 0-255.
+        # bright (int): The brightness level.
+        # speed (int): The speed level.
+
+        # Returns:
+        # Scene: This scene, so calls can be chained.
+
+        target = self.targets.get((device_type, index), Target())
+        changes = {"style": style, "color": None if color is None else tuple(color), "bright": bright, "speed": speed}
+        self.targets[device_type, index] = target._replace(
+            **{field: value for field, value in changes.items() if value is not None}
+        )
+        return self
+
+    def device_types(self):
+        return list(dict.fromkeys(device_type for device_type, index in self.targets))
+
+    def resolve(self, device_type, leds_count):
+
+        # Returns:
+        # dict: LED index -> Target with the device wide settings merged in, for the
+        # LEDs the scene changes.
+
+        device = self.targets.get((device_type, None), Target())
+        leds = {}
+        for index in range(leds_count):
+            led = self.targets.get((device_type, index))
+            if led is None and device == Target():
+                continue
+            if led is None:
+                leds[index] = device
+            else:
+                leds[index] = Target(*(value if value is not None else default for value, default in zip(led, device)))
+        return leds
+
+    def commands(self, device_type, caps):
+
+        # Builds the SDK commands applying the scene to one device.
+
+        # Styles are set first, because a style change can reset the color, then
+        # brightness, speed and color. LEDs whose color comes from the device wide color
+        # are set with one MLAPI_SetLedColorsSync call.
+
+        # Parameters:
+        # device_type (BSTR): The type of the device.
+        # caps (CapabilityIndex): The capabilities of the connected devices.
+
+        # Returns:
+        # list: (method name, arguments) tuples for SdkWorker methods.
+
+        # Raises:
+        # DeviceNotFoundError: If the device is not connected.
+
+        leds_count = caps.leds_count(device_type)
+        if not leds_count:
+            raise msi.DeviceNotFoundError(msi.MLAPI_DEVICE_NOT_FOUND, f"Device {device_type!r} is not connected")
+        leds = self.resolve(device_type, leds_count)
+        sync_color = self.targets.get((device_type, None), Target()).color
+        commands = []
+        for index, target in leds.items():
+            if target.style is not None:
+                commands.append(("set_led_style", (device_type, index, caps.led(device_type, index).styles, target.style)))
+            if target.bright is not None:
+                commands.append(("set_led_bright", (device_type, index, target.bright)))
+            if target.speed is not None:
+                commands.append(("set_led_speed", (device_type, index, target.speed)))
+        if sync_color is not None:
+            commands.append(("set_led_colors_sync", (device_type, *sync_color)))
+        for index, target in leds.items():
+            if target.color is not None and target.color != sync_color:
+                commands.append(("set_led_color", (device_type, index, *target.color)))
+        return commands
+
+
+class SceneRunner:
+
+    # Applies scenes with one SdkWorker lane per device type.
+
+    # Commands of a device run in order on the device's lane while the lanes run in
+    # parallel, so the time to apply a scene is that of the slowest device instead of
+    # the sum over all devices. Pending commands of a lane are coalesced, so applying
+    # scenes faster than a device accepts them only sends the latest settings.
+
+    # Parameters:
+    # caps (CapabilityIndex): The capabilities of the connected devices. If None, they
+    # are enumerated on the first apply().
+    # max_depth (int): Maximum number of pending commands per lane, None for no limit.
+    # retry (RetryPolicy): Retry policy of the lanes, see SdkWorker.
+
+    def __init__(self, caps=None, max_depth=None, retry=DEFAULT_RETRY):
+        self.caps = caps
+        self.max_depth = max_depth
+        self.retry = retry
+        self._lanes = {}
+        self._lock = threading.Lock()
+
+    def lane(self, device_type):
+
+        # Returns:
+        # SdkWorker: The worker of the device type, started on first use.
+
+        with self._lock:
+            worker = self._lanes.get(device_type)
+            if worker is None:
+                worker = self._lanes[device_type] = SdkWorker(
+                    self.max_depth, name=f"msi-sdk-{device_type}", retry=self.retry
+                )
+            return worker
+
+    def submit(self, scene):
+
+        # Queues the commands of a scene on the lanes of its devices.
+
+        # Parameters:
+        # scene (Scene): The scene.
+
+        # Returns:
+        # dict: Device type -> (start time, list of Future, Future of the time the
+        # device's commands finished). Devices the scene cannot be applied to get
+        # (start time, MysticLightError, None).
+
+        if self.caps is None:
+            self.caps = msi_caps.enumerate_capabilities()
+        submitted = {}
+        for device_type in scene.device_types():
+            start = time.perf_counter()
+            try:
+                commands = scene.commands(device_type, self.caps)
+            except msi.MysticLightError as e:
+                submitted[device_type] = (start, e, None)
+                continue
+            worker = self.lane(device_type)
+            futures = [getattr(worker, name)(*args) for name, args in commands]
+            # Lanes run commands in order, so this one runs after all commands above.
+            submitted[device_type] = (start, futures, worker.submit(time.perf_counter))
+        return submitted
+
+    def apply(self, scene, timeout=None):
+
+        # Applies a scene to all its devices in parallel and waits for them.
+
+        # Parameters:
+        # scene (Scene): The scene.
+        # timeout (float): Seconds to wait for all devices, None to wait until done.
+
+        # Returns:
+        # dict: Device type -> DeviceResult with the number of SDK commands, the seconds
+        # from submission until the device's last command finished (None if it did not
+        # finish within timeout) and the exceptions raised by its commands.
+
+        submitted = self.submit(scene)
+        concurrent.futures.wait([finished for start, futures, finished in submitted.values() if finished], timeout)
+        results = {}
+        for device_type, (start, futures, finished) in submitted.items():
+            if finished is None:
+                results[device_type] = DeviceResult(device_type, 0, None, [futures])
+                continue
+            errors = [future.exception() for future in futures if future.done() and future.exception() is not None]
+            latency = finished.result() - start if finished.done() else None
+            results[device_type] = DeviceResult(device_type, len(futures), latency, errors)
+        return results
+
+    def close(self, wait=True):
+        with self._lock:
+            lanes = list(self._lanes.values())
+            self._lanes.clear()
+        for worker in lanes:
+            worker.close(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
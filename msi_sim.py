@@ -0,0 +1,424 @@
+# Simulated Mystic Light SDK backend.
+#
+# SimulatedBackend implements every MLAPI function bound by msi.py in process, so the
+# wrappers can be used, profiled and load-tested without MSI hardware or Windows:
+#
+#     import msi, msi_sim
+#     msi.use_backend(msi_sim.SimulatedBackend(latency=0.002))
+#     msi.initialize_dll()
+
+import time
+from ctypes import POINTER, addressof, cast, c_void_p, pointer, sizeof
+from ctypes.wintypes import DWORD
+
+from msi import (
+    BSTR,
+    FUNCTIONS,
+    MLAPI_DEVICE_NOT_FOUND,
+    MLAPI_ERROR,
+    MLAPI_INVALID_ARGUMENT,
+    MLAPI_NO_IMPLEMENTED,
+    MLAPI_NOT_INITIALIZED,
+    MLAPI_NOT_SUPPORTED,
+    MLAPI_OK,
+    MLAPI_TIMEOUT,
+    SAFEARRAY,
+    SAFEARRAYBOUND,
+)
+
+ERROR_MESSAGES = {
+    MLAPI_OK: "Request is completed.",
+    MLAPI_ERROR: "Generic error.",
+    MLAPI_TIMEOUT: "Request is timeout.",
+    MLAPI_NO_IMPLEMENTED: "MSI application not found or installed version not supported.",
+    MLAPI_NOT_INITIALIZED: "MLAPI_Initialize has not been called successful.",
+    MLAPI_INVALID_ARGUMENT: "The parameter value is not valid.",
+    MLAPI_DEVICE_NOT_FOUND: "The device is not found.",
+    MLAPI_NOT_SUPPORTED: "Requested feature is not supported in the selected LED.",
+}
+
+# HRESULTs of SafeArrayDestroy.
+S_OK = 0
+E_INVALIDARG = -2147024809
+
+DEFAULT_STYLES = ("Off", "Steady", "Breathing", "Flashing", "Double Flashing", "Lightning", "Rainbow")
+
+# Device type -> LED count of the default simulated rig.
+DEFAULT_DEVICES = {"MSI_MB": 6, "MSI_VGA": 3, "MSI_DRAM": 4}
+
+
+class SimulatedLed:
+
+    # State and capabilities of one simulated LED (LED area in SDK terms).
+
+    # Parameters:
+    # name (str): The LED display name returned by MLAPI_GetLedInfo.
+    # styles (sequence of str): The supported styles, the first one that is not "Off" is current.
+    # max_bright (int): The maximum brightness level.
+    # max_speed (int): The maximum speed level.
+    # led_names (sequence of str): Names of the individual LEDs within the area, used by
+    # MLAPI_SetLedColors and MLAPI_SetLedColorEx.
+
+    __slots__ = ("name", "styles", "style", "color", "bright", "max_bright", "speed", "max_speed", "colors")
+
+    def __init__(self, name, styles=DEFAULT_STYLES, max_bright=5, max_speed=3, led_names=()):
+        self.name = name
+        self.styles = tuple(styles)
+        self.style = next((style for style in self.styles if style != "Off"), self.styles[0])
+        self.color = (255, 0, 0)
+        self.bright = max_bright
+        self.max_bright = max_bright
+        self.speed = 1
+        self.max_speed = max_speed
+        self.colors = {led_name: self.color for led_name in led_names}
+
+
+# Builds simulated devices from LED counts.
+def make_devices(led_counts=None, **led_options):
+
+    # Creates a device table for SimulatedBackend with uniformly configured LEDs.
+
+    # Parameters:
+    # led_counts (dict): Device type -> number of LEDs. Defaults to DEFAULT_DEVICES.
+    # led_options: Keyword arguments passed to every SimulatedLed.
+
+    # Returns:
+    # dict: Device type -> list of SimulatedLed.
+
+    if led_counts is None:
+        led_counts = DEFAULT_DEVICES
+    devices = {}
+    for device_type, count in led_counts.items():
+        devices[device_type] = [
+            SimulatedLed(
+                f"{device_type} LED {i}",
+                led_names=[f"{device_type}_{i}_{n}" for n in range(4)],
+                **led_options,
+            )
+            for i in range(count)
+        ]
+    return devices
+
+
+# Returns the ctypes object behind a byref() or pointer() out parameter.
+def _out(arg):
+    obj = getattr(arg, "_obj", None)
+    if obj is not None:
+        return obj
+    return arg.contents
+
+
+# Returns the address a BSTR points to.
+def _address(bstr):
+    return c_void_p.from_buffer(bstr).value
+
+
+# Returns the Python string of a BSTR argument.
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.value
+
+
+# Reads count DWORDs from a DWORD array or pointer argument.
+def _dwords(arg, count):
+    arg = getattr(arg, "_obj", arg)
+    if isinstance(arg, DWORD):
+        arg = pointer(arg)
+    return cast(arg, POINTER(DWORD))[:count]
+
+
+class SimulatedBackend:
+
+    # In-process backend for msi.use_backend() modelling devices, LEDs, styles,
+    # brightness/speed ranges and per-call latency.
+
+    # Every MLAPI function validates its arguments like the SDK documentation describes
+    # and returns the matching MLAPI status value. Calls are counted in calls, so the SDK
+    # traffic of higher level code can be measured.
+
+    # Returned SAFEARRAYs and BSTRs are tracked in allocations until they are freed with
+    # SafeArrayDestroy and SysFreeString, like oleaut32 would, so leaks show up there.
+    # Freeing something that is not allocated is counted in invalid_frees.
+
+    # Parameters:
+    # devices (dict): Device type -> list of SimulatedLed. Defaults to make_devices().
+    # latency (float): Seconds every call takes.
+    # latencies (dict): MLAPI function name -> seconds, overriding latency for that function.
+
+    def __init__(self, devices=None, latency=0.0, latencies=None):
+        self.devices = make_devices() if devices is None else devices
+        self.latency = latency
+        self.latencies = dict(latencies or {})
+        self.initialized = False
+        self.calls = dict.fromkeys(FUNCTIONS, 0)
+        self.allocations = {}
+        self.invalid_frees = 0
+
+    # Accounts a call and returns a status if the call cannot proceed.
+    def _enter(self, name):
+        self.calls[name] += 1
+        delay = self.latencies.get(name, self.latency)
+        if delay:
+            time.sleep(delay)
+        if not self.initialized:
+            return MLAPI_NOT_INITIALIZED
+        return MLAPI_OK
+
+    # Returns the LED at index of device_type, or None.
+    def _led(self, device_type, index):
+        leds = self.devices.get(_text(device_type))
+        if leds is None or not 0 <= index < len(leds):
+            return None
+        return leds[index]
+
+    # Builds a one dimensional SAFEARRAY of BSTRs owned by the Python objects.
+    def _bstr_array(self, values):
+        data = (BSTR * len(values))(*values)
+        array = SAFEARRAY(
+            cDims=1,
+            cbElements=sizeof(BSTR),
+            pvData=addressof(data),
+            rgsabound=(SAFEARRAYBOUND * 1)(SAFEARRAYBOUND(len(values), 0)),
+        )
+        array._data = data
+        self.allocations[addressof(array)] = array
+        return array
+
+    # Returns a string through a BSTR* out parameter.
+    def _bstr_out(self, arg, text):
+        bstr = _out(arg)
+        bstr.value = text
+        self.allocations[_address(bstr)] = text
+
+    # Frees a SAFEARRAY returned by the backend, returns an HRESULT.
+    def SafeArrayDestroy(self, pArray):
+        if self.allocations.pop(addressof(pArray.contents), None) is None:
+            self.invalid_frees += 1
+            return E_INVALIDARG
+        return S_OK
+
+    # Frees a BSTR returned by the backend.
+    def SysFreeString(self, bstr):
+        if self.allocations.pop(_address(bstr), None) is None:
+            self.invalid_frees += 1
+
+    # Returns the number of MLAPI calls made so far.
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def MLAPI_GetErrorMessage(self, error_code, pDesc):
+        self.calls["MLAPI_GetErrorMessage"] += 1
+        self._bstr_out(pDesc, ERROR_MESSAGES.get(error_code, "Unknown error."))
+        return MLAPI_OK
+
+    def MLAPI_Initialize(self):
+        self._enter("MLAPI_Initialize")
+        self.initialized = True
+        return MLAPI_OK
+
+    def MLAPI_Release(self):
+        status = self._enter("MLAPI_Release")
+        self.initialized = False
+        return status
+
+    def MLAPI_GetDeviceInfo(self, pDevType, pLedCount):
+        status = self._enter("MLAPI_GetDeviceInfo")
+        if status:
+            return status
+        _out(pDevType).contents = self._bstr_array(list(self.devices))
+        _out(pLedCount).contents = self._bstr_array([str(len(leds)) for leds in self.devices.values()])
+        return MLAPI_OK
+
+    def MLAPI_GetDeviceName(self, device_type, pDevName):
+        status = self._enter("MLAPI_GetDeviceName")
+        if status:
+            return status
+        if _text(device_type) not in self.devices:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(pDevName).contents = self._bstr_array([f"MSI {_text(device_type)}"])
+        return MLAPI_OK
+
+    def MLAPI_GetDeviceNameEx(self, device_type, index, pDevName):
+        status = self._enter("MLAPI_GetDeviceNameEx")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        self._bstr_out(pDevName, led.name)
+        return MLAPI_OK
+
+    def MLAPI_GetLedInfo(self, device_type, index, pName, pLedStyles):
+        status = self._enter("MLAPI_GetLedInfo")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        self._bstr_out(pName, led.name)
+        _out(pLedStyles).contents = self._bstr_array(led.styles)
+        return MLAPI_OK
+
+    def MLAPI_GetLedName(self, device_type, pLedName):
+        status = self._enter("MLAPI_GetLedName")
+        if status:
+            return status
+        leds = self.devices.get(_text(device_type))
+        if leds is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(pLedName).contents = self._bstr_array([name for led in leds for name in led.colors])
+        return MLAPI_OK
+
+    def MLAPI_GetLedColor(self, device_type, index, R, G, B):
+        status = self._enter("MLAPI_GetLedColor")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(R).value, _out(G).value, _out(B).value = led.color
+        return MLAPI_OK
+
+    def MLAPI_GetLedStyle(self, device_type, index, style):
+        status = self._enter("MLAPI_GetLedStyle")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        self._bstr_out(style, led.style)
+        return MLAPI_OK
+
+    def MLAPI_GetLedMaxBright(self, device_type, index, maxLevel):
+        status = self._enter("MLAPI_GetLedMaxBright")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(maxLevel).value = led.max_bright
+        return MLAPI_OK
+
+    def MLAPI_GetLedBright(self, device_type, index, currentLevel):
+        status = self._enter("MLAPI_GetLedBright")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(currentLevel).value = led.bright
+        return MLAPI_OK
+
+    def MLAPI_GetLedMaxSpeed(self, device_type, index, maxLevel):
+        status = self._enter("MLAPI_GetLedMaxSpeed")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(maxLevel).value = led.max_speed
+        return MLAPI_OK
+
+    def MLAPI_GetLedSpeed(self, device_type, index, currentLevel):
+        status = self._enter("MLAPI_GetLedSpeed")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        _out(currentLevel).value = led.speed
+        return MLAPI_OK
+
+    def MLAPI_SetLedStyle(self, device_type, index, style):
+        status = self._enter("MLAPI_SetLedStyle")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        style = _text(style)
+        if style not in led.styles:
+            return MLAPI_NOT_SUPPORTED
+        led.style = style
+        return MLAPI_OK
+
+    def MLAPI_SetLedBright(self, device_type, index, level):
+        status = self._enter("MLAPI_SetLedBright")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        if not 1 <= level <= led.max_bright:
+            return MLAPI_INVALID_ARGUMENT
+        led.bright = level
+        return MLAPI_OK
+
+    def MLAPI_SetLedSpeed(self, device_type, index, level):
+        status = self._enter("MLAPI_SetLedSpeed")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        if not 1 <= level <= led.max_speed:
+            return MLAPI_INVALID_ARGUMENT
+        led.speed = level
+        return MLAPI_OK
+
+    def MLAPI_SetLedColor(self, device_type, index, R, G, B):
+        status = self._enter("MLAPI_SetLedColor")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        if R > 255 or G > 255 or B > 255:
+            return MLAPI_INVALID_ARGUMENT
+        led.color = (R, G, B)
+        return MLAPI_OK
+
+    def MLAPI_SetLedColorsSync(self, device_type, R, G, B):
+        status = self._enter("MLAPI_SetLedColorsSync")
+        if status:
+            return status
+        leds = self.devices.get(_text(device_type))
+        if leds is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        if R > 255 or G > 255 or B > 255:
+            return MLAPI_INVALID_ARGUMENT
+        for led in leds:
+            led.color = (R, G, B)
+        return MLAPI_OK
+
+    def MLAPI_SetLedColors(self, device_type, index, pLedName, R, G, B):
+        status = self._enter("MLAPI_SetLedColors")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        array = _out(pLedName).contents
+        count = array.rgsabound[0].cElements
+        names = cast(array.pvData, POINTER(BSTR))[:count]
+        colors = zip(_dwords(R, count), _dwords(G, count), _dwords(B, count))
+        for name, color in zip(names, colors):
+            name = _text(name)
+            if name not in led.colors or max(color) > 255:
+                return MLAPI_INVALID_ARGUMENT
+            led.colors[name] = color
+        return MLAPI_OK
+
+    def MLAPI_SetLedColorEx(self, device_type, index, pLedName, R, G, B, Sync):
+        status = self._enter("MLAPI_SetLedColorEx")
+        if status:
+            return status
+        led = self._led(device_type, index)
+        if led is None:
+            return MLAPI_DEVICE_NOT_FOUND
+        name = _text(pLedName)
+        if name not in led.colors or R > 255 or G > 255 or B > 255:
+            return MLAPI_INVALID_ARGUMENT
+        led.colors[name] = (R, G, B)
+        return MLAPI_OK
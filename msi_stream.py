@@ -0,0 +1,335 @@
+# Streaming LED pipeline.
+#
+# Stages are generators passing Packets along: a source reads NumPy buffers (video
+# frames, audio blocks) from a file or pipe, transforms turn them into (n_leds, 3) LED
+# frames and StreamSink pushes those to a device. LatestBuffer decouples two stages with
+# a bounded latest-wins buffer, so a slow SDK drops stale frames instead of growing
+# memory, and StreamSink measures the latency from source to LED:
+#
+#     # ffmpeg -i video.mp4 -vf scale=128:72 -f rawvideo -pix_fmt rgb24 - | python ambient.py
+#     frames = msi_stream.read_blocks(sys.stdin.buffer, (72, 128, 3))
+#     leds = msi_stream.smooth(msi_stream.zones(frames, 6), 0.3)
+#     sink = msi_stream.StreamSink("MSI_MB")
+#     sink.run(msi_stream.LatestBuffer.feed(leds))
+#     print(sink.stats())
+
+import threading
+import time
+from collections import deque, namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+import msi
+import msi_frame
+from msi_color import hsv_to_rgb, to_uint8
+from msi_metrics import LatencyHistogram
+
+# One item of a stream: the time.perf_counter() the source produced it at and its data.
+Packet = namedtuple("Packet", "timestamp data")
+
+
+def read_blocks(file, shape, dtype=np.uint8):
+
+    # Source reading fixed-size raw blocks, e.g. rgb24 video frames from ffmpeg or PCM
+    # audio blocks from arecord.
+
+    # Parameters:
+    # file: A binary file or pipe opened for reading.
+    # shape (tuple): The shape of one block, (height, width, 3) for video frames and
+    # (samples,) or (samples, channels) for audio.
+    # dtype: The sample type.
+
+    # Yields:
+    # Packet: One block each, stamped when it was read completely. A short block at the
+    # end of the stream is dropped.
+
+    size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    while True:
+        block = np.empty(shape, dtype)
+        view = memoryview(block).cast("B")
+        filled = 0
+        while filled < size:
+            count = file.readinto(view[filled:])
+            if not count:
+                return
+            filled += count
+        yield Packet(time.perf_counter(), block)
+
+
+def array_source(arrays, fps=None):
+
+    # Source replaying in-memory buffers.
+
+    # Parameters:
+    # arrays: An iterable of arrays.
+    # fps (float): Rate to yield them at, None for as fast as they are consumed.
+
+    # Yields:
+    # Packet: One array each. With fps, it is stamped with the time it was due, like a
+    # live source would, so consumers falling behind see the growing latency.
+
+    start = time.perf_counter()
+    for tick, array in enumerate(arrays):
+        if fps:
+            due = start + tick / fps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield Packet(due, array)
+        else:
+            yield Packet(time.perf_counter(), array)
+
+
+# Returns the first column (or row) of every zone, cached per size.
+@lru_cache(maxsize=None)
+def _zone_edges(size, leds_count):
+    return np.linspace(0, size, leds_count + 1).astype(np.intp)[:-1]
+
+
+def zones(packets, leds_count, axis=1):
+
+    # Transform averaging image frames into one color per LED zone.
+
+    # The image is split into leds_count equal strips along axis, LED i gets the mean
+    # color of strip i, like an ambient light behind a screen.
+
+    # Parameters:
+    # packets: Packets with (height, width, 3) frames.
+    # leds_count (int): The number of LEDs, at most the image size along axis.
+    # axis (int): 1 for vertical strips from left to right, 0 for horizontal strips
+    # from top to bottom.
+
+    # Yields:
+    # Packet: (leds_count, 3) float frames with values in 0-255.
+
+    for timestamp, frame in packets:
+        profile = frame.mean(axis=1 - axis, dtype=np.float32)
+        edges = _zone_edges(profile.shape[0], leds_count)
+        sums = np.add.reduceat(profile, edges, axis=0)
+        widths = np.diff(np.append(edges, profile.shape[0]))
+        yield Packet(timestamp, sums / widths[:, None])
+
+
+# Returns the Hann window and the first FFT bin of every band, cached per block size.
+@lru_cache(maxsize=None)
+def _spectrum_bands(samples, leds_count):
+    bins = samples // 2 + 1
+    if bins < leds_count + 2:
+        raise ValueError(f"blocks of {samples} samples are too short for {leds_count} bands")
+    window = np.hanning(samples).astype(np.float32)
+    # Log spaced bands from bin 1, at least one bin wide.
+    edges = np.geomspace(1, bins, leds_count + 1).astype(np.intp)
+    edges = np.maximum(edges, np.arange(1, leds_count + 2))
+    return window, edges[:-1], min(edges[-1], bins)
+
+
+def spectrum(packets, leds_count, floor_db=-60.0, saturation=1.0):
+
+    # Transform turning audio blocks into a spectrum analyzer, one band per LED.
+
+    # Bands are spaced logarithmically from the lowest to the highest frequency. Every
+    # LED gets a hue from red (bass) to blue (treble) and the band's level as value:
+    # floor_db and quieter is dark, full scale is full brightness.
+
+    # Parameters:
+    # packets: Packets with (samples,) or (samples, channels) blocks. Integer samples
+    # are scaled to their type's full range, float samples are taken as -1.0 to 1.0.
+    # leds_count (int): The number of LEDs.
+    # floor_db (float): The level in dBFS shown as off.
+    # saturation (float): The saturation of the colors.
+
+    # Yields:
+    # Packet: (leds_count, 3) uint8 frames.
+
+    # Raises:
+    # ValueError: If the blocks have fewer than 2 * leds_count + 2 samples.
+
+    hue = np.linspace(0.0, 2.0 / 3.0, leds_count)
+    hsv = np.empty((leds_count, 3))
+    hsv[:, 0] = hue
+    hsv[:, 1] = saturation
+    for timestamp, block in packets:
+        full_scale = np.iinfo(block.dtype).max if block.dtype.kind in "iu" else 1.0
+        samples = block.mean(axis=1, dtype=np.float32) if block.ndim == 2 else block.astype(np.float32)
+        window, starts, stop = _spectrum_bands(len(samples), leds_count)
+        magnitude = np.abs(np.fft.rfft(samples * window)) * (2.0 / (window.sum() * full_scale))
+        levels = np.maximum.reduceat(magnitude[:stop], starts)
+        db = 20.0 * np.log10(np.maximum(levels, 1e-12))
+        hsv[:, 2] = np.clip(1.0 - db / floor_db, 0.0, 1.0)
+        yield Packet(timestamp, hsv_to_rgb(hsv))
+
+
+def smooth(packets, alpha, decay=None):
+
+    # Transform smoothing frames with an exponential moving average.
+
+    # Parameters:
+    # packets: Packets with frames of one shape.
+    # alpha (float): Weight of the new frame in (0, 1], 1 for no smoothing.
+    # decay (float): Weight of the new frame where it is darker than the average, for
+    # a fast attack and a slow release with audio. Defaults to alpha.
+
+    # Yields:
+    # Packet: Float frames of the same shape.
+
+    state = None
+    for timestamp, frame in packets:
+        frame = np.asarray(frame, dtype=np.float32)
+        if state is None:
+            state = frame.copy()
+        elif decay is None:
+            state += alpha * (frame - state)
+        else:
+            delta = frame - state
+            state += np.where(delta > 0, alpha, decay) * delta
+        yield Packet(timestamp, state.copy())
+
+
+class LatestBuffer:
+
+    # Bounded buffer between two threads where the newest items win.
+
+    # put() never blocks: when the buffer is full the oldest item is dropped and counted
+    # in dropped. Iterating yields items until close() was called and the buffer is
+    # empty, then raises the error close() was given, if any.
+
+    # Parameters:
+    # maxlen (int): The capacity, 1 to always hand out only the latest item.
+
+    def __init__(self, maxlen=1):
+        self.items = deque(maxlen=maxlen)
+        self.put_count = 0
+        self.dropped = 0
+        self.closed = False
+        self.error = None
+        self._condition = threading.Condition()
+
+    def put(self, item):
+        with self._condition:
+            if len(self.items) == self.items.maxlen:
+                self.dropped += 1
+            self.items.append(item)
+            self.put_count += 1
+            self._condition.notify()
+
+    def close(self, error=None):
+        with self._condition:
+            self.closed = True
+            self.error = error
+            self._condition.notify_all()
+
+    def __iter__(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self.items and not self.closed:
+                        self._condition.wait()
+                    if not self.items:
+                        break
+                    item = self.items.popleft()
+                yield item
+        finally:
+            # Stops the producer of feed() when the consumer stops early.
+            self.closed = True
+        if self.error is not None:
+            raise self.error
+
+    @classmethod
+    def feed(cls, packets, maxlen=1):
+
+        # Runs the stages producing packets on their own thread.
+
+        # Parameters:
+        # packets: The upstream iterable.
+        # maxlen (int): The capacity of the buffer.
+
+        # Returns:
+        # LatestBuffer: The buffer the packets are put into, to be iterated by the next
+        # stage.
+
+        buffer = cls(maxlen)
+
+        def produce():
+            try:
+                for packet in packets:
+                    if buffer.closed:
+                        return
+                    buffer.put(packet)
+            except BaseException as e:
+                buffer.close(e)
+            else:
+                buffer.close()
+
+        threading.Thread(target=produce, name="msi-stream", daemon=True).start()
+        return buffer
+
+
+class StreamSink:
+
+    # Pushes LED frames to a device and measures the latency from the source.
+
+    # Latency is the time from a packet's source timestamp until the push returned.
+    # Frames failing with MysticLightError are counted and the sink keeps running, like
+    # EffectEngine.
+
+    # Parameters:
+    # device_type (BSTR): The device the frames are sent to.
+    # push: Function called as push(device_type, frame) with an (n_leds, 3) uint8
+    # frame, returning the number of SDK calls. msi_frame.push_frame by default,
+    # msi_color.push_frame adds gamma and brightness correction.
+
+    def __init__(self, device_type, push=None):
+        self.device_type = device_type
+        self.push = msi_frame.push_frame if push is None else push
+        self.frames = 0
+        self.calls = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+        self.buffers = []
+
+    def run(self, packets, duration=None):
+
+        # Consumes packets until the stream ends or duration seconds have passed.
+
+        # Parameters:
+        # packets: Packets with (n_leds, 3) frames. LatestBuffers among them are
+        # reported in stats().
+        # duration (float): Seconds to run, None to run until the stream ends.
+
+        if isinstance(packets, LatestBuffer):
+            self.buffers.append(packets)
+        end = None if duration is None else time.perf_counter() + duration
+        perf_counter = time.perf_counter
+        iterator = iter(packets)
+        try:
+            for timestamp, frame in iterator:
+                try:
+                    self.calls += self.push(self.device_type, to_uint8(frame)) or 0
+                except msi.MysticLightError:
+                    self.errors += 1
+                now = perf_counter()
+                self.latency.record(int((now - timestamp) * 1e9))
+                self.frames += 1
+                if end is not None and now >= end:
+                    break
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def stats(self):
+
+        # Returns:
+        # dict: Frames pushed, SDK calls, failed frames, frames dropped by LatestBuffers
+        # and the p50/p99/max source to LED latency in seconds.
+
+        return {
+            "frames": self.frames,
+            "calls": self.calls,
+            "errors": self.errors,
+            "dropped": sum(buffer.dropped for buffer in self.buffers),
+            "p50": self.latency.percentile(50) / 1e9,
+            "p99": self.latency.percentile(99) / 1e9,
+            "max": self.latency.max / 1e9,
+        }
@@ -0,0 +1,343 @@
+# Per-device write throttling.
+#
+# Throttle puts a token bucket in front of the setters of every device. Writes run on
+# one SdkWorker lane per device; while a lane waits for tokens, newer writes to the same
+# LED replace the pending ones, so stale intermediate frames are dropped instead of
+# queued. The budget of each device adapts to the controller: it shrinks when calls
+# fail with transient errors or get slow, and grows while the budget is what holds
+# writes back:
+#
+#     throttle = msi_throttle.Throttle(rate=200)
+#     for frame in frames:
+#         throttle.push_frame("MSI_MB", frame)
+#     print(throttle.stats())
+#     throttle.close()
+
+import itertools
+import threading
+import time
+
+import msi
+import msi_frame
+from msi_metrics import LatencyHistogram
+from msi_worker import SdkWorker
+
+
+class TokenBucket:
+
+    # Token bucket refilled at rate tokens per second, holding at most burst tokens.
+
+    # A call needs one token to start. consume() may take more than there are, e.g. for
+    # a frame that turned out to need several SDK calls, and the debt delays later calls.
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def wait_time(self, now):
+
+        # Returns:
+        # float: Seconds until a token is available, 0 if one is available now.
+
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def consume(self, count=1):
+        self.tokens -= count
+
+
+class AdaptiveLimit:
+
+    # Additive increase, multiplicative decrease of a call rate.
+
+    # Calls are judged in windows of window calls. A window with a transient error
+    # (msi.TRANSIENT_ERRORS) or a mean latency above target_latency multiplies the rate
+    # by decrease. A clean window in which calls had to wait for tokens adds increase.
+
+    # Parameters:
+    # rate (float): The initial calls per second.
+    # min_rate, max_rate (float): The bounds of the rate.
+    # target_latency (float): Seconds a call may take on average before the rate shrinks.
+    # increase (float): Calls per second added after a clean, throttled window, 1/10 of
+    # the initial rate by default.
+    # decrease (float): Factor applied after a window with trouble.
+    # window (int): Calls per adjustment.
+
+    def __init__(
+        self, rate, min_rate, max_rate, target_latency=0.02, increase=None, decrease=0.7, window=20
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.increase = rate * 0.1 if increase is None else increase
+        self.decrease = decrease
+        self.window = window
+        self._calls = 0
+        self._errors = 0
+        self._latency = 0.0
+        self._throttled = 0
+
+    def record(self, latency, error, throttled, calls=1):
+
+        # Parameters:
+        # latency (float): Seconds the write took.
+        # error (bool): Whether it failed with a transient error.
+        # throttled (bool): Whether it had to wait for a token.
+        # calls (int): The SDK calls the write made.
+
+        # Returns:
+        # int: -1 if the rate shrank, 1 if it grew, 0 otherwise.
+
+        self._calls += calls
+        self._errors += error
+        self._latency += latency
+        self._throttled += throttled
+        if self._calls < self.window:
+            return 0
+        trouble = self._errors or self._latency / self._calls > self.target_latency
+        throttled = self._throttled
+        self._calls = self._errors = self._throttled = 0
+        self._latency = 0.0
+        if trouble and self.rate > self.min_rate:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            return -1
+        if not trouble and throttled and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            return 1
+        return 0
+
+
+class DeviceThrottle:
+
+    # The lane, bucket and counters of one device.
+
+    def __init__(self, device_type, limit, burst):
+        self.device_type = device_type
+        self.limit = limit
+        self.burst = burst
+        self.bucket = TokenBucket(limit.rate, max(1.0, limit.rate * burst))
+        # No retries: failed calls are the signal the budget adapts to.
+        self.lane = SdkWorker(name=f"msi-throttle-{device_type}", retry=None)
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.wait_time = 0.0
+        self.shrinks = 0
+        self.grows = 0
+        self.stale = 0
+        self.latency = LatencyHistogram()
+        # Coalescing key -> sequence number of its latest write.
+        self._latest = {}
+        self._sequence = itertools.count()
+        self._held = False
+
+    def _set_rate(self, rate):
+        self.bucket.rate = rate
+        self.bucket.burst = max(1.0, rate * self.burst)
+
+    def submit(self, key, function, *args):
+        sequence = self._latest[key] = next(self._sequence)
+        return self.lane.submit(self.call, key, sequence, function, *args, key=key)
+
+    # Runs one write on the lane thread once the bucket allows it. A write superseded by
+    # a newer one while it waited is dropped and resolves to None.
+    def call(self, key, sequence, function, *args):
+        bucket = self.bucket
+        waited = False
+        while True:
+            now = time.monotonic()
+            delay = bucket.wait_time(now)
+            if not delay:
+                break
+            waited = True
+            time.sleep(delay)
+            self.wait_time += delay
+        self.throttled += waited
+        if self._latest[key] != sequence:
+            # The budget held this write back until it went stale.
+            self.stale += 1
+            self._held = True
+            return None
+        start = time.perf_counter()
+        error = None
+        try:
+            result = function(*args)
+        except msi.MysticLightError as e:
+            error = e
+            result = None
+        latency = time.perf_counter() - start
+        # A frame costs the SDK calls it made, an unchanged frame nothing and a failed
+        # frame as much as a full one, since it may have failed at its last LED.
+        calls = 1
+        if function is msi_frame.push_frame:
+            calls = result if error is None else len(args[1]) // 3
+        bucket.consume(calls)
+        self.calls += calls
+        if error is not None:
+            self.errors += 1
+        if not calls:
+            return result
+        self.latency.record(int(latency * 1e9))
+        transient = error is not None and error.code in msi.TRANSIENT_ERRORS
+        change = self.limit.record(latency, transient, waited or self._held, calls)
+        self._held = False
+        if change:
+            self._set_rate(self.limit.rate)
+            if change < 0:
+                self.shrinks += 1
+            else:
+                self.grows += 1
+        if error is not None:
+            raise error
+        return result
+
+    def stats(self):
+        lane = self.lane.stats()
+        return {
+            "rate": self.limit.rate,
+            "calls": self.calls,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "wait_time": self.wait_time,
+            "dropped": lane["coalesced"] + self.stale,
+            "pending": lane["queue_depth"],
+            "shrinks": self.shrinks,
+            "grows": self.grows,
+            "p50_latency": self.latency.percentile(50) / 1e9,
+            "p99_latency": self.latency.percentile(99) / 1e9,
+        }
+
+
+class Throttle:
+
+    # Rate limited, adaptive setters for every device.
+
+    # The setters take the arguments of the msi.py setters and return a Future like
+    # SdkWorker. Futures of writes replaced while queued get the newer write's result,
+    # writes replaced while waiting for the budget resolve to None.
+
+    # Parameters:
+    # rate (float): Initial SDK calls per second per device.
+    # min_rate, max_rate (float): Bounds of the adapted rate, see AdaptiveLimit.
+    # burst (float): Seconds of budget a device may use at once after being idle.
+    # adaptive (bool): Adapt the rate, False to keep rate fixed.
+    # limit_options: Further AdaptiveLimit parameters (target_latency, increase, ...).
+
+    def __init__(self, rate=100.0, min_rate=5.0, max_rate=1000.0, burst=0.05, adaptive=True, **limit_options):
+        if not adaptive:
+            min_rate = max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.limit_options = limit_options
+        self.devices = {}
+        self._lock = threading.Lock()
+
+    def device(self, device_type):
+
+        # Returns:
+        # DeviceThrottle: The throttle of the device, created on first use.
+
+        with self._lock:
+            device = self.devices.get(device_type)
+            if device is None:
+                limit = AdaptiveLimit(self.rate, self.min_rate, self.max_rate, **self.limit_options)
+                device = self.devices[device_type] = DeviceThrottle(device_type, limit, self.burst)
+            return device
+
+    def _submit(self, key, function, device_type, *args):
+        return self.device(device_type).submit(key, function, device_type, *args)
+
+    def set_led_color(self, device_type, index, r, g, b):
+        return self._submit(("color", index), msi.set_led_color, device_type, index, r, g, b)
+
+    def set_led_colors_sync(self, device_type, r, g, b):
+        return self._submit(("sync",), msi.set_led_colors_sync, device_type, r, g, b)
+
+    def set_led_color_ex(self, device_type, index, pLedName, r, g, b, sync):
+        return self._submit(("color", index, pLedName), msi.set_led_color_ex, device_type, index, pLedName, r, g, b, sync)
+
+    def set_led_colors(self, device_type, index, led_names, colors):
+        led_names = tuple(led_names)
+        return self._submit(("colors", index, led_names), msi.set_led_colors, device_type, index, led_names, colors)
+
+    def set_led_style(self, device_type, index, led_styles, style):
+        return self._submit(("style", index), msi.set_led_style, device_type, index, led_styles, style)
+
+    def set_led_bright(self, device_type, index, level):
+        return self._submit(("bright", index), msi.set_led_bright, device_type, index, level)
+
+    def set_led_speed(self, device_type, index, level):
+        return self._submit(("speed", index), msi.set_led_speed, device_type, index, level)
+
+    def push_frame(self, device_type, frame):
+
+        # Queues a frame for msi_frame.push_frame(), replacing a pending frame of the
+        # device. A frame costs one token per SDK call it makes.
+
+        # Returns:
+        # Future: Resolves to the number of SDK calls made.
+
+        # Raises:
+        # ValueError: If the frame does not have three 8-bit components per LED, checked
+        # before it is queued.
+
+        return self._submit(("frame",), msi_frame.push_frame, device_type, msi_frame.frame_bytes(frame))
+
+    def stats(self):
+
+        # Returns:
+        # dict: Device type -> current rate, calls, failed calls, throttled calls, seconds
+        # waited for tokens, writes dropped as stale, pending writes, rate changes and
+        # p50/p99 call latency in seconds.
+
+        with self._lock:
+            devices = list(self.devices.values())
+        return {device.device_type: device.stats() for device in devices}
+
+    def to_prometheus(self, prefix="msi_throttle"):
+
+        # Returns:
+        # str: The stats in the Prometheus text exposition format.
+
+        metrics = (
+            ("rate", "rate", "gauge", "Current SDK call budget per second."),
+            ("calls", "calls_total", "counter", "SDK calls made."),
+            ("errors", "errors_total", "counter", "Writes failing with an MLAPI status."),
+            ("throttled", "throttled_total", "counter", "Writes that waited for the budget."),
+            ("wait_time", "wait_seconds_total", "counter", "Seconds writes waited for the budget."),
+            ("dropped", "dropped_total", "counter", "Stale writes replaced before they ran."),
+            ("pending", "pending", "gauge", "Writes waiting to run."),
+            ("shrinks", "shrinks_total", "counter", "Budget decreases."),
+            ("grows", "grows_total", "counter", "Budget increases."),
+        )
+        stats = self.stats()
+        lines = []
+        for name, suffix, kind, help_text in metrics:
+            metric = f"{prefix}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for device_type, device in stats.items():
+                lines.append(f'{metric}{{device="{device_type}"}} {device[name]}')
+        return "\n".join(lines) + "\n"
+
+    def close(self, wait=True):
+        with self._lock:
+            devices = list(self.devices.values())
+        for device in devices:
+            device.lane.close(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
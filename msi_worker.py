@@ -0,0 +1,173 @@
+# Dedicated SDK worker thread.
+#
+# SdkWorker owns all SDK calls: callers submit commands and get futures back, while a
+# single thread runs them in submission order. Pending color, brightness and speed
+# updates of the same LED are coalesced, so only the latest one reaches the SDK:
+#
+#     worker = msi_worker.SdkWorker()
+#     worker.set_led_color(device_type, 0, 255, 0, 0)
+#     color = worker.submit(msi.get_led_color, device_type, 0).result()
+#     worker.close()
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import msi
+
+# Retry policy of workers that are not given one.
+DEFAULT_RETRY = msi.RetryPolicy()
+
+
+class QueueFull(Exception):
+    # Raised through a command's future when the worker queue was full.
+    pass
+
+
+class SdkWorker:
+
+    # Runs SDK calls on one thread consuming a coalescing command queue.
+
+    # Commands with a coalescing key replace a pending command with the same key: the
+    # superseded command is not executed and its future gets the result of the command
+    # that replaced it. Commands without a key always run. Commands run in the order
+    # they were (last) submitted.
+
+    # Parameters:
+    # max_depth (int): Maximum number of pending commands, None for no limit. Commands
+    # submitted to a full queue are dropped and their futures fail with QueueFull.
+    # name (str): Name of the worker thread.
+    # retry (RetryPolicy): Retries commands failing with a transient MLAPI status on the
+    # worker thread, DEFAULT_RETRY by default. None to fail on the first error.
+
+    def __init__(self, max_depth=None, name="msi-sdk", retry=DEFAULT_RETRY):
+        self.max_depth = max_depth
+        self.retry = retry
+        self.submitted = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, function, *args, key=None):
+
+        # Queues function(*args) for the worker thread.
+
+        # Parameters:
+        # function: The function to call, usually an msi.py wrapper.
+        # args: Its arguments.
+        # key: Coalescing key, None if the command must not be coalesced.
+
+        # Returns:
+        # Future: Resolves to the function's return value.
+
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("SdkWorker is closed")
+            self.submitted += 1
+            if key is None:
+                key = object()
+            futures = [future]
+            superseded = self._pending.pop(key, None)
+            if superseded is not None:
+                self.coalesced += 1
+                futures.extend(superseded[2])
+            elif self.max_depth is not None and len(self._pending) >= self.max_depth:
+                self.dropped += 1
+                future.set_exception(QueueFull(f"{len(self._pending)} commands pending"))
+                return future
+            self._pending[key] = (function, args, futures)
+            self._condition.notify()
+        return future
+
+    def set_led_color(self, device_type, index, r, g, b):
+        return self.submit(msi.set_led_color, device_type, index, r, g, b, key=("color", device_type, index))
+
+    def set_led_colors_sync(self, device_type, r, g, b):
+        return self.submit(msi.set_led_colors_sync, device_type, r, g, b, key=("sync", device_type))
+
+    def set_led_color_ex(self, device_type, index, pLedName, r, g, b, sync):
+        return self.submit(
+            msi.set_led_color_ex, device_type, index, pLedName, r, g, b, sync, key=("color", device_type, index, pLedName)
+        )
+
+    def set_led_colors(self, device_type, index, led_names, colors):
+        led_names = tuple(led_names)
+        return self.submit(
+            msi.set_led_colors, device_type, index, led_names, colors, key=("colors", device_type, index, led_names)
+        )
+
+    def set_led_style(self, device_type, index, led_styles, style):
+        return self.submit(
+            msi.set_led_style, device_type, index, led_styles, style, key=("style", device_type, index)
+        )
+
+    def set_led_bright(self, device_type, index, level):
+        return self.submit(msi.set_led_bright, device_type, index, level, key=("bright", device_type, index))
+
+    def set_led_speed(self, device_type, index, level):
+        return self.submit(msi.set_led_speed, device_type, index, level, key=("speed", device_type, index))
+
+    def queue_depth(self):
+        with self._condition:
+            return len(self._pending)
+
+    def stats(self):
+
+        # Returns:
+        # dict: The queue depth and the submitted, executed, coalesced and dropped counters.
+
+        with self._condition:
+            return {
+                "queue_depth": len(self._pending),
+                "submitted": self.submitted,
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                function, args, futures = self._pending.popitem(last=False)[1]
+            futures = [future for future in futures if future.set_running_or_notify_cancel()]
+            if not futures:
+                continue
+            try:
+                result = function(*args) if self.retry is None else self.retry.call(function, *args)
+            except BaseException as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(result)
+            with self._condition:
+                self.executed += 1
+
+    def close(self, wait=True):
+
+        # Stops accepting commands. The pending commands still run.
+
+        # Parameters:
+        # wait (bool): Wait until the worker thread has finished.
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if wait:
+            self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
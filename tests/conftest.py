@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "bench")]
+
+import msi  # noqa: E402
+import msi_sim  # noqa: E402
+
+
+# The simulated backend, initialized, with a two LED motherboard and a one LED card.
+@pytest.fixture
+def sim():
+    backend = msi_sim.SimulatedBackend(msi_sim.make_devices({"MSI_MB": 2, "MSI_VGA": 1}))
+    msi.use_backend(backend)
+    msi.initialize_dll()
+    yield backend
+    msi.release_dll()
@@ -0,0 +1,17 @@
+import check_import_time
+
+# Headroom over check_import_time.BUDGET_US for noisy machines, so only real
+# regressions fail.
+TOLERANCE = 1.5
+
+
+def test_import_defers_modules_and_library():
+    imported, loaded = check_import_time.import_state()
+    assert imported == []
+    assert loaded == (None, None)
+
+
+def test_import_time_within_budget():
+    check_import_time.python("-c", "import msi")
+    best = min(check_import_time.import_time() for _ in range(5))
+    assert best <= check_import_time.BUDGET_US * TOLERANCE
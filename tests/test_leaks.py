@@ -0,0 +1,33 @@
+from ctypes import byref
+
+import pytest
+
+import leak_check
+import msi
+
+
+def test_enumeration_frees_everything():
+    assert leak_check.check(2000)
+
+
+def test_failed_getter_leaks_nothing(sim):
+    with pytest.raises(msi.DeviceNotFoundError):
+        msi.get_led_info("MSI_MB", 5)
+    assert not sim.allocations and not sim.invalid_frees
+
+
+def test_sdk_array_freed_on_exception(sim):
+    with pytest.raises(RuntimeError):
+        with msi.SdkString() as name, msi.SdkArray() as styles:
+            assert msi.mlapi.MLAPI_GetLedInfo("MSI_MB", 0, byref(name), byref(styles)) == msi.MLAPI_OK
+            assert len(sim.allocations) == 2
+            raise RuntimeError
+    assert not sim.allocations and not sim.invalid_frees
+
+
+def test_sdk_array_freed_after_backend_change(sim):
+    with msi.SdkArray() as names:
+        assert msi.mlapi.MLAPI_GetLedName("MSI_MB", byref(names)) == msi.MLAPI_OK
+        msi.use_backend(type(sim)({}))
+    msi.use_backend(sim)
+    assert not sim.allocations and not sim.invalid_frees